@@ -0,0 +1,169 @@
+"""Compare sequential embedding requests with the batched executor.
+
+Starts a local stub of the embeddings endpoint whose latency grows with the
+tokens in a request and which answers 429 (with ``retry-after-ms``) once a
+tokens-per-minute budget is exhausted, like the real API; the stub lets a
+client run ``--burst`` seconds of budget ahead. ``N`` synthetic
+chunks are then embedded the way ``OpenAIEmbeddings`` does it (slices of
+1000 inputs, one request at a time, the client's own retries) and through
+``EmbeddingExecutor`` (token-bounded batches sent concurrently, adaptive
+batch size on 429s). Both must return vectors in input order.
+
+Usage::
+
+    python benchmarks/bench_embedding_executor.py --chunks 5000 --concurrency 8
+    python benchmarks/bench_embedding_executor.py --tokens-per-minute 3000000 --burst 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from email_generator.openai_client import create_openai_client  # noqa: E402
+from learnbot.embedding_executor import EmbeddingExecutor, RateLimiter  # noqa: E402
+
+SLICE_SIZE = 1000  # OpenAIEmbeddings' default chunk_size
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, base_latency, token_latency, tokens_per_minute, burst):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.base_latency = base_latency
+        self.token_latency = token_latency
+        self.tokens_per_minute = tokens_per_minute
+        self.capacity = tokens_per_minute / 60.0 * burst
+        self.budget = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rejected = 0
+
+    def admit(self, tokens: int) -> float:
+        """Spend ``tokens`` of budget; return seconds to wait if short."""
+        with self.lock:
+            now = time.monotonic()
+            refill = (now - self.updated) / 60.0 * self.tokens_per_minute
+            self.budget = min(self.capacity, self.budget + refill)
+            self.updated = now
+            self.requests += 1
+            if tokens > self.budget:
+                self.rejected += 1
+                return (tokens - self.budget) / self.tokens_per_minute * 60.0
+            self.budget -= tokens
+            return 0.0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _reply(self, status: int, payload: dict, headers=()) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):  # noqa: N802 - http.server naming
+        length = int(self.headers.get("Content-Length", 0))
+        inputs = json.loads(self.rfile.read(length))["input"]
+        tokens = sum(len(text.split()) for text in inputs)
+        wait = self.server.admit(tokens)
+        if wait:
+            error = {"error": {"message": "Rate limit reached", "type": "tokens"}}
+            self._reply(429, error, [("retry-after-ms", str(int(wait * 1000) + 1))])
+            return
+        time.sleep(self.server.base_latency + tokens * self.server.token_latency)
+        data = [
+            {"object": "embedding", "index": i, "embedding": [float(len(text)), 0.0]}
+            for i, text in enumerate(inputs)
+        ]
+        usage = {"prompt_tokens": tokens, "total_tokens": tokens}
+        self._reply(200, {"object": "list", "data": data, "model": "stub", "usage": usage})
+
+    def log_message(self, *args):
+        pass
+
+
+def sequential_slices(client, texts):
+    vectors = []
+    for start in range(0, len(texts), SLICE_SIZE):
+        response = client.embeddings.create(
+            model="stub", input=texts[start : start + SLICE_SIZE]
+        )
+        vectors.extend(item.embedding for item in response.data)
+    return vectors
+
+
+def _run(label: str, server: StubServer, embed, texts) -> None:
+    server.requests = server.rejected = 0
+    start = time.perf_counter()
+    try:
+        vectors = embed(texts)
+    except Exception as exc:  # e.g. a slice larger than the stub ever admits
+        print(f"{label:<22} failed after {time.perf_counter() - start:.2f} s: {exc}")
+        return
+    elapsed = time.perf_counter() - start
+    assert [v[0] for v in vectors] == [float(len(t)) for t in texts], "order lost"
+    print(
+        f"{label:<22} {elapsed:7.2f} s   {len(texts) / elapsed:8.0f} chunks/s   "
+        f"{server.requests:5d} requests   {server.rejected:4d} rate limited"
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=100, help="Words per chunk")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-tokens", type=int, default=8000)
+    parser.add_argument("--base-latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=2e-6)
+    parser.add_argument("--tokens-per-minute", type=int, default=10_000_000)
+    parser.add_argument("--burst", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    server = StubServer(
+        args.base_latency, args.token_latency, args.tokens_per_minute, args.burst
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    client = create_openai_client("bench", base_url=base_url)
+
+    texts = [
+        " ".join(f"w{(i * 7 + j) % 997}" for j in range(args.words)) + f" #{i}"
+        for i in range(args.chunks)
+    ]
+    executor = EmbeddingExecutor(
+        client,
+        model="stub",
+        concurrency=args.concurrency,
+        max_batch_tokens=args.batch_tokens,
+        limiter=RateLimiter(1e9, 1e12),  # let the stub's 429s drive adaptation
+    )
+
+    _run("sequential slices", server, lambda t: sequential_slices(client, t), texts)
+    time.sleep(args.burst)  # let the stub's budget refill between runs
+    _run("embedding executor", server, executor.embed_documents, texts)
+    print(
+        f"executor: {executor.requests} requests, {executor.rate_limited} retried, "
+        f"final batch budget {executor.batch_tokens} tokens"
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Compare recall, latency and memory of the learnbot FAISS index types.
+
+Generates ``N`` clustered synthetic vectors (embeddings are clustered by
+topic, so uniform noise would flatter IVF), takes an exact ``flat`` search
+as ground truth and, for each index type, reports build time, serialized
+size, p50/p95 single-query latency and recall@k. ``--sweep`` repeats the
+IVF and HNSW types over a range of ``nprobe`` / ``efSearch`` values to show
+the recall/latency curve behind ``LEARNBOT_NPROBE`` and
+``LEARNBOT_EF_SEARCH``.
+
+Usage::
+
+    python benchmarks/bench_faiss_index.py --vectors 50000 --dim 384 --sweep
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+
+from learnbot.faiss_index import (  # noqa: E402
+    INDEX_TYPES,
+    create_index,
+    set_search_parameters,
+)
+
+SWEEP_NPROBE = (1, 4, 16, 64)
+SWEEP_EF_SEARCH = (16, 32, 64, 128)
+
+
+def clustered_vectors(count: int, dimension: int, clusters: int, seed: int):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    labels = rng.integers(clusters, size=count)
+    noise = rng.normal(scale=0.3, size=(count, dimension)).astype(np.float32)
+    return centres[labels] + noise
+
+
+def _recall(found, truth, k: int) -> float:
+    hits = sum(len(set(row[:k]) & set(expected[:k])) for row, expected in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def _search(index, queries, k: int):
+    latencies = []
+    rows = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        rows.append(ids[0].tolist())
+    return rows, latencies
+
+
+def _report(label: str, build: float, size: int, latencies, recall: float) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    print(
+        f"{label:<22} build {build:7.2f} s   size {size / 2**20:8.1f} MiB   "
+        f"p50 {statistics.median(ordered):6.3f} ms   p95 {p95:6.3f} ms   "
+        f"recall {recall:.3f}"
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=INDEX_TYPES)
+    parser.add_argument("--sweep", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    vectors = clustered_vectors(args.vectors, args.dim, args.clusters, args.seed)
+    rows = np.random.default_rng(args.seed + 1).choice(args.vectors, args.queries)
+    queries = vectors[rows] + np.float32(0.05)
+
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+    truth = truth.tolist()
+
+    for index_type in args.types:
+        start = time.perf_counter()
+        index = create_index(vectors, index_type, seed=args.seed)
+        build = time.perf_counter() - start
+        size = faiss.serialize_index(index).nbytes
+        found, latencies = _search(index, queries, args.k)
+        _report(index_type, build, size, latencies, _recall(found, truth, args.k))
+
+        if not args.sweep:
+            continue
+        if faiss.try_extract_index_ivf(index) is not None:
+            settings = [("nprobe", value, {"nprobe": value}) for value in SWEEP_NPROBE]
+        elif hasattr(faiss.downcast_index(index), "hnsw"):
+            settings = [
+                ("efSearch", value, {"ef_search": value}) for value in SWEEP_EF_SEARCH
+            ]
+        else:
+            settings = []
+        for name, value, kwargs in settings:
+            set_search_parameters(index, **kwargs)
+            found, latencies = _search(index, queries, args.k)
+            _report(
+                f"  {name}={value}", build, size, latencies, _recall(found, truth, args.k)
+            )
+        set_search_parameters(index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Compare per-request OpenAI clients with the pooled client registry.
+
+Starts a local stub of the chat completions endpoint and times ``N`` calls
+made the old way (a fresh ``OpenAI`` client per call, as the generator and
+chatbot used to do) and through ``get_openai_client``, which reuses one
+keep-alive connection pool. The stub speaks plain HTTP, so the numbers
+exclude TLS handshakes; against the real API the gap is larger.
+
+Usage::
+
+    python benchmarks/bench_openai_client.py --requests 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from openai import OpenAI  # noqa: E402
+
+from email_generator.openai_client import get_openai_client  # noqa: E402
+
+COMPLETION = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "Hello"},
+            "finish_reason": "stop",
+        }
+    ],
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):  # noqa: N802 - http.server naming
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = json.dumps(COMPLETION).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _call(client: OpenAI) -> None:
+    client.chat.completions.create(
+        model="gpt-4", messages=[{"role": "user", "content": "ping"}]
+    )
+
+
+def _time_calls(n: int, call) -> list:
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _report(label: str, latencies: list) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    print(
+        f"{label:<22} mean {statistics.mean(ordered):7.2f} ms   "
+        f"p50 {statistics.median(ordered):7.2f} ms   p95 {p95:7.2f} ms"
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    def fresh_client_call():
+        client = OpenAI(api_key="bench", base_url=base_url)
+        try:
+            _call(client)
+        finally:
+            client.close()
+
+    def pooled_client_call():
+        _call(get_openai_client("bench", base_url=base_url))
+
+    # Warm up imports and the pooled connection before timing
+    fresh_client_call()
+    pooled_client_call()
+
+    _report("client per request", _time_calls(args.requests, fresh_client_call))
+    _report("shared pooled client", _time_calls(args.requests, pooled_client_call))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Time single-question embedding with the configured learnbot backends.
+
+Embeds ``N`` distinct questions one at a time, as the Learn page does, and
+reports p50/p95 latency per backend. The embedding cache is bypassed so
+every call really computes a vector; the first call is a warm-up and also
+covers loading the local model.
+
+Usage::
+
+    python benchmarks/bench_query_embedding.py --backend local
+    python benchmarks/bench_query_embedding.py --backend local openai --queries 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from learnbot.rag_pipeline import default_embeddings, embedding_backends  # noqa: E402
+
+QUESTION = "How do I connect question {} to the Outlook integration?"
+
+
+def _report(label: str, latencies: list) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    print(
+        f"{label:<22} mean {statistics.mean(ordered):7.2f} ms   "
+        f"p50 {statistics.median(ordered):7.2f} ms   p95 {p95:7.2f} ms"
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--backend", nargs="+", choices=embedding_backends(), default=["local"]
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--api-key", default=None, help="OpenAI API key")
+    args = parser.parse_args(argv)
+
+    for backend in args.backend:
+        # The raw provider, without the on-disk cache in front of it
+        embeddings = default_embeddings(args.api_key, backend).embeddings
+        start = time.perf_counter()
+        embeddings.embed_query(QUESTION.format("warm-up"))
+        print(f"{backend}: first query {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        latencies = []
+        for number in range(args.queries):
+            start = time.perf_counter()
+            embeddings.embed_query(QUESTION.format(number))
+            latencies.append((time.perf_counter() - start) * 1000)
+        _report(f"{backend} embed_query", latencies)
+
+
+if __name__ == "__main__":
+    main()
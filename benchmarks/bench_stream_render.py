@@ -0,0 +1,100 @@
+"""Compare per-token re-rendering with the coalescing ``StreamRenderer``.
+
+Streams ``--tokens`` word-sized tokens into a placeholder whose ``markdown``
+call costs time proportional to the text length (it serialises the text and
+scans it, roughly what Streamlit does before shipping a delta to the
+browser). The old loop joins every token so far and re-renders on each
+token; ``render_stream`` flushes every 50 ms or 2 000 characters.
+
+Token arrival is simulated with a virtual clock advanced by ``--token-ms``
+per token, so the benchmark runs at full speed while the renderer sees a
+realistic stream. ``--token-ms 0`` models a cached draft replayed at once.
+
+Usage::
+
+    python benchmarks/bench_stream_render.py --tokens 5000 --token-ms 0 5 25
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from email_generator.streaming import StreamRenderer  # noqa: E402
+
+
+class Placeholder:
+    """Stand-in for ``st.empty()`` with a length-proportional render cost."""
+
+    def __init__(self) -> None:
+        self.renders = 0
+        self.bytes = 0
+
+    def markdown(self, text: str) -> None:
+        payload = text.encode("utf-8")
+        payload.count(b"\n")
+        self.renders += 1
+        self.bytes += len(payload)
+
+
+class VirtualClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_tokens(n: int) -> list:
+    words = ("Thank ", "you ", "for ", "your ", "email", ", ", "regards", ".\n")
+    return [words[i % len(words)] for i in range(n)]
+
+
+def naive(tokens, token_s: float) -> Placeholder:
+    placeholder = Placeholder()
+    rendered = []
+    for token in tokens:
+        rendered.append(token)
+        placeholder.markdown("".join(rendered))
+    return placeholder
+
+
+def coalesced(tokens, token_s: float) -> Placeholder:
+    placeholder = Placeholder()
+    clock = VirtualClock()
+    renderer = StreamRenderer(placeholder, clock=clock)
+    for token in tokens:
+        clock.now += token_s
+        renderer.write(token)
+    renderer.flush()
+    return placeholder
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=5000)
+    parser.add_argument("--token-ms", type=float, nargs="+", default=[0.0, 5.0, 25.0])
+    args = parser.parse_args(argv)
+
+    tokens = make_tokens(args.tokens)
+    for token_ms in args.token_ms:
+        print(f"{args.tokens} tokens, one every {token_ms:g} ms")
+        for label, render in (
+            ("per-token render", naive),
+            ("StreamRenderer", coalesced),
+        ):
+            start = time.perf_counter()
+            placeholder = render(tokens, token_ms / 1000)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(
+                f"  {label:<18} {elapsed:9.2f} ms CPU   {placeholder.renders:5d} renders   "
+                f"{placeholder.bytes / 1e6:8.2f} MB rendered"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Bulk reply generation over CSV or JSONL files of inbound emails.
+
+Rows are streamed from the input (shaped like
+``data/processed/clean_email_data.csv``: a ``text`` column holding the email,
+optionally ``id``, ``tone`` and ``purpose``) into a bounded pool of async
+workers that call ``astream_generated_email``. Each result is appended to a
+JSONL output file as soon as it completes, and that file doubles as the
+checkpoint: re-running the same command skips rows already generated
+successfully and retries the ones that failed.
+
+Usage::
+
+    email-templates-gen batch data/processed/clean_email_data.csv replies.jsonl
+    python -m email_generator.batch emails.jsonl replies.jsonl --concurrency 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Set
+
+from email_generator.generator import astream_generated_email
+from email_generator.scheduler import GenerationScheduler
+
+DEFAULT_TONE = "Professional"
+DEFAULT_PURPOSE = "Reply"
+DEFAULT_CONCURRENCY = 16
+TEXT_FIELDS = ("text", "input_text")
+
+
+@dataclass
+class BatchReport:
+    """Outcome and timing of a batch run."""
+
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    latencies_ms: List[float] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        """Rows generated per second."""
+        done = self.succeeded + self.failed
+        return done / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Return the ``q`` quantile (0-1) of generation latency in ms."""
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    def summary(self) -> str:
+        return (
+            f"{self.succeeded} generated, {self.failed} failed, "
+            f"{self.skipped} already done in {self.elapsed:.1f} s "
+            f"({self.throughput:.2f} rows/s, p50 {self.percentile(0.5):.0f} ms, "
+            f"p95 {self.percentile(0.95):.0f} ms)"
+        )
+
+
+def iter_rows(path: Path | str) -> Iterator[dict]:
+    """Yield input rows from a ``.csv`` or ``.jsonl`` file, one at a time.
+
+    Every row gets an ``id`` (its own ``id`` field, else its position) and an
+    ``input_text`` taken from the ``text`` or ``input_text`` field. A row
+    with neither gets ``input_text`` ``None`` and an ``error`` explaining why,
+    so the caller can record it and carry on.
+    """
+    path = Path(path)
+    with path.open(encoding="utf-8-sig", newline="") as f:
+        if path.suffix.lower() in (".jsonl", ".ndjson"):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+        for position, record in enumerate(records):
+            text = next((record[k] for k in TEXT_FIELDS if record.get(k)), None)
+            row_id = str(record.get("id") or position)
+            row = {**record, "id": row_id, "input_text": text}
+            if text is None:
+                row["error"] = (
+                    f"Row {position} of {path} has no 'text' or 'input_text' value"
+                )
+            yield row
+
+
+def completed_ids(output_path: Path | str) -> Set[str]:
+    """Return ids already generated successfully in ``output_path``."""
+    done: Set[str] = set()
+    path = Path(output_path)
+    if not path.exists():
+        return done
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if record.get("status") == "ok":
+                done.add(str(record["id"]))
+    return done
+
+
+async def _generate(generate, row: dict, openai_api_key: str, scheduler) -> str:
+    tokens = []
+    async for token in generate(
+        row["input_text"],
+        row.get("tone") or DEFAULT_TONE,
+        row.get("purpose") or DEFAULT_PURPOSE,
+        openai_api_key,
+        scheduler=scheduler,
+    ):
+        tokens.append(token)
+    return "".join(tokens)
+
+
+async def run_batch(
+    input_path: Path | str,
+    output_path: Path | str,
+    openai_api_key: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    requests_per_minute: Optional[float] = None,
+    tone: Optional[str] = None,
+    purpose: Optional[str] = None,
+    generate: Callable = astream_generated_email,
+) -> BatchReport:
+    """Generate a reply for every pending row of ``input_path``.
+
+    ``concurrency`` workers pull rows from a bounded queue, so memory stays
+    flat however large the input is. Results are appended to
+    ``output_path`` as they finish.
+    """
+    report = BatchReport()
+    done = completed_ids(output_path)
+    scheduler = GenerationScheduler(
+        max_concurrency=concurrency, requests_per_minute=requests_per_minute
+    )
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        def write(record: dict) -> None:
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+        async def worker() -> None:
+            while True:
+                row = await queue.get()
+                if row is None:
+                    return
+                row_start = time.perf_counter()
+                try:
+                    email = await _generate(generate, row, openai_api_key, scheduler)
+                except Exception as e:  # record the failure, keep the batch going
+                    report.failed += 1
+                    write({"id": row["id"], "status": "error", "error": str(e)})
+                else:
+                    latency_ms = (time.perf_counter() - row_start) * 1000
+                    report.succeeded += 1
+                    report.latencies_ms.append(latency_ms)
+                    write(
+                        {
+                            "id": row["id"],
+                            "status": "ok",
+                            "email": email,
+                            "latency_ms": round(latency_ms, 1),
+                        }
+                    )
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for row in iter_rows(input_path):
+                if row["id"] in done:
+                    report.skipped += 1
+                    continue
+                if row["input_text"] is None:  # nothing to generate from
+                    report.failed += 1
+                    write({"id": row["id"], "status": "error", "error": row["error"]})
+                    continue
+                if tone:
+                    row["tone"] = tone
+                if purpose:
+                    row["purpose"] = purpose
+                await queue.put(row)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def main(argv=None, prog: Optional[str] = None) -> None:
+    """Command line entry point (``email-templates-gen batch``)."""
+    parser = argparse.ArgumentParser(
+        prog=prog or "python -m email_generator.batch",
+        description="Generate email replies for every row of a CSV or JSONL file.",
+    )
+    parser.add_argument("input", help="CSV or JSONL file with a 'text' column")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument(
+        "--requests-per-minute", type=float, default=None, help="Per-key budget"
+    )
+    parser.add_argument("--tone", default=None, help="Override every row's tone")
+    parser.add_argument("--purpose", default=None, help="Override every row's purpose")
+    parser.add_argument("--api-key", default=None, help="OpenAI API key")
+    args = parser.parse_args(argv)
+
+    api_key = args.api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        parser.error("an OpenAI API key is required (--api-key or OPENAI_API_KEY)")
+
+    report = asyncio.run(
+        run_batch(
+            args.input,
+            args.output,
+            api_key,
+            concurrency=args.concurrency,
+            requests_per_minute=args.requests_per_minute,
+            tone=args.tone,
+            purpose=args.purpose,
+        )
+    )
+    print(report.summary())
+    if report.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Okapi BM25 over a fixed list of token lists.
+
+The weight of every posting is computed when the index is built, so a query
+only sums precomputed weights over the postings of its own tokens. Used by
+the template store and by learnbot's lexical retrieval.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+# The usual defaults; they suit short business emails and doc chunks well.
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+class BM25Index:
+    """Inverted index with precomputed BM25 posting weights.
+
+    Args:
+        documents: Term counts of each document, in document-id order.
+        k1: Term-frequency saturation.
+        b: Length normalisation.
+    """
+
+    def __init__(
+        self,
+        documents: Iterable[Mapping[str, int]],
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+    ) -> None:
+        counts = [Counter(terms) for terms in documents]
+        lengths = [sum(terms.values()) for terms in counts]
+        average = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+        frequency: Counter = Counter()
+        for terms in counts:
+            frequency.update(terms.keys())
+        total = len(counts)
+
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+        for doc, terms in enumerate(counts):
+            norm = k1 * (1 - b + b * lengths[doc] / average) if average else k1
+            for term, tf in terms.items():
+                df = frequency[term]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                weight = idf * tf * (k1 + 1) / (tf + norm)
+                postings.setdefault(term, []).append((doc, weight))
+        self._postings: Dict[str, Tuple[Tuple[int, float], ...]] = {
+            term: tuple(entries) for term, entries in postings.items()
+        }
+        self.size = total
+
+    def search(self, terms: Iterable[str], k: int) -> List[Tuple[int, float]]:
+        """Return up to ``k`` ``(document id, score)`` pairs, best first.
+
+        Documents sharing no term with the query are never returned.
+        """
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            for doc, weight in self._postings.get(term, ()):
+                scores[doc] = scores.get(doc, 0.0) + weight
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def __len__(self) -> int:
+        return self.size
@@ -1,28 +1,171 @@
-from openai import OpenAI
+import asyncio
+import logging
 
-def stream_generated_email(input_text, tone, purpose, openai_api_key):
-    client = OpenAI(api_key=openai_api_key)
+from email_generator.openai_client import get_async_openai_client, get_openai_client
+from email_generator.prompts import get_prompt
+from email_generator.response_cache import replay_tokens
+from email_generator.scheduler import get_scheduler
+from email_generator.template_retriever import record_id
 
-    prompt = f"""
-You are a helpful assistant that writes emails in a {tone.lower()} tone for business use.
+logger = logging.getLogger(__name__)
 
-Purpose: {purpose}
-Input:
-{input_text}
+MODEL = "gpt-4"
+# Longer examples are cut so a few of them cannot crowd out the request
+MAX_EXAMPLE_CHARS = 1500
+# A reply must answer the email it was given, never be a canned template
+NO_TEMPLATE_FILL_PURPOSES = frozenset({"Reply"})
 
-Write the full email, including greeting and sign-off.
+
+def format_examples(examples):
+    """Render retrieved templates as a numbered block of example emails."""
+    blocks = []
+    for number, example in enumerate(examples, start=1):
+        text = example.text
+        if len(text) > MAX_EXAMPLE_CHARS:
+            text = text[:MAX_EXAMPLE_CHARS].rsplit(" ", 1)[0] + " [...]"
+        blocks.append(f"Example {number} ({example.name}):\n{text}")
+    return "\n\n".join(blocks)
+
+
+def fill_template(filler, input_text, purpose):
+    """Return ``filler``'s filled template for the request, or ``None``."""
+    if filler is None or purpose in NO_TEMPLATE_FILL_PURPOSES:
+        return None
+    return filler.fill(input_text)
+
+
+def retrieve_examples(retriever, input_text):
+    """Return ``retriever``'s examples for the request, or none if it fails.
+
+    Examples only improve the prompt, so an embeddings outage must not stop
+    generation.
+    """
+    if retriever is None:
+        return ()
+    try:
+        return retriever.examples(input_text)
+    except Exception:
+        logger.warning(
+            "Template retrieval failed; generating without examples", exc_info=True
+        )
+        return ()
+
+
+def build_messages(input_text, tone, purpose, examples=()):
+    """Return the chat messages for one email, with optional template examples.
+
+    The prompt is kept within ``MODEL``'s token budget by trimming the
+    examples first and then the input.
+    """
+    guidance = ""
+    if examples:
+        guidance = f"""
+Our team's templates for similar emails follow. Match their structure, length
+and wording, fill in or drop placeholders in capitals or brackets, and keep
+the email as concise as they are.
+
+{format_examples(examples)}
 """
+    return get_prompt("email").messages(
+        MODEL,
+        tone=tone.lower(),
+        purpose=purpose,
+        input_text=input_text,
+        guidance=guidance,
+    ).messages
+
+
+def stream_generated_email(
+    input_text, tone, purpose, openai_api_key, cache=None, retriever=None, filler=None
+):
+    """Stream the email token by token.
+
+    With a ``ResponseCache``, a cached email for the same request and
+    examples is replayed as a token stream, and a freshly generated one is
+    stored once complete. With a ``TemplateRetriever``, the closest templates
+    are included in the prompt as examples. With a ``TemplateFiller`` (pass
+    one only when the user asked for a template), a request that names a
+    known template and supplies all its placeholders is answered by filling
+    that template, without calling the model; replies are always generated.
+    """
+    filled = fill_template(filler, input_text, purpose)
+    if filled is not None:
+        yield from replay_tokens(filled)
+        return
+
+    examples = retrieve_examples(retriever, input_text)
+    example_ids = [record_id(example) for example in examples]
+    if cache is not None:
+        cached = cache.get(input_text, tone, purpose, MODEL, example_ids)
+        if cached is not None:
+            yield from replay_tokens(cached)
+            return
+
+    client = get_openai_client(openai_api_key)
 
     response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You write high-quality emails for professionals."},
-            {"role": "user", "content": prompt}
-        ],
+        model=MODEL,
+        messages=build_messages(input_text, tone, purpose, examples),
         stream=True  # 🟢 Enable streaming
     )
 
     # Yield tokens as they arrive
+    tokens = []
     for chunk in response:
         if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+            tokens.append(chunk.choices[0].delta.content)
             yield chunk.choices[0].delta.content
+
+    if cache is not None:
+        cache.put(input_text, tone, purpose, MODEL, "".join(tokens), example_ids)
+
+
+async def astream_generated_email(
+    input_text, tone, purpose, openai_api_key, scheduler=None, cache=None,
+    retriever=None, filler=None,
+):
+    """Async twin of ``stream_generated_email`` yielding the same tokens.
+
+    Each generation holds a slot of ``scheduler`` (the event loop's default
+    ``GenerationScheduler`` if omitted) for the whole stream, which bounds
+    concurrency and keeps each API key within its request budget. Cache hits
+    are replayed without taking a slot, as are filled templates. Template
+    retrieval and cache access run in a worker thread so their SQLite and
+    embedding calls do not block the event loop.
+    """
+    filled = fill_template(filler, input_text, purpose)
+    if filled is not None:
+        for token in replay_tokens(filled):
+            yield token
+        return
+
+    examples = await asyncio.to_thread(retrieve_examples, retriever, input_text)
+    example_ids = [record_id(example) for example in examples]
+    if cache is not None:
+        cached = await asyncio.to_thread(
+            cache.get, input_text, tone, purpose, MODEL, example_ids
+        )
+        if cached is not None:
+            for token in replay_tokens(cached):
+                yield token
+            return
+
+    scheduler = scheduler or get_scheduler()
+    tokens = []
+    async with scheduler.slot(openai_api_key):
+        client = get_async_openai_client(openai_api_key)
+        response = await client.chat.completions.create(
+            model=MODEL,
+            messages=build_messages(input_text, tone, purpose, examples),
+            stream=True,
+        )
+        async for chunk in response:
+            delta = chunk.choices[0].delta if chunk.choices else None
+            if delta and delta.content:
+                tokens.append(delta.content)
+                yield delta.content
+
+    if cache is not None:
+        await asyncio.to_thread(
+            cache.put, input_text, tone, purpose, MODEL, "".join(tokens), example_ids
+        )
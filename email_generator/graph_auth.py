@@ -0,0 +1,27 @@
+"""Cached Microsoft Graph tokens; see ``email_templates_gen.integrations.graph_auth``.
+
+The implementation lives in the installable package, which this module
+re-exports for the Streamlit app and scripts run from a checkout.
+"""
+
+import sys
+from pathlib import Path
+
+# Add src to path for development, as app.py does
+src_path = Path(__file__).resolve().parents[1] / "src"
+if src_path.exists() and str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+from email_templates_gen.integrations.graph_auth import (  # noqa: E402
+    SCOPES,
+    GraphTokenProvider,
+    clear_token_providers,
+    get_token_provider,
+)
+
+__all__ = [
+    "SCOPES",
+    "GraphTokenProvider",
+    "clear_token_providers",
+    "get_token_provider",
+]
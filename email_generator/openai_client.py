@@ -0,0 +1,155 @@
+"""Process-wide registry of pooled OpenAI clients.
+
+Creating ``OpenAI(api_key=...)`` per request opens a new HTTP connection pool
+(and TLS handshake) every time. ``get_openai_client`` instead hands out one
+long-lived client per API key whose keep-alive pool is bounded and whose
+timeouts come from ``OpenAISettings``. Module state survives Streamlit reruns,
+so the same client is reused across reruns and sessions.
+
+``get_async_openai_client`` does the same for ``AsyncOpenAI``. Async
+connections belong to the event loop that opened them, so async clients are
+pooled per running loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+# Used when the configuration package is unavailable or incomplete
+DEFAULT_CLIENT_OPTIONS = {
+    "timeout": 60.0,
+    "connect_timeout": 5.0,
+    "max_retries": 2,
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 30.0,
+    "max_concurrent_generations": 100,
+    "requests_per_minute": 500,
+}
+MAX_CLIENTS = 32
+
+_clients: "OrderedDict[Tuple[str, Optional[str]], OpenAI]" = OrderedDict()
+_clients_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, OrderedDict]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def client_options(api_key: Optional[str] = None) -> dict:
+    """Return HTTP client options, read from ``OpenAISettings`` when possible."""
+    try:
+        from email_templates_gen.config.settings import OpenAISettings
+
+        settings = OpenAISettings(api_key=api_key or "")
+    except Exception:  # config package not importable or settings invalid
+        return dict(DEFAULT_CLIENT_OPTIONS)
+    return {name: getattr(settings, name) for name in DEFAULT_CLIENT_OPTIONS}
+
+
+def _registry_key(api_key: str, base_url: Optional[str]) -> Tuple[str, Optional[str]]:
+    # Keep digests rather than raw keys as registry keys
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest(), base_url
+
+
+def _http_limits(options: dict, max_connections: int) -> dict:
+    return {
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=options["max_keepalive_connections"],
+            keepalive_expiry=options["keepalive_expiry"],
+        ),
+        "timeout": httpx.Timeout(
+            options["timeout"], connect=options["connect_timeout"]
+        ),
+    }
+
+
+def create_openai_client(api_key: str, base_url: Optional[str] = None) -> OpenAI:
+    """Build a new client with a bounded keep-alive connection pool."""
+    options = client_options(api_key)
+    http_client = httpx.Client(**_http_limits(options, options["max_connections"]))
+    return OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        max_retries=options["max_retries"],
+        http_client=http_client,
+    )
+
+
+def get_openai_client(api_key: str, base_url: Optional[str] = None) -> OpenAI:
+    """Return the shared client for ``api_key``, creating it on first use.
+
+    At most ``MAX_CLIENTS`` clients are kept; the least recently used one is
+    dropped when a new key would exceed that bound. It is not closed, since
+    a caller may still be using it; its pool closes once it is collected.
+    """
+    key = _registry_key(api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            return client
+
+        client = create_openai_client(api_key, base_url)
+        _clients[key] = client
+        while len(_clients) > MAX_CLIENTS:
+            _clients.popitem(last=False)
+        return client
+
+
+def close_openai_clients() -> None:
+    """Close and forget every pooled client."""
+    with _clients_lock:
+        while _clients:
+            _, client = _clients.popitem()
+            client.close()
+
+
+def create_async_openai_client(
+    api_key: str, base_url: Optional[str] = None
+) -> AsyncOpenAI:
+    """Build a new async client sized for concurrent streaming generations."""
+    options = client_options(api_key)
+    # Every in-flight stream holds a connection, so size the pool for the
+    # configured generation concurrency rather than the sync default.
+    max_connections = max(
+        options["max_connections"], options["max_concurrent_generations"]
+    )
+    http_client = httpx.AsyncClient(**_http_limits(options, max_connections))
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        max_retries=options["max_retries"],
+        http_client=http_client,
+    )
+
+
+def get_async_openai_client(
+    api_key: str, base_url: Optional[str] = None
+) -> AsyncOpenAI:
+    """Return the shared async client for ``api_key`` on the running loop.
+
+    Evicted clients are dropped without closing, as in ``get_openai_client``.
+    """
+    loop = asyncio.get_running_loop()
+    key = _registry_key(api_key, base_url)
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, OrderedDict())
+        client = clients.get(key)
+        if client is not None:
+            clients.move_to_end(key)
+            return client
+
+        client = create_async_openai_client(api_key, base_url)
+        clients[key] = client
+        while len(clients) > MAX_CLIENTS:
+            clients.popitem(last=False)
+        return client
@@ -0,0 +1,430 @@
+"""Durable outbound mail queue with a throttling-aware async dispatcher.
+
+``Outbox.enqueue`` stores a message in SQLite and returns immediately, so
+the UI never waits on Microsoft Graph. An ``OutboxDispatcher`` drains the
+queue in the background:
+
+* at most ``per_mailbox`` sends run at once for a sender mailbox and
+  ``per_tenant`` for a tenant (Graph allows four concurrent requests per
+  mailbox);
+* a 429/503 response pauses that mailbox for the ``Retry-After`` the service
+  asked for, and the message is retried after it;
+* other transient failures are retried with exponential backoff and full
+  jitter, up to ``max_attempts``; permanent failures are marked ``failed``.
+
+Dispatchers claim a message with a conditional update, so several processes
+sharing one database never send it twice. A claim is a lease: a message left
+in ``sending`` longer than ``SEND_LEASE_SECONDS`` (its sender crashed) is put
+back in the queue. Credentials are never stored; sends use the configured
+Outlook credentials.
+
+Usage::
+
+    outbox = get_outbox()
+    outbox.enqueue("someone@example.com", "Subject", "<p>Body</p>")
+    start_background_dispatcher()
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, List, Optional
+
+import requests
+
+from email_generator import outlook_integration
+
+OUTBOX_PATH = Path(os.getenv("OUTBOX_PATH", "models/outbox.sqlite3"))
+DEFAULT_MAILBOX_CONCURRENCY = 4
+DEFAULT_TENANT_CONCURRENCY = 20
+DEFAULT_MAX_ATTEMPTS = 8
+BASE_DELAY_SECONDS = 1.0
+MAX_DELAY_SECONDS = 300.0
+POLL_INTERVAL_SECONDS = 0.5
+DISPATCH_BATCH = 100
+# Far longer than a send may take (Graph calls time out after 10 s)
+SEND_LEASE_SECONDS = 300.0
+THROTTLED_STATUSES = {429, 503}
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+QUEUED, SENDING, SENT, FAILED = "queued", "sending", "sent", "failed"
+
+_outboxes: Dict[str, "Outbox"] = {}
+_outboxes_lock = threading.Lock()
+_dispatcher_lock = threading.Lock()
+_dispatcher: Optional["OutboxDispatcher"] = None
+_dispatcher_thread: Optional[threading.Thread] = None
+
+
+class Outbox:
+    """SQLite-backed store of outgoing messages and their delivery state.
+
+    While a message is ``sending``, ``next_attempt`` holds the time its
+    claim expires.
+    """
+
+    def __init__(
+        self, path: Path | str = OUTBOX_PATH, lease_seconds: float = SEND_LEASE_SECONDS
+    ) -> None:
+        self.lease_seconds = lease_seconds
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "sender TEXT NOT NULL, tenant TEXT NOT NULL, recipient TEXT NOT NULL, "
+            "subject TEXT NOT NULL, body TEXT NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt REAL NOT NULL, last_error TEXT, "
+            "created REAL NOT NULL, sent REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS outbox_ready ON outbox (status, next_attempt)"
+        )
+        self._conn.commit()
+        self.requeue_expired()
+
+    def requeue_expired(self, now: Optional[float] = None) -> int:
+        """Queue again messages whose sender let its claim expire (a crash)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET status = ?, next_attempt = ? "
+                "WHERE status = ? AND next_attempt <= ?",
+                (QUEUED, now, SENDING, now),
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def enqueue(
+        self,
+        recipient: str,
+        subject: str,
+        body: str,
+        *,
+        sender: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+    ) -> int:
+        """Queue a message for delivery and return its id."""
+        sender = sender or outlook_integration.SENDER_ADDRESS
+        if not sender:
+            raise ValueError("Sender email address must be provided")
+        tenant = tenant_id or outlook_integration.TENANT_ID or ""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (sender, tenant, recipient, subject, body, "
+                "status, next_attempt, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sender, tenant, recipient, subject, body, QUEUED, now, now),
+            )
+            self._conn.commit()
+            return int(cursor.lastrowid)
+
+    def ready(
+        self,
+        limit: int,
+        now: Optional[float] = None,
+        exclude_senders: Iterable[str] = (),
+    ) -> List[sqlite3.Row]:
+        """Return up to ``limit`` queued messages due for an attempt.
+
+        Messages from ``exclude_senders`` (busy or paused mailboxes) are
+        skipped so they do not crowd out other mailboxes.
+        """
+        now = time.time() if now is None else now
+        self.requeue_expired(now)
+        excluded = list(exclude_senders)
+        query = (
+            "SELECT * FROM outbox WHERE status = ? AND next_attempt <= ? "
+            f"AND sender NOT IN ({','.join('?' * len(excluded))}) "
+            "ORDER BY next_attempt, id LIMIT ?"
+        )
+        params = (QUEUED, now, *excluded, limit)
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def _update(self, sql: str, params: tuple) -> None:
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    def claim(self, message_id: int) -> bool:
+        """Mark a queued message ``sending``; ``False`` if it was not queued.
+
+        The check and the update are one statement, so of several
+        dispatchers racing for a message exactly one gets it.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, "
+                "next_attempt = ? WHERE id = ? AND status = ?",
+                (SENDING, time.time() + self.lease_seconds, message_id, QUEUED),
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def mark_sent(self, message_id: int) -> None:
+        self._update(
+            "UPDATE outbox SET status = ?, sent = ?, last_error = NULL WHERE id = ?",
+            (SENT, time.time(), message_id),
+        )
+
+    def mark_retry(self, message_id: int, delay: float, error: str) -> None:
+        self._update(
+            "UPDATE outbox SET status = ?, next_attempt = ?, last_error = ? "
+            "WHERE id = ?",
+            (QUEUED, time.time() + delay, error, message_id),
+        )
+
+    def mark_failed(self, message_id: int, error: str) -> None:
+        self._update(
+            "UPDATE outbox SET status = ?, last_error = ? WHERE id = ?",
+            (FAILED, error, message_id),
+        )
+
+    def get(self, message_id: int) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM outbox WHERE id = ?", (message_id,)
+            ).fetchone()
+
+    def wait(
+        self, message_id: int, timeout: float, poll_interval: float = 0.2
+    ) -> Optional[sqlite3.Row]:
+        """Return the message once it is ``sent`` or ``failed``, or at ``timeout``.
+
+        A message still queued at the timeout (e.g. waiting to be retried)
+        is returned as it is, with its ``last_error``.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            row = self.get(message_id)
+            if row is None or row["status"] in (SENT, FAILED):
+                return row
+            if time.monotonic() >= deadline:
+                return row
+            time.sleep(poll_interval)
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of messages in each status."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM outbox GROUP BY status"
+            ).fetchall()
+        counts = {QUEUED: 0, SENDING: 0, SENT: 0, FAILED: 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def depth(self) -> int:
+        """Messages still waiting to be delivered."""
+        counts = self.counts()
+        return counts[QUEUED] + counts[SENDING]
+
+
+def _http_status(error: Exception) -> Optional[int]:
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:  # a Response is falsy for error statuses
+        return None
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class OutboxDispatcher:
+    """Deliver queued messages concurrently within Graph's throttling limits.
+
+    Args:
+        outbox: Queue to drain.
+        send: Delivery function with ``send_email``'s signature.
+        per_mailbox: Concurrent sends allowed per sender mailbox.
+        per_tenant: Concurrent sends allowed per tenant.
+        max_attempts: Attempts before a message is marked ``failed``.
+        base_delay: First backoff delay in seconds; doubles per attempt.
+        max_delay: Upper bound of the backoff delay.
+        poll_interval: Seconds between queue polls when nothing is due.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        send: Callable = outlook_integration.send_email,
+        per_mailbox: int = DEFAULT_MAILBOX_CONCURRENCY,
+        per_tenant: int = DEFAULT_TENANT_CONCURRENCY,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_delay: float = BASE_DELAY_SECONDS,
+        max_delay: float = MAX_DELAY_SECONDS,
+        poll_interval: float = POLL_INTERVAL_SECONDS,
+    ) -> None:
+        self.outbox = outbox
+        self.send = send
+        self.per_mailbox = per_mailbox
+        self.per_tenant = per_tenant
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self._mailbox_load: Counter = Counter()
+        self._tenant_load: Counter = Counter()
+        self._paused_until: Dict[str, float] = {}
+        self._tasks: set = set()
+        self._sent_at: Deque[float] = deque()
+        self.throttled = 0
+        self.retried = 0
+
+    def backoff(self, attempts: int) -> float:
+        """Full-jitter exponential backoff for the given attempt count."""
+        cap = min(self.max_delay, self.base_delay * 2 ** max(0, attempts - 1))
+        return random.uniform(0, cap)
+
+    def _has_capacity(self, row: sqlite3.Row, now: float) -> bool:
+        return (
+            self._paused_until.get(row["sender"], 0.0) <= now
+            and self._mailbox_load[row["sender"]] < self.per_mailbox
+            and self._tenant_load[row["tenant"]] < self.per_tenant
+        )
+
+    def dispatch_ready(self) -> int:
+        """Start sends for every due message that fits the caps."""
+        now = time.time()
+        busy = {
+            sender
+            for sender in set(self._mailbox_load) | set(self._paused_until)
+            if self._mailbox_load[sender] >= self.per_mailbox
+            or self._paused_until.get(sender, 0.0) > now
+        }
+        started = 0
+        for row in self.outbox.ready(DISPATCH_BATCH, now=now, exclude_senders=busy):
+            if not self._has_capacity(row, now):
+                continue
+            if not self.outbox.claim(row["id"]):
+                continue  # taken by another dispatcher
+            self._mailbox_load[row["sender"]] += 1
+            self._tenant_load[row["tenant"]] += 1
+            task = asyncio.create_task(self._deliver(row))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            started += 1
+        return started
+
+    async def _deliver(self, row: sqlite3.Row) -> None:
+        attempts = row["attempts"] + 1
+        try:
+            await asyncio.to_thread(
+                self.send,
+                row["recipient"],
+                row["subject"],
+                row["body"],
+                sender=row["sender"],
+                tenant_id=row["tenant"] or None,
+            )
+        except Exception as error:
+            self._handle_failure(row, attempts, error)
+        else:
+            self.outbox.mark_sent(row["id"])
+            self._sent_at.append(time.time())
+        finally:
+            self._mailbox_load[row["sender"]] -= 1
+            self._tenant_load[row["tenant"]] -= 1
+
+    def _handle_failure(self, row: sqlite3.Row, attempts: int, error: Exception):
+        status = _http_status(error)
+        transient = status in RETRYABLE_STATUSES or (
+            status is None and isinstance(error, requests.RequestException)
+        )
+        if not transient or attempts >= self.max_attempts:
+            self.outbox.mark_failed(row["id"], str(error))
+            return
+        delay = self.backoff(attempts)
+        if status in THROTTLED_STATUSES:
+            self.throttled += 1
+            retry_after = _retry_after(error)
+            if retry_after is not None:
+                delay = retry_after
+                self._paused_until[row["sender"]] = time.time() + retry_after
+        self.retried += 1
+        self.outbox.mark_retry(row["id"], delay, str(error))
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        """Dispatch until ``stop`` is set (forever if omitted)."""
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            self.dispatch_ready()
+            try:
+                await asyncio.wait_for(stop.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    async def drain(self) -> None:
+        """Dispatch until no message is queued or in flight."""
+        while True:
+            self.dispatch_ready()
+            if not self._tasks and self.outbox.depth() == 0:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    def metrics(self) -> Dict[str, float]:
+        """Queue depth by status, in-flight sends and the recent send rate."""
+        now = time.time()
+        while self._sent_at and self._sent_at[0] < now - 60:
+            self._sent_at.popleft()
+        counts = self.outbox.counts()
+        return {
+            "queue_depth": counts[QUEUED] + counts[SENDING],
+            **counts,
+            "in_flight": len(self._tasks),
+            "sent_per_minute": len(self._sent_at),
+            "throttled": self.throttled,
+            "retried": self.retried,
+        }
+
+
+def get_outbox(path: Path | str = OUTBOX_PATH) -> Outbox:
+    """Return the process-wide outbox stored at ``path``."""
+    key = str(Path(path).resolve())
+    with _outboxes_lock:
+        if key not in _outboxes:
+            _outboxes[key] = Outbox(path)
+        return _outboxes[key]
+
+
+def start_background_dispatcher(
+    outbox: Optional[Outbox] = None, **options
+) -> OutboxDispatcher:
+    """Run a dispatcher on a daemon thread, once per process, and return it.
+
+    ``options`` are passed to ``OutboxDispatcher`` on the first call.
+    """
+    global _dispatcher, _dispatcher_thread
+    # Resolved first: get_outbox takes _outboxes_lock itself
+    outbox = outbox or get_outbox()
+    with _dispatcher_lock:
+        if _dispatcher_thread is None or not _dispatcher_thread.is_alive():
+            _dispatcher = OutboxDispatcher(outbox, **options)
+            _dispatcher_thread = threading.Thread(
+                target=asyncio.run,
+                args=(_dispatcher.run(),),
+                name="outbox-dispatcher",
+                daemon=True,
+            )
+            _dispatcher_thread.start()
+        return _dispatcher  # type: ignore[return-value]
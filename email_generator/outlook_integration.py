@@ -2,19 +2,41 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
 
-import msal
 import requests
+from requests.adapters import HTTPAdapter
+
+from email_generator.graph_auth import get_token_provider
 
 GRAPH_ENDPOINT = "https://graph.microsoft.com/v1.0"
-SCOPES = ["https://graph.microsoft.com/.default"]
+GRAPH_BATCH_LIMIT = 20  # Graph accepts at most 20 requests per $batch call
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_BATCH_RETRIES = 3
+POOL_SIZE = 10
 
 CLIENT_ID = os.getenv("OUTLOOK_CLIENT_ID")
 TENANT_ID = os.getenv("OUTLOOK_TENANT_ID")
 CLIENT_SECRET = os.getenv("OUTLOOK_CLIENT_SECRET")
 SENDER_ADDRESS = os.getenv("OUTLOOK_SENDER")
-AUTHORITY_TEMPLATE = "https://login.microsoftonline.com/{tenant_id}"
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_graph_session() -> requests.Session:
+    """Return the process-wide keep-alive session used for Graph calls."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
 
 
 def get_access_token(
@@ -22,7 +44,11 @@ def get_access_token(
     client_secret: Optional[str] = None,
     tenant_id: Optional[str] = None,
 ) -> str:
-    """Return an access token for Microsoft Graph."""
+    """Return an access token for Microsoft Graph.
+
+    Tokens come from the shared provider for the tenant and client, so they
+    are reused until shortly before expiry instead of fetched per call.
+    """
     client_id = client_id or CLIENT_ID
     tenant_id = tenant_id or TENANT_ID
     client_secret = client_secret or CLIENT_SECRET
@@ -30,19 +56,7 @@ def get_access_token(
     if not all([client_id, tenant_id, client_secret]):
         raise ValueError("Client ID, tenant ID and client secret are required")
 
-    app = msal.ConfidentialClientApplication(
-        client_id,
-        authority=AUTHORITY_TEMPLATE.format(tenant_id=tenant_id),
-        client_credential=client_secret,
-    )
-
-    result = app.acquire_token_silent(SCOPES, account=None)
-    if not result:
-        result = app.acquire_token_for_client(scopes=SCOPES)
-    if "access_token" not in result:
-        error = result.get("error_description", "Unknown error")
-        raise RuntimeError(f"Failed to obtain access token: {error}")
-    return result["access_token"]
+    return get_token_provider(client_id, tenant_id, client_secret).get_token()
 
 
 def send_email(
@@ -68,7 +82,18 @@ def send_email(
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json",
     }
-    message = {
+    endpoint = f"{GRAPH_ENDPOINT}/users/{sender}/sendMail"
+    response = get_graph_session().post(
+        endpoint,
+        headers=headers,
+        json=_message_payload(recipient, subject, body),
+        timeout=10,
+    )
+    response.raise_for_status()
+
+
+def _message_payload(recipient: str, subject: str, body: str) -> dict:
+    return {
         "message": {
             "subject": subject,
             "body": {"contentType": "HTML", "content": body},
@@ -76,7 +101,137 @@ def send_email(
         },
         "saveToSentItems": "true",
     }
-    endpoint = f"{GRAPH_ENDPOINT}/users/{sender}/sendMail"
-    response = requests.post(endpoint, headers=headers, json=message, timeout=10)
+
+
+@dataclass
+class SendResult:
+    """Delivery outcome of one message sent with ``send_emails_batch``."""
+
+    index: int
+    recipient: str
+    status: int = 0
+    error: Optional[str] = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+def _retry_after(headers: Optional[dict]) -> Optional[float]:
+    for name, value in (headers or {}).items():
+        if name.lower() == "retry-after":
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def _post_batch(
+    session: requests.Session, token: str, sender: str, messages: Dict[int, dict]
+) -> Dict[int, tuple]:
+    """POST one ``$batch`` request; return ``{index: (status, headers, body)}``."""
+    payload = {
+        "requests": [
+            {
+                "id": str(index),
+                "method": "POST",
+                "url": f"/users/{sender}/sendMail",
+                "headers": {"Content-Type": "application/json"},
+                "body": _message_payload(
+                    message["recipient"], message["subject"], message["body"]
+                ),
+            }
+            for index, message in messages.items()
+        ]
+    }
+    response = session.post(
+        f"{GRAPH_ENDPOINT}/$batch",
+        headers={"Authorization": f"Bearer {token}"},
+        json=payload,
+        timeout=30,
+    )
+    if response.status_code in RETRYABLE_STATUSES:
+        # The whole batch was throttled or failed: every item is retryable
+        outcome = (response.status_code, dict(response.headers), response.text)
+        return {index: outcome for index in messages}
     response.raise_for_status()
+    return {
+        int(item["id"]): (item["status"], item.get("headers"), item.get("body"))
+        for item in response.json().get("responses", [])
+    }
+
+
+def send_emails_batch(
+    messages: Iterable[dict],
+    *,
+    sender: Optional[str] = None,
+    client_id: Optional[str] = None,
+    client_secret: Optional[str] = None,
+    tenant_id: Optional[str] = None,
+    max_retries: int = DEFAULT_BATCH_RETRIES,
+    sleep: Callable[[float], None] = time.sleep,
+) -> List[SendResult]:
+    """Send many HTML emails through Graph ``$batch`` requests.
+
+    ``messages`` are dicts with ``recipient``, ``subject`` and ``body`` keys.
+    They are grouped ``GRAPH_BATCH_LIMIT`` at a time into ``$batch`` calls
+    over a pooled session. Sub-requests that fail with a throttling or
+    server error are retried, alone, up to ``max_retries`` times, after the
+    longest ``Retry-After`` the service asked for (or an exponential
+    backoff). A ``$batch`` call that fails as a whole with any other error,
+    or never gets a response, marks each of its messages failed without
+    retrying them, since they may have been sent. Always returns one
+    ``SendResult`` per message, in input order.
+    """
+    sender = sender or SENDER_ADDRESS
+    if not sender:
+        raise ValueError("Sender email address must be provided")
+
+    pending = dict(enumerate(messages))
+    results = [
+        SendResult(index=index, recipient=message["recipient"])
+        for index, message in pending.items()
+    ]
+    session = get_graph_session()
+
+    delay = 0.0  # set by each attempt for the one after it
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        if attempt:
+            sleep(delay)
+        try:
+            token = get_access_token(
+                client_id=client_id, client_secret=client_secret, tenant_id=tenant_id
+            )
+        except Exception as error:
+            if not attempt:
+                raise  # nothing was sent yet
+            for index in pending:  # keep the outcome of the last attempt
+                results[index].error = f"{results[index].error} ({error})"
+            break
+        indexes = list(pending)
+        retry: Dict[int, dict] = {}
+        delay = 2.0**attempt
+        for start in range(0, len(indexes), GRAPH_BATCH_LIMIT):
+            chunk = {i: pending[i] for i in indexes[start : start + GRAPH_BATCH_LIMIT]}
+            try:
+                outcomes = _post_batch(session, token, sender, chunk)
+            except requests.RequestException as error:
+                status = getattr(error.response, "status_code", None) or 0
+                outcomes = {index: (status, None, str(error)) for index in chunk}
+            for index in chunk:
+                status, headers, body = outcomes.get(
+                    index, (0, None, "missing from $batch response")
+                )
+                result = results[index]
+                result.status, result.attempts = status, attempt + 1
+                result.error = None if result.ok else str(body)
+                if status in RETRYABLE_STATUSES:
+                    retry[index] = pending[index]
+                    delay = max(delay, _retry_after(headers) or 0.0)
+        pending = retry
 
+    return results
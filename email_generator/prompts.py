@@ -0,0 +1,319 @@
+"""Registry of precompiled chat prompts with per-model token budgets.
+
+Each ``PromptTemplate`` is parsed once into its literal segments (interned,
+since every request shares them) and the names of the fields between them.
+The token count of the literal text is computed at the same time, so sizing
+a prompt only encodes the per-request values. Encoders come from
+``tiktoken`` and are cached per model.
+
+``ChatPrompt.messages`` renders the system and user messages for a model
+and keeps them within that model's context window minus the tokens
+reserved for the reply. When the values are too long, the prompt's
+truncatable fields are cut, in the order given, until the prompt fits, so
+an oversized document or pasted email never causes a context-length error.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import re
+import string
+import sys
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Context window of each model, in tokens
+MODEL_CONTEXT_TOKENS: Dict[str, int] = {
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+# Tokens kept free for the reply (matches OpenAISettings.max_tokens)
+RESPONSE_TOKENS = 2000
+# Fixed cost of the chat format: per message, plus the reply primer
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMER_TOKENS = 3
+TRUNCATION_MARKER = " [...]"
+
+_formatter = string.Formatter()
+_prompts: Dict[str, "ChatPrompt"] = {}
+_prompts_lock = threading.Lock()
+
+
+class _ApproximateEncoding:
+    """Stand-in for a tiktoken encoding when its BPE data is unavailable.
+
+    Counts one token per four characters of a word, which over- rather than
+    under-estimates English text.
+    """
+
+    name = "approximate"
+    _piece = re.compile(r"\s*\S{1,4}|\s+")
+
+    def encode(self, text: str) -> List[str]:
+        return self._piece.findall(text)
+
+    def decode(self, tokens: Sequence[str]) -> str:
+        return "".join(tokens)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """Return the (cached) tiktoken encoding for ``model``."""
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as exc:  # tiktoken missing or its BPE file not downloadable
+        logger.warning("Using approximate token counts for %s: %s", model, exc)
+        return _ApproximateEncoding()
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Return the number of tokens ``text`` takes for ``model``."""
+    return len(get_encoding(model).encode(text)) if text else 0
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str) -> str:
+    """Return ``text`` cut to at most ``max_tokens`` tokens for ``model``.
+
+    A cut text ends with ``TRUNCATION_MARKER``, whose tokens count towards
+    ``max_tokens``.
+    """
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    keep = max_tokens - count_tokens(TRUNCATION_MARKER, model)
+    if keep <= 0:
+        return ""
+    return encoding.decode(tokens[:keep]).rstrip() + TRUNCATION_MARKER
+
+
+def context_tokens(model: str) -> int:
+    """Return the context window of ``model`` in tokens."""
+    if model in MODEL_CONTEXT_TOKENS:
+        return MODEL_CONTEXT_TOKENS[model]
+    # Dated snapshots ("gpt-4o-2024-08-06") share their family's window
+    family = max(
+        (name for name in MODEL_CONTEXT_TOKENS if model.startswith(name)),
+        key=len,
+        default=None,
+    )
+    return MODEL_CONTEXT_TOKENS[family] if family else DEFAULT_CONTEXT_TOKENS
+
+
+def reply_token_reserve() -> int:
+    """Return the reply size to reserve, read from ``OpenAISettings``."""
+    try:
+        from email_templates_gen.config.settings import OpenAISettings
+
+        return OpenAISettings(api_key="").max_tokens
+    except Exception:  # config package not importable or settings invalid
+        return RESPONSE_TOKENS
+
+
+def prompt_budget(model: str, response_tokens: int = RESPONSE_TOKENS) -> int:
+    """Return the tokens available to the prompt of a request to ``model``."""
+    return context_tokens(model) - response_tokens
+
+
+class PromptTemplate:
+    """A ``str.format`` template parsed once into literals and fields."""
+
+    def __init__(self, template: str) -> None:
+        self.template = template
+        literals: List[str] = []
+        fields: List[str] = []
+        for literal, field, spec, conversion in _formatter.parse(template):
+            if spec or conversion:
+                raise ValueError(f"Format specs are not supported: {{{field}}}")
+            literals.append(sys.intern(literal))
+            if field is not None:
+                if not field.isidentifier():
+                    raise ValueError(f"Unsupported field {{{field}}}")
+                fields.append(field)
+        if len(literals) == len(fields):
+            literals.append("")
+        self.literals: Tuple[str, ...] = tuple(literals)
+        self.fields: Tuple[str, ...] = tuple(fields)
+        self._static = sys.intern("".join(self.literals))
+
+    def render(self, values: Mapping[str, str]) -> str:
+        """Fill every field from ``values``."""
+        parts = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            parts.append(values[field])
+            parts.append(literal)
+        return "".join(parts)
+
+    def static_tokens(self, model: str) -> int:
+        """Tokens taken by the literal text alone."""
+        return _static_tokens(self._static, model)
+
+
+@lru_cache(maxsize=256)
+def _static_tokens(text: str, model: str) -> int:
+    return count_tokens(text, model)
+
+
+@dataclass(frozen=True)
+class RenderedPrompt:
+    """Chat messages ready to send, with their size."""
+
+    messages: List[Dict[str, str]]
+    tokens: int
+    truncated: Tuple[str, ...]
+
+
+class ChatPrompt:
+    """A system and user prompt pair registered under ``name``.
+
+    Args:
+        name: Registry key.
+        system: System message template.
+        user: User message template.
+        truncatable: Fields that may be cut to fit the budget, cut first to
+            last. Other fields are always sent whole.
+    """
+
+    def __init__(
+        self, name: str, system: str, user: str, truncatable: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.system = PromptTemplate(system)
+        self.user = PromptTemplate(user)
+        self.truncatable = tuple(truncatable)
+        fields = set(self.system.fields) | set(self.user.fields)
+        unknown = set(self.truncatable) - fields
+        if unknown:
+            raise ValueError(f"{name}: truncatable fields not in prompt: {unknown}")
+
+    def _field_count(self, field: str) -> int:
+        return self.system.fields.count(field) + self.user.fields.count(field)
+
+    def _fixed_tokens(self, model: str) -> int:
+        return (
+            self.system.static_tokens(model)
+            + self.user.static_tokens(model)
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+            + REPLY_PRIMER_TOKENS
+        )
+
+    def room_for(
+        self,
+        field: str,
+        model: str,
+        response_tokens: int = RESPONSE_TOKENS,
+        **values: str,
+    ) -> int:
+        """Return the tokens ``field`` may take once the other ``values`` are in."""
+        used = self._fixed_tokens(model) + sum(
+            count_tokens(value, model) * self._field_count(name)
+            for name, value in values.items()
+            if name != field
+        )
+        uses = self._field_count(field) or 1
+        return max(0, (prompt_budget(model, response_tokens) - used) // uses)
+
+    def messages(
+        self, model: str, response_tokens: int = RESPONSE_TOKENS, **values: str
+    ) -> RenderedPrompt:
+        """Render the messages for ``model`` within its prompt budget.
+
+        Raises ``ValueError`` when the prompt is still over budget after
+        emptying every truncatable field.
+        """
+        budget = prompt_budget(model, response_tokens)
+        fixed = self._fixed_tokens(model)
+        sizes = {field: count_tokens(values[field], model) for field in values}
+        total = fixed + sum(size * self._field_count(f) for f, size in sizes.items())
+
+        truncated: List[str] = []
+        for field in self.truncatable:
+            if total <= budget:
+                break
+            uses = self._field_count(field)
+            excess = total - budget
+            allowed = max(0, sizes[field] - math.ceil(excess / uses))
+            values[field] = truncate_tokens(values[field], allowed, model)
+            new_size = count_tokens(values[field], model)
+            total -= (sizes[field] - new_size) * uses
+            sizes[field] = new_size
+            truncated.append(field)
+        if total > budget:
+            raise ValueError(
+                f"{self.name} prompt needs {total} tokens; {model} allows {budget}"
+            )
+        if truncated:
+            logger.info("Truncated %s to fit the %s prompt budget", truncated, model)
+
+        messages = [
+            {"role": "system", "content": self.system.render(values)},
+            {"role": "user", "content": self.user.render(values)},
+        ]
+        return RenderedPrompt(messages, total, tuple(truncated))
+
+
+def register_prompt(prompt: ChatPrompt) -> ChatPrompt:
+    """Add ``prompt`` to the registry, replacing one with the same name."""
+    with _prompts_lock:
+        _prompts[prompt.name] = prompt
+    return prompt
+
+
+def get_prompt(name: str) -> ChatPrompt:
+    """Return the registered prompt called ``name``."""
+    return _prompts[name]
+
+
+register_prompt(
+    ChatPrompt(
+        "email",
+        system="You write high-quality emails for professionals.",
+        user="""
+You are a helpful assistant that writes emails in a {tone} tone for business use.
+{guidance}
+Purpose: {purpose}
+Input:
+{input_text}
+
+Write the full email, including greeting and sign-off.
+""",
+        truncatable=("guidance", "input_text"),
+    )
+)
+
+register_prompt(
+    ChatPrompt(
+        "learnbot",
+        system=(
+            "You are a friendly and knowledgeable assistant who helps explain "
+            "this AI email project."
+        ),
+        user="""
+You are an AI assistant that explains how a project works using internal documentation.
+
+Context:
+{context}
+
+Question:
+{question}
+
+Answer clearly and helpfully:
+""",
+        truncatable=("context", "question"),
+    )
+)
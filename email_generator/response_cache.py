@@ -0,0 +1,243 @@
+"""Cache of generated emails keyed by the request that produced them.
+
+Two tiers sit in front of the OpenAI call:
+
+* an exact tier keyed by ``sha256(model, tone, purpose, examples,
+  normalized input)``;
+* an optional near-duplicate tier that embeds the normalized input and
+  reuses a cached email when a previous request with the same model, tone,
+  purpose and examples is at least ``similarity_threshold`` cosine-similar.
+
+``examples`` are the ids of the template examples put in the prompt, so an
+email is not served once the templates it was generated from change.
+
+Entries expire after ``ttl_seconds`` and the least recently used ones are
+evicted beyond ``max_entries``. Hits are replayed with ``replay_tokens`` so
+callers consuming a token stream behave exactly as on a miss.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence
+
+from email_generator.text import normalize_text
+
+RESPONSE_CACHE_PATH = Path(
+    os.getenv("RESPONSE_CACHE_PATH", "models/response_cache.sqlite3")
+)
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5_000
+DEFAULT_SIMILARITY_THRESHOLD = 0.97
+
+_TOKEN = re.compile(r"\s*\S+\s*")
+
+_caches: Dict[str, "ResponseCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def replay_tokens(text: str) -> Iterator[str]:
+    """Yield ``text`` in word-sized pieces, like a streamed completion."""
+    for match in _TOKEN.finditer(text):
+        yield match.group(0)
+
+
+class ResponseCache:
+    """SQLite-backed cache of generated emails with TTL and LRU eviction.
+
+    Args:
+        path: SQLite file (``":memory:"`` for a private in-memory cache).
+        ttl_seconds: Age after which an entry is no longer served.
+        max_entries: Entries kept before the least recently used are evicted.
+        embeddings: Optional embeddings provider enabling the near-duplicate
+            tier (for example ``learnbot.embedding_cache.CachedEmbeddings``).
+        similarity_threshold: Minimum cosine similarity for a near-duplicate.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = RESPONSE_CACHE_PATH,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        embeddings=None,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, scope TEXT NOT NULL, vector BLOB, "
+            "response TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_scope ON responses (scope)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _scope(
+        model: str, tone: str, purpose: str, examples: Sequence[str] = ()
+    ) -> str:
+        return "\0".join([model, tone.lower(), purpose.lower(), *examples])
+
+    @classmethod
+    def _key(
+        cls,
+        input_text: str,
+        tone: str,
+        purpose: str,
+        model: str,
+        examples: Sequence[str] = (),
+    ) -> str:
+        scope = cls._scope(model, tone, purpose, examples)
+        payload = f"{scope}\0{normalize_text(input_text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _embed(self, input_text: str):
+        import numpy as np
+
+        vector = np.asarray(
+            self.embeddings.embed_query(normalize_text(input_text).casefold()),
+            dtype=np.float32,
+        )
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def get(
+        self,
+        input_text: str,
+        tone: str,
+        purpose: str,
+        model: str,
+        examples: Sequence[str] = (),
+    ) -> Optional[str]:
+        """Return a cached email for the request, or ``None`` on a miss."""
+        now = time.time()
+        oldest = now - self.ttl_seconds
+        key = self._key(input_text, tone, purpose, model, examples)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created >= ?",
+                (key, oldest),
+            ).fetchone()
+        if row is None and self.embeddings is not None:
+            key, row = self._nearest(
+                input_text, self._scope(model, tone, purpose, examples), oldest
+            )
+        if row is None:
+            return None
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return row[0]
+
+    def _nearest(self, input_text, scope, oldest):
+        import numpy as np
+
+        with self._lock:
+            candidates = self._conn.execute(
+                "SELECT key, vector, response FROM responses "
+                "WHERE scope = ? AND created >= ? AND vector IS NOT NULL",
+                (scope, oldest),
+            ).fetchall()
+        if not candidates:
+            return None, None
+        query = self._embed(input_text)
+        # Rows embedded by another model may have a different dimension
+        candidates = [row for row in candidates if len(row[1]) == query.nbytes]
+        if not candidates:
+            return None, None
+        matrix = np.frombuffer(
+            b"".join(vector for _, vector, _ in candidates), dtype=np.float32
+        ).reshape(len(candidates), -1)
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None, None
+        key, _, response = candidates[best]
+        return key, (response,)
+
+    def put(
+        self,
+        input_text: str,
+        tone: str,
+        purpose: str,
+        model: str,
+        response: str,
+        examples: Sequence[str] = (),
+    ) -> None:
+        """Store ``response`` for the request and enforce TTL and size bounds."""
+        now = time.time()
+        vector = None
+        if self.embeddings is not None:
+            vector = array("f", self._embed(input_text).tolist()).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, scope, vector, response, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self._key(input_text, tone, purpose, model, examples),
+                    self._scope(model, tone, purpose, examples),
+                    vector,
+                    response,
+                    now,
+                    now,
+                ),
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self) -> None:
+        """Remove every cached email."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def get_response_cache(path: Path | str = RESPONSE_CACHE_PATH) -> ResponseCache:
+    """Return the process-wide exact-match cache stored at ``path``."""
+    key = str(Path(path).resolve())
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = ResponseCache(path)
+        return _caches[key]
@@ -0,0 +1,116 @@
+"""Bounded-concurrency scheduling for async OpenAI generations.
+
+``GenerationScheduler`` caps how many generations run at once in a process
+(a semaphore) and how quickly each API key may start new requests (a token
+bucket per key), so a single event loop can drive hundreds of concurrent
+streams without exceeding the account's rate limits.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from email_generator.openai_client import client_options
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at ``rate`` tokens per second."""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until ``tokens`` are available and consume them."""
+        # Waiters queue on the lock so tokens are handed out in arrival order
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+class GenerationScheduler:
+    """Limit concurrent generations and per-key request rate.
+
+    Args:
+        max_concurrency: Generations allowed in flight at once.
+        requests_per_minute: Requests each API key may start per minute.
+        burst: Requests a key may start back-to-back before being throttled;
+            defaults to one second's worth of budget.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        requests_per_minute: Optional[float] = None,
+        burst: Optional[float] = None,
+    ) -> None:
+        options = client_options()
+        self.max_concurrency = max_concurrency or options["max_concurrent_generations"]
+        self.requests_per_minute = requests_per_minute or options["requests_per_minute"]
+        self.burst = burst
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.active = 0
+
+    def _bucket(self, api_key: str) -> TokenBucket:
+        key = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate = self.requests_per_minute / 60.0
+            bucket = TokenBucket(rate, self.burst)
+            self._buckets[key] = bucket
+        return bucket
+
+    @asynccontextmanager
+    async def slot(self, api_key: str) -> AsyncIterator[None]:
+        """Hold one concurrency slot, started within ``api_key``'s rate budget."""
+        if self._semaphore is None:
+            # Created lazily so the semaphore binds to the running event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            await self._bucket(api_key).acquire()
+            self.active += 1
+            try:
+                yield
+            finally:
+                self.active -= 1
+
+
+_default_schedulers: (
+    "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, GenerationScheduler]"
+) = weakref.WeakKeyDictionary()
+
+
+def get_scheduler() -> GenerationScheduler:
+    """Return the default scheduler for the running event loop."""
+    loop = asyncio.get_running_loop()
+    scheduler = _default_schedulers.get(loop)
+    if scheduler is None:
+        scheduler = GenerationScheduler()
+        _default_schedulers[loop] = scheduler
+    return scheduler
@@ -1,7 +1,19 @@
 """Utilities for interacting with SharePoint to manage email templates."""
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from email_generator.template_cache import TemplateCache, get_template_cache
 
 try:
     from office365.sharepoint.client_context import ClientContext
@@ -10,6 +22,21 @@ except Exception:  # pragma: no cover - library not installed in test env
     ClientContext = None  # type: ignore
     UserCredential = None  # type: ignore
 
+# Files larger than one chunk are sent through an upload session, so memory
+# use is bounded by the chunk size whatever the file size.
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+UPLOAD_STATE_SUFFIX = ".upload.json"
+
+ProgressCallback = Callable[[int, int], None]
+
+# Authenticated contexts are reused until idle this long, and rebuilt (so
+# they re-authenticate) once this old.
+CONTEXT_IDLE_TIMEOUT = 15 * 60
+CONTEXT_MAX_AGE = 60 * 60
+AUTH_ERROR_STATUSES = {401, 403}
+
+T = TypeVar("T")
+
 
 def _require_office365() -> None:
     if ClientContext is None or UserCredential is None:
@@ -18,24 +45,337 @@ def _require_office365() -> None:
         )
 
 
+def _is_auth_error(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in AUTH_ERROR_STATUSES
+
+
+@dataclass
+class _PooledContext:
+    ctx: Any
+    secret: str
+    created: float
+    last_used: float
+
+
+class ClientContextPool:
+    """Authenticated ``ClientContext`` objects keyed by (site_url, username).
+
+    A ``ClientContext`` caches its authentication cookies and request digest,
+    so reusing one skips the sign-in round trips a new context makes. Contexts
+    are not safe to share between concurrent callers, so each is leased to one
+    caller at a time; concurrent callers for the same key get their own.
+    Contexts idle for ``idle_timeout`` seconds are closed, and contexts older
+    than ``max_age`` are rebuilt so their credentials are renewed.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = CONTEXT_IDLE_TIMEOUT,
+        max_age: float = CONTEXT_MAX_AGE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.clock = clock
+        self._idle: Dict[Tuple[str, str], List[_PooledContext]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _create(site_url: str, username: str, password: str):
+        _require_office365()
+        return ClientContext(site_url).with_credentials(
+            UserCredential(username, password)
+        )
+
+    def _is_stale(self, entry: _PooledContext, now: float) -> bool:
+        return (
+            now - entry.last_used > self.idle_timeout
+            or now - entry.created > self.max_age
+        )
+
+    def evict_idle(self) -> int:
+        """Drop idle or expired contexts; return how many were dropped."""
+        now = self.clock()
+        dropped = 0
+        with self._lock:
+            for key in list(self._idle):
+                fresh = [e for e in self._idle[key] if not self._is_stale(e, now)]
+                dropped += len(self._idle[key]) - len(fresh)
+                if fresh:
+                    self._idle[key] = fresh
+                else:
+                    del self._idle[key]
+        return dropped
+
+    @contextmanager
+    def lease(self, site_url: str, username: str, password: str) -> Iterator[Any]:
+        """Borrow a context for ``(site_url, username)`` for one operation.
+
+        The context goes back to the pool afterwards unless the operation
+        failed authentication, in which case it and the other idle contexts
+        for the key are discarded.
+        """
+        self.evict_idle()
+        key = (site_url, username)
+        secret = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        entry = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            for candidate in reversed(idle):
+                if candidate.secret == secret:
+                    idle.remove(candidate)
+                    entry = candidate
+                    break
+        if entry is None:
+            now = self.clock()
+            entry = _PooledContext(
+                self._create(site_url, username, password), secret, now, now
+            )
+        try:
+            yield entry.ctx
+        except Exception as error:
+            if _is_auth_error(error):
+                # Contexts signed in with the same credentials have most
+                # likely expired too: make the next lease authenticate afresh
+                with self._lock:
+                    self._idle.pop(key, None)
+            else:
+                self._release(key, entry)
+            raise
+        else:
+            self._release(key, entry)
+
+    def _release(self, key: Tuple[str, str], entry: _PooledContext) -> None:
+        entry.last_used = self.clock()
+        with self._lock:
+            self._idle.setdefault(key, []).append(entry)
+
+    def run(
+        self,
+        site_url: str,
+        username: str,
+        password: str,
+        operation: Callable[[Any], T],
+    ) -> T:
+        """Return ``operation(ctx)`` on a pooled context.
+
+        If the pooled context's session has expired (401/403), the operation
+        is retried once on a newly authenticated context.
+        """
+        try:
+            with self.lease(site_url, username, password) as ctx:
+                return operation(ctx)
+        except Exception as error:
+            if not _is_auth_error(error):
+                raise
+        with self.lease(site_url, username, password) as ctx:
+            return operation(ctx)
+
+    def clear(self) -> None:
+        """Forget every pooled context."""
+        with self._lock:
+            self._idle.clear()
+
+
+_context_pool = ClientContextPool()
+
+
+def get_context_pool() -> ClientContextPool:
+    """Return the process-wide ``ClientContextPool``."""
+    return _context_pool
+
+
 def upload_template(
     site_url: str,
     folder_url: str,
     template_path: Path | str,
     username: str,
     password: str,
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
 ) -> str:
-    """Upload a template file to SharePoint and return its server-relative URL."""
+    """Upload a template file to SharePoint and return its server-relative URL.
+
+    The upload runs on a pooled, already authenticated context (see
+    ``ClientContextPool``). Files larger than ``chunk_size`` are streamed in
+    chunks through an upload session (see ``upload_in_chunks``).
+    ``progress(uploaded, total)`` is called after each chunk.
+    """
     _require_office365()
+    return get_context_pool().run(
+        site_url,
+        username,
+        password,
+        lambda ctx: upload_with_context(
+            ctx, folder_url, template_path, chunk_size, progress
+        ),
+    )
+
+
+def upload_with_context(
+    ctx,
+    folder_url: str,
+    template_path: Path | str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+) -> str:
+    """Upload a file using an existing context; see ``upload_template``."""
     path = Path(template_path)
-    ctx = ClientContext(site_url).with_credentials(UserCredential(username, password))
+    size = path.stat().st_size
+    if size > chunk_size:
+        return upload_in_chunks(ctx, folder_url, path, chunk_size, progress)
     target_folder = ctx.web.get_folder_by_server_relative_url(folder_url)
     with path.open("rb") as f:
         uploaded_file = target_folder.upload_file(path.name, f.read())
     ctx.execute_query()
+    if progress:
+        progress(size, size)
     return uploaded_file.serverRelativeUrl
 
 
+def upload_state_path(template_path: Path | str) -> Path:
+    """Return the file recording an interrupted upload of ``template_path``."""
+    path = Path(template_path)
+    return path.with_name(path.name + UPLOAD_STATE_SUFFIX)
+
+
+def _save_upload_state(state_path: Path, state: dict) -> None:
+    tmp = state_path.with_name(state_path.name + ".tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, state_path)
+
+
+def _load_upload_state(state_path: Path, source: dict) -> Optional[dict]:
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    # Only resume if it is the same file going to the same place
+    if any(state.get(key) != value for key, value in source.items()):
+        return None
+    return state
+
+
+def upload_in_chunks(
+    ctx,
+    folder_url: str,
+    template_path: Path | str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+) -> str:
+    """Upload a file with a start/continue/finish upload session.
+
+    Only one chunk is held in memory at a time. After every chunk the upload
+    id and committed offset are written next to the file (see
+    ``upload_state_path``), so calling this again after an interruption
+    resumes from the last committed chunk instead of starting over. The
+    state file is removed once the upload is finished.
+    """
+    path = Path(template_path)
+    stat = path.stat()
+    state_path = upload_state_path(path)
+    source = {
+        "folder": folder_url,
+        "name": path.name,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+    state = _load_upload_state(state_path, source)
+    if state is not None:
+        try:
+            return _send_chunks(ctx, path, state, state_path, chunk_size, progress)
+        except Exception:
+            state_path.unlink(missing_ok=True)  # session expired: start over
+
+    target_folder = ctx.web.get_folder_by_server_relative_url(folder_url)
+    placeholder = target_folder.upload_file(path.name, b"")
+    ctx.execute_query()
+    state = {
+        **source,
+        "file_url": placeholder.serverRelativeUrl,
+        "upload_id": str(uuid.uuid4()),
+        "offset": 0,
+    }
+    return _send_chunks(ctx, path, state, state_path, chunk_size, progress)
+
+
+def _send_chunks(ctx, path, state, state_path, chunk_size, progress) -> str:
+    total = state["size"]
+    offset = state["offset"]
+    upload_id = state["upload_id"]
+    target_file = ctx.web.get_file_by_server_relative_url(state["file_url"])
+    with path.open("rb") as f:
+        while True:
+            # Continue from the offset the server has committed
+            f.seek(offset)
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise OSError(f"{path} shrank to {offset} bytes during upload")
+            if offset + len(chunk) >= total:
+                target_file.finish_upload(upload_id, offset, chunk)
+                ctx.execute_query()
+                state_path.unlink(missing_ok=True)
+                if progress:
+                    progress(total, total)
+                return state["file_url"]
+            if offset == 0:
+                result = target_file.start_upload(upload_id, chunk)
+            else:
+                result = target_file.continue_upload(upload_id, offset, chunk)
+            ctx.execute_query()
+            offset = int(result.value)
+            _save_upload_state(state_path, {**state, "offset": offset})
+            if progress:
+                progress(offset, total)
+
+
+def fetch_template(
+    site_url: str,
+    file_url: str,
+    username: str,
+    password: str,
+    cache: Optional[TemplateCache] = None,
+) -> Path:
+    """Return a local path holding the current version of a SharePoint file.
+
+    The file's ETag is read with a small metadata request. When it matches
+    the copy in ``cache`` (the shared ``TemplateCache`` by default), that copy
+    is served from disk; otherwise the file is streamed into the cache.
+    """
+    _require_office365()
+    cache = cache or get_template_cache()
+
+    def fetch(ctx) -> Path:
+        remote = ctx.web.get_file_by_server_relative_url(file_url)
+        remote.select(["ETag", "TimeLastModified"]).get()
+        ctx.execute_query()
+        etag = remote.properties.get("ETag")
+        last_modified = remote.properties.get("TimeLastModified")
+        cached = cache.get(site_url, file_url)
+        if cached is not None and etag and cached.etag == etag:
+            return cached.path
+
+        with cache.staging_file() as staged:
+            try:
+                remote.download_session(staged).execute_query()
+            except BaseException:
+                staged.close()
+                os.unlink(staged.name)
+                raise
+        entry = cache.put(
+            site_url,
+            file_url,
+            staged.name,
+            etag=etag,
+            last_modified=str(last_modified) if last_modified else None,
+        )
+        return entry.path
+
+    return get_context_pool().run(site_url, username, password, fetch)
+
+
 def download_template(
     site_url: str,
     file_url: str,
@@ -43,10 +383,11 @@ def download_template(
     username: str,
     password: str,
 ) -> Path:
-    """Download a template from SharePoint to the local filesystem."""
-    _require_office365()
+    """Download a template from SharePoint to the local filesystem.
+
+    The file is read through the local template cache (see
+    ``fetch_template``), so an unchanged file is copied from disk.
+    """
     dest = Path(destination_path)
-    ctx = ClientContext(site_url).with_credentials(UserCredential(username, password))
-    sharepoint_file = ctx.web.get_file_by_server_relative_url(file_url)
-    sharepoint_file.download(dest.as_posix()).execute_query()
+    shutil.copyfile(fetch_template(site_url, file_url, username, password), dest)
     return dest
@@ -0,0 +1,347 @@
+"""Mirror a SharePoint folder of templates to and from a local directory.
+
+The remote folder is listed once. Its files are compared with a manifest
+kept in the local directory (``.sharepoint-manifest.json``), which records
+each file's ETag and size as last synced and the local size and mtime it
+was written with. Only files that changed on either side are transferred,
+over a bounded thread pool where each worker leases its own pooled
+``ClientContext``. Downloads are written to a temporary file and renamed
+into place, so a local file is never left half-written. Dotfiles and the
+resume state of chunked uploads (``*.upload.json``) are never synced.
+
+When downloading, a synced file deleted locally is downloaded again and one
+deleted remotely is deleted locally (unless it was edited since). Local
+deletions are never propagated to SharePoint.
+
+Usage::
+
+    email-templates-gen sync templates/ --direction download --workers 8
+    python -m email_generator.sharepoint_sync templates/ --site-url ... \\
+        --folder-url "/sites/team/Shared Documents/EmailTemplates"
+"""
+
+from __future__ import annotations
+
+import argparse
+import filecmp
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from email_generator import sharepoint_integration as sp
+
+MANIFEST_NAME = ".sharepoint-manifest.json"
+DEFAULT_WORKERS = 8
+DIRECTIONS = ("download", "upload", "both")
+
+
+@dataclass
+class SyncReport:
+    """Outcome and throughput of a folder sync."""
+
+    downloaded: List[str] = field(default_factory=list)
+    uploaded: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    conflicts: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    bytes_transferred: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Bytes transferred per second."""
+        return self.bytes_transferred / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        files = len(self.downloaded) + len(self.uploaded)
+        return (
+            f"{len(self.downloaded)} downloaded, {len(self.uploaded)} uploaded, "
+            f"{len(self.deleted)} deleted, {self.unchanged} unchanged, "
+            f"{len(self.conflicts)} conflicts, "
+            f"{len(self.failed)} failed in {self.elapsed:.1f} s "
+            f"({files / self.elapsed if self.elapsed else 0.0:.1f} files/s, "
+            f"{self.throughput / 1024:.1f} KiB/s)"
+        )
+
+
+def read_manifest(local_dir: Path | str) -> Dict[str, dict]:
+    """Return the sync manifest of ``local_dir`` (empty if never synced)."""
+    try:
+        return json.loads((Path(local_dir) / MANIFEST_NAME).read_text("utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(local_dir: Path | str, manifest: Dict[str, dict]) -> None:
+    path = Path(local_dir) / MANIFEST_NAME
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), "utf-8")
+    os.replace(tmp, path)
+
+
+def list_remote(ctx, folder_url: str) -> Dict[str, dict]:
+    """Return ``{name: {"url", "etag", "size"}}`` for files in a folder."""
+    folder = ctx.web.get_folder_by_server_relative_url(folder_url)
+    files = folder.files.get().select(["Name", "ServerRelativeUrl", "ETag", "Length"])
+    ctx.execute_query()
+    return {
+        f.properties["Name"]: {
+            "url": f.properties["ServerRelativeUrl"],
+            "etag": f.properties.get("ETag"),
+            "size": int(f.properties.get("Length", -1)),
+        }
+        for f in files
+    }
+
+
+def _local_state(path: Path) -> dict:
+    stat = path.stat()
+    return {"local_size": stat.st_size, "local_mtime_ns": stat.st_mtime_ns}
+
+
+def _locally_changed(path: Path, entry: Optional[dict]) -> bool:
+    if not path.exists():
+        return False
+    if entry is None:
+        return True
+    state = _local_state(path)
+    return any(state[key] != entry.get(key) for key in state)
+
+
+def _remotely_changed(remote: Optional[dict], entry: Optional[dict]) -> bool:
+    if remote is None:
+        return False
+    return entry is None or (remote["etag"], remote["size"]) != (
+        entry.get("etag"),
+        entry.get("size"),
+    )
+
+
+def _download(ctx, remote: dict, dest: Path) -> int:
+    """Stream a remote file into ``dest`` atomically; return bytes written."""
+    handle = tempfile.NamedTemporaryFile(
+        dir=dest.parent, prefix=f".{dest.name}.", delete=False
+    )
+    try:
+        with handle:
+            ctx.web.get_file_by_server_relative_url(remote["url"]).download_session(
+                handle
+            ).execute_query()
+        os.replace(handle.name, dest)
+    except BaseException:
+        Path(handle.name).unlink(missing_ok=True)
+        raise
+    return dest.stat().st_size
+
+
+def _same_content(ctx, remote: dict, path: Path) -> bool:
+    """Return whether a remote file holds exactly the bytes of ``path``."""
+    handle = tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", delete=False
+    )
+    try:
+        with handle:
+            ctx.web.get_file_by_server_relative_url(remote["url"]).download_session(
+                handle
+            ).execute_query()
+        return filecmp.cmp(handle.name, path, shallow=False)
+    finally:
+        Path(handle.name).unlink(missing_ok=True)
+
+
+def _is_synced(name: str) -> bool:
+    return not name.startswith(".") and not name.endswith(sp.UPLOAD_STATE_SUFFIX)
+
+
+def _remote_etag(ctx, file_url: str) -> Optional[str]:
+    remote = ctx.web.get_file_by_server_relative_url(file_url)
+    remote.select(["ETag"]).get()
+    ctx.execute_query()
+    return remote.properties.get("ETag")
+
+
+def sync_folder(
+    site_url: str,
+    folder_url: str,
+    local_dir: Path | str,
+    username: str,
+    password: str,
+    direction: str = "download",
+    workers: int = DEFAULT_WORKERS,
+    pool: Optional[sp.ClientContextPool] = None,
+) -> SyncReport:
+    """Synchronise ``folder_url`` with ``local_dir`` and return a report.
+
+    ``direction`` is ``"download"`` (remote changes only), ``"upload"``
+    (local changes only) or ``"both"``. A file changed on both sides since
+    the last sync is reported as a conflict and left alone. So is a file
+    found on both sides on the first sync, unless both copies are identical.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {DIRECTIONS}")
+    pool = pool or sp.get_context_pool()
+    local_dir = Path(local_dir)
+    local_dir.mkdir(parents=True, exist_ok=True)
+    report = SyncReport()
+    start = time.perf_counter()
+
+    manifest = read_manifest(local_dir)
+    remote_files = {
+        name: remote
+        for name, remote in pool.run(
+            site_url, username, password, lambda ctx: list_remote(ctx, folder_url)
+        ).items()
+        if _is_synced(name)
+    }
+    local_names = {
+        p.name for p in local_dir.iterdir() if p.is_file() and _is_synced(p.name)
+    }
+
+    names = set(remote_files) | local_names
+    if direction in ("download", "both"):
+        names |= set(manifest)
+    downloads, uploads, compares = [], [], []
+    for name in sorted(names):
+        entry, remote = manifest.get(name), remote_files.get(name)
+        path = local_dir / name
+        if entry is not None and direction in ("download", "both"):
+            if remote is None:  # deleted on SharePoint since the last sync
+                if _locally_changed(path, entry):
+                    report.conflicts.append(name)
+                else:
+                    path.unlink(missing_ok=True)
+                    del manifest[name]
+                    report.deleted.append(name)
+                continue
+            if not path.exists():  # deleted locally: restore the synced copy
+                downloads.append(name)
+                continue
+        remote_changed = _remotely_changed(remote, entry)
+        local_changed = _locally_changed(local_dir / name, entry)
+        if remote_changed and local_changed:
+            if entry is None and remote["size"] == (local_dir / name).stat().st_size:
+                compares.append(name)  # never synced: a conflict unless identical
+            else:
+                report.conflicts.append(name)
+        elif remote_changed and direction in ("download", "both"):
+            downloads.append(name)
+        elif local_changed and direction in ("upload", "both"):
+            uploads.append(name)
+        else:
+            report.unchanged += 1
+
+    def download(name: str) -> dict:
+        remote = remote_files[name]
+        size = pool.run(
+            site_url,
+            username,
+            password,
+            lambda ctx: _download(ctx, remote, local_dir / name),
+        )
+        return {"etag": remote["etag"], "size": size}
+
+    def compare(name: str) -> Optional[dict]:
+        remote = remote_files[name]
+        same = pool.run(
+            site_url,
+            username,
+            password,
+            lambda ctx: _same_content(ctx, remote, local_dir / name),
+        )
+        return {"etag": remote["etag"], "size": remote["size"]} if same else None
+
+    def upload(name: str) -> dict:
+        path = local_dir / name
+
+        def send(ctx) -> Optional[str]:
+            file_url = sp.upload_with_context(ctx, folder_url, path)
+            return _remote_etag(ctx, file_url)
+
+        etag = pool.run(site_url, username, password, send)
+        return {"etag": etag, "size": path.stat().st_size}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(download, name): (name, "down") for name in downloads
+        }
+        futures.update(
+            {executor.submit(upload, name): (name, "up") for name in uploads}
+        )
+        futures.update(
+            {executor.submit(compare, name): (name, "same") for name in compares}
+        )
+        for future in as_completed(futures):
+            name, kind = futures[future]
+            try:
+                remote_state = future.result()
+            except Exception as error:  # keep syncing the other files
+                report.failed[name] = str(error)
+                continue
+            if kind == "same":
+                if remote_state is None:
+                    report.conflicts.append(name)
+                else:
+                    manifest[name] = {**remote_state, **_local_state(local_dir / name)}
+                    report.unchanged += 1
+                continue
+            manifest[name] = {**remote_state, **_local_state(local_dir / name)}
+            report.bytes_transferred += remote_state["size"]
+            (report.downloaded if kind == "down" else report.uploaded).append(name)
+
+    write_manifest(local_dir, manifest)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def main(argv=None, prog: Optional[str] = None) -> None:
+    """Command line entry point (``email-templates-gen sync``)."""
+    parser = argparse.ArgumentParser(
+        prog=prog or "python -m email_generator.sharepoint_sync",
+        description="Mirror a SharePoint folder of templates with a local directory.",
+    )
+    parser.add_argument("local_dir", help="Local directory to sync")
+    parser.add_argument("--site-url", default=os.getenv("SHAREPOINT_SITE_URL"))
+    parser.add_argument("--folder-url", default=os.getenv("SHAREPOINT_FOLDER_URL"))
+    parser.add_argument("--username", default=os.getenv("SHAREPOINT_USERNAME"))
+    parser.add_argument("--password", default=os.getenv("SHAREPOINT_PASSWORD"))
+    parser.add_argument("--direction", choices=DIRECTIONS, default="download")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args(argv)
+
+    missing = [
+        name
+        for name in ("site_url", "folder_url", "username", "password")
+        if not getattr(args, name)
+    ]
+    if missing:
+        parser.error(
+            "missing "
+            + ", ".join("--" + name.replace("_", "-") for name in missing)
+            + " (or the matching SHAREPOINT_* environment variables)"
+        )
+
+    report = sync_folder(
+        args.site_url,
+        args.folder_url,
+        args.local_dir,
+        args.username,
+        args.password,
+        direction=args.direction,
+        workers=args.workers,
+    )
+    print(report.summary())
+    for name, error in sorted(report.failed.items()):
+        print(f"failed: {name}: {error}", file=sys.stderr)
+    if report.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
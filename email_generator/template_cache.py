@@ -0,0 +1,29 @@
+"""Local template cache; see ``email_templates_gen.integrations.template_cache``.
+
+The implementation lives in the installable package, which this module
+re-exports for the Streamlit app and scripts run from a checkout.
+"""
+
+import sys
+from pathlib import Path
+
+# Add src to path for development, as app.py does
+src_path = Path(__file__).resolve().parents[1] / "src"
+if src_path.exists() and str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+from email_templates_gen.integrations.template_cache import (  # noqa: E402
+    DEFAULT_MAX_BYTES,
+    TEMPLATE_CACHE_DIR,
+    CachedTemplate,
+    TemplateCache,
+    get_template_cache,
+)
+
+__all__ = [
+    "DEFAULT_MAX_BYTES",
+    "TEMPLATE_CACHE_DIR",
+    "CachedTemplate",
+    "TemplateCache",
+    "get_template_cache",
+]
@@ -0,0 +1,281 @@
+"""Fill the canned templates directly when a request names one of them.
+
+Requests such as "Delivering Royalty Statements for 2024, payment by
+31 March 2025, finance contact finance@example.org" only need the matching
+template from ``data/raw`` with its placeholders replaced. Each template is
+compiled once into a ``FillPlan``: the literal text between placeholders and
+the slot each placeholder stands for, so rendering is a single join.
+
+Slot values are pulled from the request with ordered regular-expression
+rules (``extract_slots``). A request is served from a template only when it
+names the template (every word of its title appears), the BM25 match is
+strong for the length of the request, the template has slots but no
+free-form placeholders (such as ``[short list of any noteworthy/changing
+terms]``), and every slot was filled; otherwise ``fill`` returns ``None`` and
+the caller generates the email with the model as usual. Callers should only
+offer filling when the user asked for a template, never for replies.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from email_generator.template_store import (
+    TemplateRecord,
+    TemplateStore,
+    get_template_store,
+    tokenize,
+)
+
+# Minimum BM25 score per request term for the best template to be used; an
+# absolute threshold would let any long enough text through.
+MIN_SCORE_PER_TERM = 0.8
+
+# Placeholder text used in the templates, and the slot each one stands for.
+SLOT_PLACEHOLDERS: Dict[str, str] = {
+    "YEAR": "year",
+    "[YEAR]": "year",
+    "DATE": "date",
+    "DATES": "date",
+    "DATE(S)": "date",
+    "[DATE]": "date",
+    "JOURNAL": "journal",
+    "JOURNAL(S)": "journal",
+    "<Journal name>": "journal",
+    "<Journal Name>": "journal",
+    "NAME": "recipient",
+    "<NAME>": "recipient",
+    "EDITOR": "recipient",
+    "EDITOR/SOCIETY": "recipient",
+    "Dr. CANDIDATE": "recipient",
+    "Dr. <NAME>": "recipient",
+    "[SOCIETY]": "society",
+    "CITY": "city",
+    "CONFERENCE/MEETING": "conference",
+    "[CONFERENCE/MEETING acronym]": "conference",
+    "EMAIL": "email",
+    "[NUMBER]": "notice_months",
+    "PUB ED": "sender",
+}
+
+
+def _placeholder_pattern(text: str) -> str:
+    # Bare words must not match inside longer ones ("DATE" in "DATES",
+    # "EDITOR" in "EDITOR/SOCIETY"); bracketed placeholders delimit themselves.
+    pattern = re.escape(text)
+    if text[0].isalnum():
+        pattern = rf"(?<![\w/]){pattern}"
+    if text[-1].isalnum():
+        pattern = rf"{pattern}(?![\w/])"
+    return pattern
+
+
+_PLACEHOLDER = re.compile(
+    "(?P<slot>"
+    + "|".join(
+        _placeholder_pattern(text)
+        for text in sorted(SLOT_PLACEHOLDERS, key=len, reverse=True)
+    )
+    + r")|(?P<free>\[[^\]\n]*\]|<[^>\n]*>|\$?\b\w*XX[\w,]*)"
+)
+
+_MONTH = (
+    r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|"
+    r"Aug(?:ust)?|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)"
+)
+_NAME = r"[A-Z][a-z'’-]+(?:\s+[A-Z][a-z'’-]+)*"
+_CAPITALISED = r"[A-Z][\w&'’-]*"
+# Further capitalised words, optionally joined by "of", "and", ...
+_TITLE_TAIL = rf"(?:\s+(?:(?:of|for|and|the|&)\s+)*{_CAPITALISED})*"
+
+# Applied in order; the text matched by a rule is blanked out before the
+# next one runs, so a date's year is not also taken as the report year.
+SLOT_RULES: Tuple[Tuple[str, "re.Pattern[str]"], ...] = (
+    ("email", re.compile(r"(?P<v>[\w.+-]+@[\w-]+(?:\.[\w-]+)+)")),
+    (
+        "date",
+        re.compile(
+            rf"(?P<v>\b\d{{4}}-\d{{2}}-\d{{2}}\b|\b\d{{1,2}}/\d{{1,2}}/\d{{2,4}}\b"
+            rf"|\b\d{{1,2}}(?:st|nd|rd|th)?\s+{_MONTH}\b(?:,?\s+\d{{4}})?"
+            rf"|\b{_MONTH}\s+\d{{1,2}}(?:st|nd|rd|th)?\b(?:,?\s+\d{{4}})?)"
+        ),
+    ),
+    ("year", re.compile(r"\b(?P<v>(?:19|20)\d{2})\b")),
+    ("notice_months", re.compile(r"\b(?P<v>\d{1,2})[- ]months?\b", re.IGNORECASE)),
+    (
+        "journal",
+        re.compile(
+            rf"[\"“](?P<v>[^\"”]+)[\"”]"
+            rf"|\b(?P<v2>(?:The\s+)?Journal\s+of\s+{_CAPITALISED}{_TITLE_TAIL})"
+            rf"|\b[Jj]ournal\s+(?P<v3>{_CAPITALISED}{_TITLE_TAIL})"
+        ),
+    ),
+    (
+        "society",
+        re.compile(
+            rf"\b(?P<v>{_CAPITALISED}(?:\s+{_CAPITALISED})*?\s+"
+            rf"(?:Society|Association|Institute|Academy|Federation)"
+            rf"(?:\s+of\s+{_CAPITALISED}{_TITLE_TAIL})?)"
+        ),
+    ),
+    ("city", re.compile(rf"\bin\s+(?P<v>{_NAME})")),
+    ("conference", re.compile(r"\b(?:at|attending)\s+(?:the\s+)?(?P<v>[A-Z][\w&-]+)")),
+    (
+        "recipient",
+        re.compile(
+            rf"\b(?:to|[Dd]ear)\s+"
+            rf"(?P<v>(?:(?:Dr|Prof|Professor|Mr|Ms|Mrs)\.?\s+)?{_NAME})"
+        ),
+    ),
+    (
+        "sender",
+        re.compile(rf"\b(?:[Ff]rom|[Ss]igned(?: as)?|[Ss]ign as)\s+(?P<v>{_NAME})"),
+    ),
+)
+
+
+def extract_slots(text: str, slots: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """Return the slot values found in ``text`` by ``SLOT_RULES``.
+
+    When ``slots`` is given, rules after the last of those slots are skipped.
+    Earlier rules still run so their matches are blanked out as usual.
+    """
+    rules = SLOT_RULES
+    if slots is not None:
+        wanted = frozenset(slots)
+        last = max(
+            (i for i, (slot, _) in enumerate(rules) if slot in wanted), default=-1
+        )
+        rules = rules[: last + 1]
+    values: Dict[str, str] = {}
+    for slot, rule in rules:
+        match = rule.search(text)
+        if match is None:
+            continue
+        value = next(
+            v for k, v in match.groupdict().items() if v and k.startswith("v")
+        )
+        values[slot] = value.strip()
+        start, end = match.span()
+        text = text[:start] + " " * (end - start) + text[end:]
+    return values
+
+
+@dataclass(frozen=True)
+class FillPlan:
+    """A template split into literal text and the slots between it.
+
+    ``literals`` has one more element than ``slots``; rendering interleaves
+    them. ``free_form`` lists placeholders that need a human (or the model)
+    to write them, which makes the template ineligible for filling.
+    """
+
+    record: TemplateRecord
+    literals: Tuple[str, ...]
+    slots: Tuple[str, ...]
+    free_form: Tuple[str, ...]
+
+    @property
+    def required(self) -> frozenset:
+        return frozenset(self.slots)
+
+    @property
+    def fillable(self) -> bool:
+        return not self.free_form
+
+    def render(self, values: Mapping[str, str]) -> Optional[str]:
+        """Return the filled template, or ``None`` if a slot has no value."""
+        if not self.fillable or not self.required <= values.keys():
+            return None
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            parts.append(values[slot])
+            parts.append(literal)
+        return "".join(parts)
+
+
+def compile_template(record: TemplateRecord) -> FillPlan:
+    """Parse the placeholders of ``record`` into a ``FillPlan``."""
+    literals: List[str] = []
+    slots: List[str] = []
+    free_form: List[str] = []
+    text = record.text
+    position = 0
+    for match in _PLACEHOLDER.finditer(text):
+        if match.group("free"):
+            free_form.append(match.group("free"))
+            continue
+        literals.append(text[position : match.start()])
+        slots.append(SLOT_PLACEHOLDERS[match.group("slot")])
+        position = match.end()
+    literals.append(text[position:])
+    return FillPlan(record, tuple(literals), tuple(slots), tuple(free_form))
+
+
+class TemplateFiller:
+    """Fill the best-matching template from a request, without the model.
+
+    Args:
+        store: Templates to match against; all are compiled up front.
+        min_score_per_term: Minimum BM25 score of the best match, per term
+            of the request.
+    """
+
+    def __init__(
+        self, store: TemplateStore, min_score_per_term: float = MIN_SCORE_PER_TERM
+    ) -> None:
+        self.store = store
+        self.min_score_per_term = min_score_per_term
+        self.plans: Dict[TemplateRecord, FillPlan] = {
+            record: compile_template(record) for record in store.records
+        }
+
+    def match(self, input_text: str) -> Optional[FillPlan]:
+        """Return the plan of the template the request explicitly names.
+
+        Templates without slots are never matched: filling them would just
+        return the canned text whatever the request said.
+        """
+        hits = self.store.search(input_text, k=1)
+        if not hits:
+            return None
+        record, score = hits[0]
+        terms = tokenize(input_text)
+        if score < self.min_score_per_term * len(terms):
+            return None
+        if not set(tokenize(record.name)) <= set(terms):
+            return None
+        plan = self.plans[record]
+        return plan if plan.slots else None
+
+    def fill(
+        self, input_text: str, values: Optional[Mapping[str, str]] = None
+    ) -> Optional[str]:
+        """Return the filled template for ``input_text``, or ``None``.
+
+        ``values`` supplies slots the request itself does not mention (for
+        example the sender's name) and overrides extracted ones.
+        """
+        plan = self.match(input_text)
+        if plan is None or not plan.fillable:
+            return None
+        slots = extract_slots(input_text, plan.required)
+        if values:
+            slots.update(values)
+        return plan.render(slots)
+
+
+_filler: Optional[TemplateFiller] = None
+_filler_lock = threading.Lock()
+
+
+def get_template_filler() -> TemplateFiller:
+    """Return the process-wide filler over the repository's templates."""
+    global _filler
+    with _filler_lock:
+        if _filler is None:
+            _filler = TemplateFiller(get_template_store())
+        return _filler
@@ -0,0 +1,264 @@
+"""Embedding search over the template corpus for few-shot generation.
+
+Each template in the ``TemplateStore`` is embedded once and the unit-length
+vectors are saved as a float32 ``.npy`` matrix under ``TEMPLATE_INDEX_DIR``,
+next to a ``meta.json`` recording the embedding model and the content hash
+of every row. On startup the matrix is memory-mapped rather than read, so
+opening the index costs no embedding calls and almost no I/O; it is rebuilt
+only when the templates or the embedding model change.
+
+A lookup embeds the request once (through the shared embedding cache) and
+takes the top-k rows of a single matrix-vector product. The matching
+templates are passed to ``build_messages`` as examples to follow.
+
+Precompute the index ahead of time with::
+
+    python -m email_generator.template_retriever            # build if stale
+    python -m email_generator.template_retriever --rebuild  # always re-embed
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from email_generator.template_store import (
+    TemplateRecord,
+    TemplateStore,
+    get_template_store,
+)
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_INDEX_DIR = Path(
+    os.getenv("TEMPLATE_INDEX_DIR", "models/template_index")
+)
+VECTORS_FILE = "vectors.npy"
+META_FILE = "meta.json"
+INDEX_FORMAT_VERSION = 1
+DEFAULT_TOP_K = 2
+# Templates less similar than this to the request are not used as examples.
+DEFAULT_MIN_SIMILARITY = 0.3
+
+_retrievers: Dict[Tuple[str, Optional[str], Optional[str]], "TemplateRetriever"] = {}
+_retrievers_lock = threading.Lock()
+# One lock per key, so building one index does not block other keys
+_build_locks: Dict[Tuple[str, Optional[str], Optional[str]], threading.Lock] = {}
+
+
+def record_id(record: TemplateRecord) -> str:
+    """Return the content hash identifying ``record`` in the index."""
+    return hashlib.sha256(record.text.encode("utf-8")).hexdigest()
+
+
+def _unit_rows(vectors):
+    import numpy as np
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def save_template_index(
+    store: TemplateStore, embeddings, index_dir: Path | str = TEMPLATE_INDEX_DIR
+) -> Path:
+    """Embed every template in ``store`` and write the index to ``index_dir``.
+
+    Files are written next to their final names and renamed into place so a
+    concurrent reader never maps a half-written matrix.
+    """
+    import numpy as np
+
+    path = Path(index_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    texts = [record.text for record in store.records]
+    matrix = _unit_rows(embeddings.embed_documents(texts)) if texts else None
+
+    tmp_vectors = path / f"{VECTORS_FILE}.tmp"
+    with tmp_vectors.open("wb") as f:
+        np.save(f, matrix if matrix is not None else np.zeros((0, 0), np.float32))
+    meta = {
+        "version": INDEX_FORMAT_VERSION,
+        "embedding_model": getattr(embeddings, "model", None),
+        "ids": [record_id(record) for record in store.records],
+        "built_at": time.time(),
+    }
+    tmp_meta = path / f"{META_FILE}.tmp"
+    tmp_meta.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    os.replace(tmp_vectors, path / VECTORS_FILE)
+    os.replace(tmp_meta, path / META_FILE)
+    return path
+
+
+def read_template_index_meta(
+    index_dir: Path | str = TEMPLATE_INDEX_DIR,
+) -> Optional[dict]:
+    """Return the index metadata, or ``None`` if no usable index exists."""
+    path = Path(index_dir)
+    if not (path / VECTORS_FILE).exists():
+        return None
+    try:
+        meta = json.loads((path / META_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != INDEX_FORMAT_VERSION:
+        return None
+    return meta
+
+
+def is_index_current(
+    meta: Optional[dict], store: TemplateStore, embeddings
+) -> bool:
+    """Whether ``meta`` describes ``store`` embedded with ``embeddings``."""
+    return (
+        meta is not None
+        and meta.get("embedding_model") == getattr(embeddings, "model", None)
+        and meta.get("ids") == [record_id(record) for record in store.records]
+    )
+
+
+class TemplateRetriever:
+    """Top-k cosine search over memory-mapped template embeddings.
+
+    Args:
+        store: Templates the index was built from.
+        embeddings: Provider used to embed requests (and to build the index).
+        index_dir: Where the ``.npy`` matrix and its metadata live.
+        min_similarity: Matches below this cosine similarity are dropped.
+    """
+
+    def __init__(
+        self,
+        store: TemplateStore,
+        embeddings,
+        index_dir: Path | str = TEMPLATE_INDEX_DIR,
+        min_similarity: float = DEFAULT_MIN_SIMILARITY,
+    ) -> None:
+        import numpy as np
+
+        self.store = store
+        self.embeddings = embeddings
+        self.index_dir = Path(index_dir)
+        self.min_similarity = min_similarity
+        if not is_index_current(read_template_index_meta(index_dir), store, embeddings):
+            start = time.perf_counter()
+            save_template_index(store, embeddings, index_dir)
+            logger.info(
+                "Built template index (%d templates) in %.2f s",
+                len(store),
+                time.perf_counter() - start,
+            )
+        self.vectors = np.load(self.index_dir / VECTORS_FILE, mmap_mode="r")
+
+    def search(
+        self, query: str, k: int = DEFAULT_TOP_K
+    ) -> List[Tuple[TemplateRecord, float]]:
+        """Return up to ``k`` ``(template, similarity)`` pairs, best first."""
+        import numpy as np
+
+        if not len(self.store) or k <= 0:
+            return []
+        scores = self.vectors @ _unit_rows(self.embeddings.embed_query(query))
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (self.store.records[i], float(scores[i]))
+            for i in top
+            if scores[i] >= self.min_similarity
+        ]
+
+    def examples(self, query: str, k: int = DEFAULT_TOP_K) -> List[TemplateRecord]:
+        """Return the templates to show the model as examples for ``query``."""
+        return [record for record, _ in self.search(query, k)]
+
+
+def get_template_retriever(
+    openai_api_key: Optional[str] = None,
+    index_dir: Path | str = TEMPLATE_INDEX_DIR,
+    embeddings=None,
+    store: Optional[TemplateStore] = None,
+) -> TemplateRetriever:
+    """Return the process-wide retriever for ``index_dir`` and the API key.
+
+    By default the repository's template corpus is embedded with the
+    configured learnbot embedding backend (OpenAI or local) behind the
+    shared on-disk embedding cache. A cold start embeds the corpus under a
+    lock for this key only; callers with other keys are not held up.
+    """
+    if openai_api_key is None:
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+    if embeddings is None:
+        from learnbot.rag_pipeline import default_embeddings
+
+        embeddings = default_embeddings(openai_api_key)
+    key = (
+        str(Path(index_dir).resolve()),
+        openai_api_key,
+        getattr(embeddings, "model", None),
+    )
+    with _retrievers_lock:
+        retriever = _retrievers.get(key)
+        if retriever is not None:
+            return retriever
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+    with build_lock:
+        with _retrievers_lock:
+            retriever = _retrievers.get(key)
+        if retriever is None:
+            retriever = TemplateRetriever(
+                store or get_template_store(), embeddings, index_dir
+            )
+            with _retrievers_lock:
+                _retrievers[key] = retriever
+        return retriever
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line entry point for precomputing the template index."""
+    parser = argparse.ArgumentParser(
+        prog="python -m email_generator.template_retriever",
+        description="Embed the template corpus for few-shot retrieval.",
+    )
+    parser.add_argument(
+        "--index-dir", default=str(TEMPLATE_INDEX_DIR), help="Where the index is stored"
+    )
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Re-embed even if the index is current"
+    )
+    parser.add_argument(
+        "--embedding-backend",
+        default=None,
+        help="openai or local (default: LEARNBOT_EMBEDDING_BACKEND or openai)",
+    )
+    parser.add_argument("--api-key", default=None, help="OpenAI API key")
+    args = parser.parse_args(argv)
+
+    from learnbot.rag_pipeline import default_embeddings
+
+    store = get_template_store()
+    embeddings = default_embeddings(args.api_key, args.embedding_backend)
+    start = time.perf_counter()
+    meta = read_template_index_meta(args.index_dir)
+    if args.rebuild or not is_index_current(meta, store, embeddings):
+        save_template_index(store, embeddings, args.index_dir)
+        summary = "built"
+    else:
+        summary = "already current"
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(
+        f"Template index at {args.index_dir} has {len(store)} templates "
+        f"({summary}) in {elapsed_ms:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
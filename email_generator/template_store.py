@@ -0,0 +1,187 @@
+"""In-memory store of the canned publishing templates with BM25 lookup.
+
+The templates in ``data/raw/*.txt`` (and the same emails as rows of
+``data/processed/clean_email_data.csv``) are parsed once into
+``TemplateRecord``s and indexed with ``BM25Index`` (see
+``email_generator.bm25``). For a corpus of this size that answers "which
+template is closest to this request" in well under a millisecond, letting
+the generator pick an example without an LLM round trip.
+
+Usage::
+
+    store = get_template_store()
+    match = store.closest("invite a candidate to apply for editor in chief")
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from email_generator.bm25 import BM25_B, BM25_K1, BM25Index
+from email_generator.text import normalize_text
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+TEMPLATE_DIR = REPO_ROOT / "data" / "raw"
+TEMPLATE_CSV = REPO_ROOT / "data" / "processed" / "clean_email_data.csv"
+
+# Name and subject tokens are counted this many times so a template whose
+# title matches the request outranks one that only mentions the words.
+TITLE_WEIGHT = 3
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SECTIONS = re.compile(
+    r"^\s*Email Subject:\s*\n(?P<subject>.*?)\n\s*Email Body:\s*\n(?P<body>.*)\Z",
+    re.DOTALL,
+)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i in is it me my of on or our "
+    "please that the this to was we will with you your".split()
+)
+
+_stores: Dict[Tuple[str, str], "TemplateStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case ``text`` and split it into index tokens, minus stopwords."""
+    return [t for t in _WORD.findall(text.casefold()) if t not in STOPWORDS]
+
+
+@dataclass(frozen=True)
+class TemplateRecord:
+    """One canned template: a display name, its subject line and body."""
+
+    name: str
+    subject: str
+    body: str
+    source: str
+
+    @property
+    def text(self) -> str:
+        """The template as an email, subject line first."""
+        return f"Subject: {self.subject}\n\n{self.body}" if self.subject else self.body
+
+
+def parse_template(text: str, name: str = "", source: str = "") -> TemplateRecord:
+    """Split a raw template into subject and body.
+
+    Templates are written as ``Email Subject:`` / ``Email Body:`` sections;
+    text without them is kept whole as the body. Without a ``name`` the
+    subject line is used.
+    """
+    text = text.lstrip("\ufeff").replace("\r\n", "\n")
+    match = _SECTIONS.match(text)
+    if match:
+        subject, body = match.group("subject").strip(), match.group("body").strip()
+    else:
+        subject, body = "", text.strip()
+    return TemplateRecord(name or subject or body[:60], subject, body, source)
+
+
+def load_templates(
+    template_dir: Path | str = TEMPLATE_DIR, csv_path: Path | str | None = TEMPLATE_CSV
+) -> List[TemplateRecord]:
+    """Read the ``*.txt`` templates and the ``text`` column of ``csv_path``.
+
+    ``.txt`` files are named after their file stem. CSV rows that repeat one
+    of them (after whitespace normalisation) are dropped.
+    """
+    records: List[TemplateRecord] = []
+    seen = set()
+
+    def add(text: str, name: str, source: str) -> None:
+        key = normalize_text(text.lstrip("\ufeff")).encode("utf-8")
+        digest = hashlib.sha256(key).digest()
+        if key and digest not in seen:
+            seen.add(digest)
+            records.append(parse_template(text, name, source))
+
+    for path in sorted(Path(template_dir).glob("*.txt")):
+        add(path.read_text(encoding="utf-8"), path.stem.replace("_", " "), str(path))
+
+    if csv_path is not None and Path(csv_path).exists():
+        with open(csv_path, newline="", encoding="utf-8") as handle:
+            for number, row in enumerate(csv.DictReader(handle), start=1):
+                add(row.get("text") or "", "", f"{csv_path}:{number}")
+    return records
+
+
+class TemplateStore:
+    """Inverted BM25 index over a fixed list of templates.
+
+    Args:
+        records: Templates to index; use ``TemplateStore.load()`` for the
+            repository's own corpus.
+        k1: BM25 term-frequency saturation.
+        b: BM25 length normalisation.
+    """
+
+    def __init__(
+        self, records: Iterable[TemplateRecord], k1: float = BM25_K1, b: float = BM25_B
+    ) -> None:
+        self.records: Tuple[TemplateRecord, ...] = tuple(records)
+        self._index = BM25Index(
+            (self._document_terms(record) for record in self.records), k1, b
+        )
+
+    @staticmethod
+    def _document_terms(record: TemplateRecord) -> Counter:
+        terms = Counter(tokenize(record.body))
+        for _ in range(TITLE_WEIGHT):
+            terms.update(tokenize(f"{record.name} {record.subject}"))
+        return terms
+
+    @classmethod
+    def load(
+        cls,
+        template_dir: Path | str = TEMPLATE_DIR,
+        csv_path: Path | str | None = TEMPLATE_CSV,
+    ) -> "TemplateStore":
+        """Build a store from the templates on disk."""
+        return cls(load_templates(template_dir, csv_path))
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[TemplateRecord, float]]:
+        """Return up to ``k`` ``(template, score)`` pairs, best first.
+
+        Templates sharing no token with ``query`` are never returned.
+        """
+        hits = self._index.search(tokenize(query), k)
+        return [(self.records[doc], score) for doc, score in hits]
+
+    def closest(self, query: str) -> Optional[TemplateRecord]:
+        """Return the best matching template, or ``None`` if nothing matches."""
+        hits = self.search(query, k=1)
+        return hits[0][0] if hits else None
+
+    def get(self, name: str) -> Optional[TemplateRecord]:
+        """Return the template called ``name`` (case-insensitive)."""
+        wanted = name.casefold()
+        for record in self.records:
+            if record.name.casefold() == wanted:
+                return record
+        return None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+def get_template_store(
+    template_dir: Path | str = TEMPLATE_DIR,
+    csv_path: Path | str | None = TEMPLATE_CSV,
+) -> TemplateStore:
+    """Return the process-wide store for ``template_dir`` and ``csv_path``."""
+    key = (
+        str(Path(template_dir).resolve()),
+        str(Path(csv_path).resolve()) if csv_path is not None else "",
+    )
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = TemplateStore.load(template_dir, csv_path)
+        return _stores[key]
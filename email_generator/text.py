@@ -0,0 +1,13 @@
+"""Text normalisation shared by the caches and the template store."""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Return the form of ``text`` used for cache keys."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
@@ -1,31 +1,35 @@
-from openai import OpenAI
+from email_generator.openai_client import get_openai_client
+from email_generator.prompts import get_prompt, reply_token_reserve
+from learnbot.context_packer import FETCH_K, MAX_CONTEXT_TOKENS, pack_context
+from learnbot.hybrid_retriever import get_hybrid_retriever
 from learnbot.rag_pipeline import load_index
 
-def stream_answer_from_docs(question, openai_api_key):
-    client = OpenAI(api_key=openai_api_key)
-
-    db = load_index(openai_api_key=openai_api_key)
-    docs = db.similarity_search(question, k=3)
-    context = "\n\n".join([d.page_content for d in docs])
+MODEL = "gpt-4"
 
-    prompt = f"""
-You are an AI assistant that explains how a project works using internal documentation.
 
-Context:
-{context}
+def stream_answer_from_docs(question, openai_api_key):
+    client = get_openai_client(openai_api_key)
+    prompt = get_prompt("learnbot")
+    max_tokens = reply_token_reserve()
 
-Question:
-{question}
+    # Fetch extra candidates (BM25 fused with FAISS) and keep the best ones
+    # that fit the budget left after the question and the reply
+    db = load_index(openai_api_key=openai_api_key)
+    docs = get_hybrid_retriever(db).search(question, k=FETCH_K)
+    budget = min(
+        MAX_CONTEXT_TOKENS,
+        prompt.room_for("context", MODEL, max_tokens, question=question),
+    )
+    context = pack_context(docs, budget, MODEL)
 
-Answer clearly and helpfully:
-"""
+    messages = prompt.messages(
+        MODEL, max_tokens, context=context.text, question=question
+    ).messages
 
     response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a friendly and knowledgeable assistant who helps explain this AI email project."},
-            {"role": "user", "content": prompt}
-        ],
+        model=MODEL,
+        messages=messages,
+        max_tokens=max_tokens,
         stream=True  # ✅ Streaming enabled
     )
 
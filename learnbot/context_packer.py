@@ -0,0 +1,83 @@
+"""Pack retrieved documentation chunks into a token budget.
+
+The Learn page used to send the top three chunks whatever their size. The
+packer instead takes a longer ranked candidate list, drops chunks that are
+near-duplicates of a better-ranked one (overlapping splits, docs repeating
+each other), and then adds chunks best-first while they fit the budget.
+A chunk too large for the remaining room is skipped in favour of smaller
+ones further down. The prompt carries as much of the best context as the
+budget allows and nothing beyond it.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import FrozenSet, List, Sequence
+
+from email_generator.prompts import count_tokens
+
+# Candidates fetched from the index before de-duplication and packing
+FETCH_K = 12
+# Chunks whose word 3-gram sets overlap at least this much are duplicates
+DUPLICATE_SIMILARITY = 0.8
+# Upper bound on context tokens, however large the model's window is
+MAX_CONTEXT_TOKENS = 1500
+SEPARATOR = "\n\n"
+
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class PackedContext:
+    """Chunks chosen for a prompt, joined into one context string."""
+
+    text: str = ""
+    documents: List = field(default_factory=list)
+    tokens: int = 0
+    duplicates: int = 0
+
+
+def shingles(text: str, size: int = 3) -> FrozenSet[tuple]:
+    """Return the set of ``size``-word shingles of ``text``."""
+    words = _WORD.findall(text.casefold())
+    if len(words) <= size:
+        return frozenset([tuple(words)])
+    return frozenset(tuple(words[i : i + size]) for i in range(len(words) - size + 1))
+
+
+def _similarity(a: FrozenSet[tuple], b: FrozenSet[tuple]) -> float:
+    if not a or not b:
+        return float(a == b)
+    return len(a & b) / len(a | b)
+
+
+def pack_context(
+    documents: Sequence,
+    budget: int,
+    model: str,
+    duplicate_similarity: float = DUPLICATE_SIMILARITY,
+) -> PackedContext:
+    """Pack ranked ``documents`` (best first) into at most ``budget`` tokens.
+
+    Returns the packed context in rank order.
+    """
+    packed = PackedContext()
+    kept: List[FrozenSet[tuple]] = []
+    separator_tokens = count_tokens(SEPARATOR, model)
+    for document in documents:
+        text = document.page_content.strip()
+        if not text:
+            continue
+        grams = shingles(text)
+        if any(_similarity(grams, other) >= duplicate_similarity for other in kept):
+            packed.duplicates += 1
+            continue
+        cost = count_tokens(text, model) + (separator_tokens if packed.documents else 0)
+        if packed.tokens + cost > budget:
+            continue
+        kept.append(grams)
+        packed.documents.append(document)
+        packed.tokens += cost
+    packed.text = SEPARATOR.join(d.page_content.strip() for d in packed.documents)
+    return packed
@@ -0,0 +1,196 @@
+"""Persistent, content-addressed cache for text embeddings.
+
+Vectors are stored in SQLite as packed float32 blobs keyed by
+``sha256(model, normalized text)``, so the same text is only ever sent to the
+embedding endpoint once per model, across questions and process restarts.
+The cache is bounded by entry count and evicts the least recently used rows.
+
+``CachedEmbeddings`` wraps any LangChain embeddings object and can be passed
+wherever an embeddings provider is expected (``rag_pipeline``, template
+search, ...).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from email_generator.text import normalize_text
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:  # pragma: no cover - langchain not installed
+    Embeddings = object  # type: ignore
+
+EMBEDDING_CACHE_PATH = Path(
+    os.getenv("EMBEDDING_CACHE_PATH", "models/embedding_cache.sqlite3")
+)
+DEFAULT_MAX_ENTRIES = 200_000
+
+_SQLITE_MAX_VARIABLES = 900
+
+_caches: Dict[str, "EmbeddingCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def cache_key(model: Optional[str], text: str) -> str:
+    """Return the content address of ``text`` embedded with ``model``."""
+    payload = f"{model or ''}\0{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding store with LRU eviction.
+
+    Safe to share between threads; all access goes through a single
+    connection guarded by a lock.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = EMBEDDING_CACHE_PATH,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self.path = Path(path)
+        self.max_entries = max_entries
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, "
+            "vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used "
+            "ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(
+        self, model: Optional[str], texts: Sequence[str]
+    ) -> List[Optional[List[float]]]:
+        """Return cached vectors for ``texts`` (``None`` for misses)."""
+        keys = [cache_key(model, text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for start in range(0, len(keys), _SQLITE_MAX_VARIABLES):
+                batch = keys[start : start + _SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(batch))
+                query = (
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})"
+                )
+                rows = self._conn.execute(query, batch).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        return [found.get(key) for key in keys]
+
+    def put_many(
+        self,
+        model: Optional[str],
+        texts: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+    ) -> None:
+        """Store ``vectors`` for ``texts`` and evict old entries if over budget."""
+        now = time.time()
+        rows = [
+            (cache_key(model, text), len(vector), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dim, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self) -> None:
+        """Remove every cached vector."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def get_embedding_cache(path: Path | str = EMBEDDING_CACHE_PATH) -> EmbeddingCache:
+    """Return the process-wide cache stored at ``path``."""
+    key = str(Path(path).resolve())
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(path)
+        return _caches[key]
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings provider that consults an ``EmbeddingCache`` first.
+
+    Only texts missing from the cache are forwarded to the wrapped provider,
+    in a single ``embed_documents`` call, and their vectors are stored.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        cache: Optional[EmbeddingCache] = None,
+        model: Optional[str] = None,
+    ) -> None:
+        self.embeddings = embeddings
+        self.cache = cache if cache is not None else get_embedding_cache()
+        self.model = model or getattr(embeddings, "model", None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(self.model, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Embed each distinct missing text once, even if repeated in the batch
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            computed = self.embeddings.embed_documents(unique)
+            self.cache.put_many(self.model, unique, computed)
+            by_text = dict(zip(unique, computed))
+            for i in missing:
+                vectors[i] = list(by_text[texts[i]])
+        return vectors  # type: ignore[return-value]
+
+    def embed_query(self, text: str) -> List[float]:
+        cached = self.cache.get_many(self.model, [text])[0]
+        if cached is not None:
+            return cached
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many(self.model, [text], [vector])
+        return list(vector)
@@ -0,0 +1,302 @@
+"""Batched, concurrent calls to the OpenAI embeddings endpoint.
+
+``OpenAIEmbeddings`` sends fixed-size slices of inputs one request at a
+time and retries rate limits on its own schedule. ``EmbeddingExecutor``
+instead packs consecutive texts into batches bounded by a token budget,
+sends up to ``concurrency`` batches at once under a requests- and
+tokens-per-minute limiter, and writes every vector back to the position of
+its text, so results keep the input order.
+
+When the API answers 429, the failed batch is queued again, the limiter
+pauses for the advertised ``retry-after``, and both the token budget of a
+batch and the number of batches in flight are halved. After each run of
+``GROW_AFTER`` successful requests one more batch may be in flight and the
+token budget doubles, up to ``concurrency`` and ``max_batch_tokens``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from email_generator.openai_client import client_options, get_openai_client
+from email_generator.prompts import count_tokens
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:  # pragma: no cover - langchain not installed
+    Embeddings = object  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("LEARNBOT_EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBED_CONCURRENCY = int(os.getenv("LEARNBOT_EMBED_CONCURRENCY", "4"))
+MAX_BATCH_TOKENS = int(os.getenv("LEARNBOT_EMBED_BATCH_TOKENS", "8000"))
+MIN_BATCH_TOKENS = 500
+# The endpoint accepts at most this many inputs per request
+MAX_BATCH_INPUTS = 2048
+TOKENS_PER_MINUTE = int(os.getenv("LEARNBOT_EMBED_TOKENS_PER_MINUTE", "1000000"))
+MAX_RATE_LIMIT_RETRIES = 6
+# Successful requests in a row before concurrency and batch budget grow again
+GROW_AFTER = 4
+DEFAULT_RETRY_AFTER = 1.0
+
+_executors: Dict[Tuple[str, Optional[str], str], "EmbeddingExecutor"] = {}
+_executors_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Thread-safe requests- and tokens-per-minute budget.
+
+    Both budgets refill continuously and may be spent one minute ahead at
+    most. ``pause`` holds every caller back, e.g. after a 429.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if requests_per_minute <= 0 or tokens_per_minute <= 0:
+            raise ValueError("rate limits must be positive")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = (now - self._updated) / 60.0
+        self._updated = now
+        self._requests = min(
+            self.requests_per_minute,
+            self._requests + elapsed * self.requests_per_minute,
+        )
+        self._tokens = min(
+            self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute
+        )
+
+    def acquire(self, tokens: int) -> None:
+        """Block until one request of ``tokens`` tokens fits the budget."""
+        # A batch larger than the whole per-minute budget still goes through
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    missing_requests = 1 - self._requests
+                    missing_tokens = tokens - self._tokens
+                    wait = 60.0 * max(
+                        missing_requests / self.requests_per_minute,
+                        missing_tokens / self.tokens_per_minute,
+                    )
+                    if wait <= 0:
+                        self._requests -= 1
+                        self._tokens -= tokens
+                        return
+            self._sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out budget for the next ``seconds``."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+def _is_rate_limit(exc: Exception) -> bool:
+    return getattr(exc, "status_code", None) == 429
+
+
+def _retry_after(exc: Exception, attempt: int) -> float:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[name]) * scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return min(DEFAULT_RETRY_AFTER * 2**attempt, 60.0)
+
+
+class EmbeddingExecutor(Embeddings):
+    """LangChain embeddings provider that batches and parallelises requests.
+
+    Args:
+        client: OpenAI client; its own retries are disabled so that 429s
+            reach the adaptive batching here.
+        model: Embedding model name.
+        concurrency: Batches in flight at once.
+        max_batch_tokens: Token budget of one request.
+        limiter: Shared rate limiter; by default one sized from
+            ``OpenAISettings.requests_per_minute`` and ``TOKENS_PER_MINUTE``.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str = EMBEDDING_MODEL,
+        concurrency: int = EMBED_CONCURRENCY,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        max_batch_inputs: int = MAX_BATCH_INPUTS,
+        limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        self.client = client.with_options(max_retries=0)
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.limiter = limiter or RateLimiter(
+            client_options()["requests_per_minute"], TOKENS_PER_MINUTE
+        )
+        self.batch_tokens = max_batch_tokens
+        self.active_limit = self.concurrency
+        self.requests = 0
+        self.rate_limited = 0
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def _request(self, texts: Sequence[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(model=self.model, input=list(texts))
+        ordered = sorted(response.data, key=lambda item: item.index)
+        return [list(item.embedding) for item in ordered]
+
+    def _take_batch(
+        self, queue: Deque[Tuple[int, int, int]], counts: Sequence[int]
+    ) -> Tuple[int, int, int]:
+        """Pop the next ``(start, end, attempt)`` range that fits the budget.
+
+        The caller holds ``self._lock``.
+        """
+        start, end, attempt = queue.popleft()
+        limit = max(self.batch_tokens, counts[start])
+        stop, tokens = start, 0
+        while (
+            stop < end
+            and stop - start < self.max_batch_inputs
+            and tokens + counts[stop] <= limit
+        ):
+            tokens += counts[stop]
+            stop += 1
+        if stop < end:
+            queue.appendleft((stop, end, attempt))
+        return start, stop, attempt
+
+    def _rate_limited(
+        self, exc: Exception, start: int, end: int, attempt: int, queue: Deque
+    ) -> None:
+        if attempt >= MAX_RATE_LIMIT_RETRIES:
+            raise exc
+        delay = _retry_after(exc, attempt)
+        with self._lock:
+            self.rate_limited += 1
+            self._successes = 0
+            self.batch_tokens = max(MIN_BATCH_TOKENS, self.batch_tokens // 2)
+            self.active_limit = max(1, self.active_limit // 2)
+            # Retried first, repacked to the smaller budget, so it is not starved
+            queue.appendleft((start, end, attempt + 1))
+        logger.info(
+            "Embedding rate limited; retrying in %.2f s with %d-token batches, "
+            "%d at a time",
+            delay,
+            self.batch_tokens,
+            self.active_limit,
+        )
+        self.limiter.pause(delay)
+
+    def _succeeded(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self._successes += 1
+            if self._successes >= GROW_AFTER:
+                self._successes = 0
+                self.active_limit = min(self.concurrency, self.active_limit + 1)
+                self.batch_tokens = min(self.max_batch_tokens, self.batch_tokens * 2)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        counts = [max(1, count_tokens(text, self.model)) for text in texts]
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        queue: Deque[Tuple[int, int, int]] = deque([(0, len(texts), 0)])
+        in_flight = 0
+        idle = threading.Condition(self._lock)
+
+        def worker() -> None:
+            nonlocal in_flight
+            while True:
+                with idle:
+                    # An empty queue is only final once no batch can be requeued
+                    while in_flight and (not queue or in_flight >= self.active_limit):
+                        idle.wait()
+                    if not queue:
+                        return
+                    start, end, attempt = self._take_batch(queue, counts)
+                    in_flight += 1
+                    if queue:
+                        idle.notify_all()
+                try:
+                    self.limiter.acquire(sum(counts[start:end]))
+                    try:
+                        computed = self._request(texts[start:end])
+                    except Exception as exc:
+                        if not _is_rate_limit(exc):
+                            raise
+                        self._rate_limited(exc, start, end, attempt, queue)
+                        continue
+                    vectors[start:end] = computed
+                    self._succeeded()
+                except BaseException:
+                    with idle:
+                        queue.clear()
+                    raise
+                finally:
+                    with idle:
+                        in_flight -= 1
+                        idle.notify_all()
+
+        workers = min(self.concurrency, len(texts))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="learnbot-embed"
+        ) as pool:
+            futures = [pool.submit(worker) for _ in range(workers)]
+            errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            raise errors[0]
+        return vectors  # type: ignore[return-value]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def get_embedding_executor(
+    openai_api_key: str,
+    base_url: Optional[str] = None,
+    model: str = EMBEDDING_MODEL,
+) -> EmbeddingExecutor:
+    """Return the process-wide executor for ``openai_api_key`` and ``model``.
+
+    Sharing it shares its rate limiter and learned batch budget between
+    index builds, template search and query embedding.
+    """
+    digest = hashlib.sha256((openai_api_key or "").encode("utf-8")).hexdigest()
+    key = (digest, base_url, model)
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None:
+            executor = EmbeddingExecutor(
+                get_openai_client(openai_api_key, base_url=base_url), model
+            )
+            _executors[key] = executor
+        return executor
@@ -0,0 +1,165 @@
+"""FAISS index types for the learnbot store, from exact to compressed.
+
+``rag_pipeline`` builds an exact ``IndexFlatL2`` by default, which is the
+right choice for the handful of files in ``docs/``. For corpora of tens of
+thousands of chunks, ``LEARNBOT_INDEX_TYPE`` selects an approximate or
+compressed index instead:
+
+============  ====================  ==========================================
+type          FAISS factory         trade-off
+============  ====================  ==========================================
+flat          ``Flat``              exact; 4 bytes per dimension
+flat-fp16     ``SQfp16``            exact ranking in practice; half the memory
+ivf-flat      ``IVF{n},Flat``       searches ``nprobe`` of ``n`` clusters
+ivf-fp16      ``IVF{n},SQfp16``     IVF with float16 vectors
+ivf-pq        ``IVF{n},PQ{m}x8``    ``m`` bytes per vector; lowest memory
+hnsw          ``HNSW32``            graph search; fastest, most memory
+hnsw-fp16     ``HNSW32_SQfp16``     HNSW over float16 vectors
+============  ====================  ==========================================
+
+Trained types learn their clusters or codebooks from a random sample of at
+most ``TRAIN_SAMPLE`` vectors. Corpora below ``MIN_TRAINED_VECTORS`` fall
+back to ``flat``, where approximate search would only lose recall, and
+``ivf-pq`` falls back to ``ivf-flat`` until there are enough vectors to
+train its codebooks (``min_pq_vectors``).
+
+Only the flat types can delete vectors in place: IVF indexes keep the ids
+of the remaining vectors and HNSW cannot remove at all, while the LangChain
+store assumes ids are renumbered. Incremental updates that drop chunks
+therefore rebuild the other types (see ``supports_removal``). Use
+``benchmarks/bench_faiss_index.py`` to compare recall and latency before
+choosing a type.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = (
+    "flat",
+    "flat-fp16",
+    "ivf-flat",
+    "ivf-fp16",
+    "ivf-pq",
+    "hnsw",
+    "hnsw-fp16",
+)
+INDEX_TYPE = os.getenv("LEARNBOT_INDEX_TYPE", "flat")
+# Search-time knobs: IVF clusters visited and HNSW candidate list size
+NPROBE = int(os.getenv("LEARNBOT_NPROBE", "16"))
+EF_SEARCH = int(os.getenv("LEARNBOT_EF_SEARCH", "64"))
+TRAIN_SAMPLE = 50_000
+MIN_TRAINED_VECTORS = 1_000
+HNSW_NEIGHBOURS = 32
+# PQ codes use up to PQ_SUBQUANTIZERS sub-vectors of PQ_BITS bits each
+PQ_SUBQUANTIZERS = 64
+PQ_BITS = 8
+
+
+def _check_type(index_type: str) -> None:
+    if index_type not in INDEX_TYPES:
+        raise ValueError(
+            f"index type must be one of {INDEX_TYPES}, got {index_type!r}"
+        )
+
+
+def ivf_lists(count: int) -> int:
+    """IVF cluster count for ``count`` vectors: ~4 sqrt(n), 39+ points each."""
+    return max(1, min(int(4 * math.sqrt(count)), count // 39))
+
+
+def pq_subquantizers(dimension: int) -> int:
+    """Largest divisor of ``dimension`` not above ``PQ_SUBQUANTIZERS``."""
+    limit = min(PQ_SUBQUANTIZERS, dimension)
+    return max(m for m in range(1, limit + 1) if dimension % m == 0)
+
+
+def min_pq_vectors() -> int:
+    """Vectors needed to train ``2 ** PQ_BITS`` centroids per sub-quantizer.
+
+    FAISS wants at least 39 training points per centroid.
+    """
+    return 39 * 2**PQ_BITS
+
+
+def index_spec(index_type: str, dimension: int, count: int) -> str:
+    """Return the FAISS factory string for ``index_type`` at this size."""
+    _check_type(index_type)
+    if not index_type.startswith("flat") and count < MIN_TRAINED_VECTORS:
+        logger.info(
+            "%d vectors are too few for %s; using an exact index", count, index_type
+        )
+        return "Flat"
+    if index_type == "ivf-pq" and count < min_pq_vectors():
+        logger.info(
+            "%d vectors are too few to train PQ codebooks; using ivf-flat", count
+        )
+        index_type = "ivf-flat"
+    nlist = ivf_lists(count)
+    return {
+        "flat": "Flat",
+        "flat-fp16": "SQfp16",
+        "ivf-flat": f"IVF{nlist},Flat",
+        "ivf-fp16": f"IVF{nlist},SQfp16",
+        "ivf-pq": f"IVF{nlist},PQ{pq_subquantizers(dimension)}x{PQ_BITS}",
+        "hnsw": f"HNSW{HNSW_NEIGHBOURS}",
+        "hnsw-fp16": f"HNSW{HNSW_NEIGHBOURS}_SQfp16",
+    }[index_type]
+
+
+def set_search_parameters(
+    index, nprobe: Optional[int] = None, ef_search: Optional[int] = None
+):
+    """Apply ``nprobe`` (IVF) or ``efSearch`` (HNSW) to ``index`` in place."""
+    import faiss
+
+    nprobe = NPROBE if nprobe is None else nprobe
+    ef_search = EF_SEARCH if ef_search is None else ef_search
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = ef_search
+    return index
+
+
+def create_index(vectors, index_type: str = INDEX_TYPE, seed: int = 0):
+    """Build a FAISS index of ``index_type`` holding ``vectors`` (row order).
+
+    Trained types are trained on a random sample of the vectors first.
+    """
+    import faiss
+    import numpy as np
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dimension = vectors.shape
+    index = faiss.index_factory(dimension, index_spec(index_type, dimension, count))
+    if not index.is_trained:
+        sample = vectors
+        if count > TRAIN_SAMPLE:
+            rng = np.random.default_rng(seed)
+            rows = rng.choice(count, TRAIN_SAMPLE, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+    index.add(vectors)
+    return set_search_parameters(index)
+
+
+def supports_removal(index) -> bool:
+    """Whether ``index`` can delete vectors the way the LangChain store expects.
+
+    ``FAISS.delete`` renumbers the remaining vectors 0..n-1. Flat indexes
+    compact their ids on ``remove_ids``; IVF indexes keep the old ids and
+    HNSW graphs cannot remove vectors at all.
+    """
+    import faiss
+
+    if faiss.try_extract_index_ivf(index) is not None:
+        return False
+    return getattr(faiss.downcast_index(index), "hnsw", None) is None
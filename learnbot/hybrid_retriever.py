@@ -0,0 +1,161 @@
+"""Hybrid lexical and vector retrieval over the learnbot chunks.
+
+FAISS similarity search misses questions that hinge on an exact identifier
+(``OUTLOOK_CLIENT_ID``, ``upload_template``) and needs a remote embedding
+call for every new question. ``HybridRetriever`` keeps a local BM25 index
+over the same chunks as the FAISS store and merges both rankings with
+reciprocal rank fusion. The vector search runs in a worker thread with a
+deadline; if the embedding service is slow or failing, the lexical ranking
+is returned on its own instead of waiting.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Hashable, List, Optional, Sequence
+
+from email_generator.bm25 import BM25Index
+from email_generator.template_store import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+# Conventional RRF constant; damps the weight of the very top ranks
+RRF_K = 60
+# Candidates taken from each ranking before fusion
+CANDIDATES = 20
+VECTOR_TIMEOUT_SECONDS = float(os.getenv("LEARNBOT_VECTOR_TIMEOUT", "2.0"))
+MODES = ("hybrid", "vector", "lexical")
+
+_IDENTIFIER = re.compile(r"[A-Za-z0-9_]+")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_retrievers: "weakref.WeakKeyDictionary[object, HybridRetriever]" = (
+    weakref.WeakKeyDictionary()
+)
+_retrievers_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """Split ``text`` into lower-cased terms, minus stopwords.
+
+    Identifiers are kept whole and also contribute their underscore-separated
+    parts, so ``OUTLOOK_CLIENT_ID`` matches both exactly and on "client id".
+    """
+    terms: List[str] = []
+    for word in _IDENTIFIER.findall(text):
+        term = word.casefold().strip("_")
+        if not term or term in STOPWORDS:
+            continue
+        terms.append(term)
+        if "_" in term:
+            terms.extend(p for p in term.split("_") if p and p not in STOPWORDS)
+    return terms
+
+
+def _document_key(document) -> Hashable:
+    return document.page_content, document.metadata.get("source")
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence], k: int = RRF_K) -> List:
+    """Merge ranked document lists, scoring each by ``sum(1 / (k + rank))``."""
+    scores: Dict[Hashable, float] = {}
+    documents: Dict[Hashable, object] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = _document_key(document)
+            documents.setdefault(key, document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(scores, key=scores.__getitem__, reverse=True)
+    return [documents[key] for key in ordered]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=4, thread_name_prefix="learnbot-vector"
+            )
+        return _executor
+
+
+class HybridRetriever:
+    """BM25 plus FAISS retrieval over the chunks of one vector store.
+
+    Args:
+        db: LangChain FAISS store; its docstore supplies the chunks.
+        vector_timeout: Seconds to wait for the vector search before
+            answering from the lexical ranking alone.
+    """
+
+    def __init__(self, db, vector_timeout: float = VECTOR_TIMEOUT_SECONDS) -> None:
+        self.db = db
+        self.vector_timeout = vector_timeout
+        self.size = len(db.index_to_docstore_id)
+        self.documents = [
+            db.docstore.search(db.index_to_docstore_id[position])
+            for position in range(self.size)
+        ]
+        self.lexical = BM25Index(
+            Counter(tokenize(document.page_content)) for document in self.documents
+        )
+
+    def lexical_search(self, query: str, k: int = CANDIDATES) -> List:
+        """Return up to ``k`` chunks ranked by BM25."""
+        ranked = self.lexical.search(tokenize(query), k)
+        return [self.documents[doc] for doc, _ in ranked]
+
+    def vector_search(self, query: str, k: int = CANDIDATES) -> Optional[List]:
+        """Return up to ``k`` chunks ranked by FAISS, or ``None`` on failure.
+
+        ``None`` means the search raised or missed ``vector_timeout``.
+        """
+        future = _get_executor().submit(self.db.similarity_search, query, k=k)
+        try:
+            return future.result(timeout=self.vector_timeout)
+        except FutureTimeoutError:
+            logger.warning(
+                "Vector search exceeded %.1f s; answering lexically",
+                self.vector_timeout,
+            )
+        except Exception:
+            logger.warning("Vector search failed; answering lexically", exc_info=True)
+        return None
+
+    def search(self, query: str, k: int, mode: str = "hybrid") -> List:
+        """Return up to ``k`` chunks for ``query``, best first.
+
+        ``mode`` is ``"hybrid"`` (fused), ``"vector"`` or ``"lexical"``.
+        Hybrid and vector searches fall back to the lexical ranking when the
+        vector search fails.
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        candidates = max(k, CANDIDATES)
+        lexical = self.lexical_search(query, candidates) if mode != "vector" else []
+        vector = self.vector_search(query, candidates) if mode != "lexical" else []
+        if vector is None:
+            vector = []
+            if not lexical:
+                lexical = self.lexical_search(query, candidates)
+        if mode == "hybrid":
+            return reciprocal_rank_fusion([vector, lexical])[:k]
+        return (vector or lexical)[:k]
+
+
+def get_hybrid_retriever(db) -> HybridRetriever:
+    """Return the retriever for ``db``, rebuilding it if the store changed."""
+    with _retrievers_lock:
+        retriever = _retrievers.get(db)
+        if retriever is None or retriever.size != len(db.index_to_docstore_id):
+            retriever = HybridRetriever(db)
+            _retrievers[db] = retriever
+        return retriever
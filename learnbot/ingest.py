@@ -0,0 +1,140 @@
+"""Parallel loading and splitting of the learnbot docs.
+
+Parsing and splitting files is CPU-bound and used to run one file after
+another before any chunk reached the embedder. ``iter_chunk_batches`` loads
+and splits files in a process pool and yields the chunks in batches as
+files finish, in a deterministic file order, so the caller can embed the
+first batch while later files are still being parsed. ``IngestTimings``
+records where the time of a build went.
+
+Small corpora (fewer than ``MIN_PARALLEL_FILES`` files) are processed in the
+calling process, where starting workers would cost more than it saves.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+# Worker processes for parsing and splitting; 0 means one per core
+INGEST_WORKERS = int(os.getenv("LEARNBOT_INGEST_WORKERS", "0")) or os.cpu_count() or 1
+# Chunks handed to the embedder at a time
+EMBED_BATCH_SIZE = int(os.getenv("LEARNBOT_EMBED_BATCH_SIZE", "1024"))
+MIN_PARALLEL_FILES = 8
+
+
+@dataclass
+class IngestTimings:
+    """Seconds spent in each stage of an index build.
+
+    ``load`` is time the builder spent waiting for parsed and split files,
+    so with a pool it shrinks as embedding overlaps with parsing. For flat
+    indexes ``embed`` also covers adding the vectors to the index.
+    """
+
+    files: int = 0
+    chunks: int = 0
+    load: float = 0.0
+    embed: float = 0.0
+    index: float = 0.0
+    total: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.files} files, {self.chunks} chunks in {self.total:.2f} s "
+            f"(load+split {self.load:.2f} s, embed {self.embed:.2f} s, "
+            f"index {self.index:.2f} s)"
+        )
+
+
+def split_documents(
+    documents, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP
+) -> list:
+    """Split loaded documents into overlapping chunks."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+    return splitter.split_documents(documents)
+
+
+def load_and_split(
+    source: str,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> list:
+    """Load the file at path ``source`` and split it into chunks.
+
+    The file is opened by path, not matched as a glob, so names containing
+    glob characters such as ``[`` load too. Runs in pool workers, so it
+    only takes picklable arguments.
+    """
+    from langchain_community.document_loaders import UnstructuredFileLoader
+
+    documents = UnstructuredFileLoader(source).load()
+    return split_documents(documents, chunk_size, chunk_overlap)
+
+
+def iter_split_sources(
+    sources: Sequence[str],
+    workers: int = INGEST_WORKERS,
+    load: Callable[..., list] = load_and_split,
+) -> Iterator[Tuple[str, list]]:
+    """Yield ``(source, chunks)`` for each of ``sources``, in order.
+
+    Files are loaded by ``load`` in up to ``workers`` processes; results
+    are yielded as soon as every earlier file is done. Workers are spawned
+    rather than forked, so they never inherit the caller's threads or locks.
+    """
+    sources = list(sources)
+    if workers <= 1 or len(sources) < MIN_PARALLEL_FILES:
+        for source in sources:
+            yield source, load(source)
+        return
+
+    workers = min(workers, len(sources))
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        chunksize = max(1, len(sources) // (workers * 4))
+        yield from zip(sources, pool.map(load, sources, chunksize=chunksize))
+
+
+def iter_chunk_batches(
+    sources: Sequence[str],
+    batch_size: int = EMBED_BATCH_SIZE,
+    workers: int = INGEST_WORKERS,
+    timings: Optional[IngestTimings] = None,
+    load: Callable[..., list] = load_and_split,
+) -> Iterator[List[Tuple[str, list]]]:
+    """Yield lists of ``(source, chunks)`` holding about ``batch_size`` chunks.
+
+    A file's chunks always stay in one batch, so per-file chunk ids can be
+    computed batch by batch. Waiting time is added to ``timings.load``.
+    """
+    timings = timings if timings is not None else IngestTimings()
+    batch: List[Tuple[str, list]] = []
+    size = 0
+    results = iter_split_sources(sources, workers, load)
+    while True:
+        start = time.perf_counter()
+        item = next(results, None)
+        timings.load += time.perf_counter() - start
+        if item is None:
+            break
+        timings.files += 1
+        timings.chunks += len(item[1])
+        batch.append(item)
+        size += len(item[1])
+        if size >= batch_size:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
@@ -0,0 +1,95 @@
+"""Embeddings computed on the local CPU with a small sentence-transformer.
+
+With the default OpenAI backend every question needs a network round trip
+before FAISS can search. ``LocalEmbeddings`` runs a compact model (by
+default ``all-MiniLM-L6-v2``, 384 dimensions) in-process instead: the model
+is loaded once per process, documents are encoded in batches, and a query
+takes a few milliseconds on a laptop CPU. Once the model files are in the
+Hugging Face cache, retrieval needs no network at all (set
+``HF_HUB_OFFLINE=1`` to enforce that).
+
+Requires the optional ``sentence-transformers`` package
+(``pip install "email-templates-gen[local]"``). Set
+``LEARNBOT_LOCAL_EMBEDDING_RUNTIME=onnx`` to run the model with ONNX Runtime,
+which is usually faster on CPU than PyTorch.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, List, Tuple
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:  # pragma: no cover - langchain not installed
+    Embeddings = object  # type: ignore
+
+LOCAL_EMBEDDING_MODEL = os.getenv(
+    "LEARNBOT_LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+)
+# "torch" (the sentence-transformers default), "onnx" or "openvino"
+LOCAL_EMBEDDING_RUNTIME = os.getenv("LEARNBOT_LOCAL_EMBEDDING_RUNTIME", "torch")
+LOCAL_BATCH_SIZE = 64
+
+_models: Dict[Tuple[str, str], "LocalEmbeddings"] = {}
+_models_lock = threading.Lock()
+
+
+class LocalEmbeddings(Embeddings):
+    """LangChain embeddings provider backed by a local sentence-transformer.
+
+    Vectors are L2-normalised, so FAISS L2 distances rank like cosine
+    similarity. ``model`` is prefixed with ``local:`` so cached vectors and
+    saved indexes never mix with those of a remote model.
+    """
+
+    def __init__(
+        self,
+        model_name: str = LOCAL_EMBEDDING_MODEL,
+        runtime: str = LOCAL_EMBEDDING_RUNTIME,
+        batch_size: int = LOCAL_BATCH_SIZE,
+    ) -> None:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as exc:
+            raise ImportError(
+                "The local embedding backend needs sentence-transformers; "
+                'install it with pip install "email-templates-gen[local]"'
+            ) from exc
+
+        options = {} if runtime == "torch" else {"backend": runtime}
+        self.encoder = SentenceTransformer(model_name, device="cpu", **options)
+        self.model = f"local:{model_name}"
+        self.batch_size = batch_size
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.encoder.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+
+def get_local_embeddings(
+    model_name: str = LOCAL_EMBEDDING_MODEL, runtime: str = LOCAL_EMBEDDING_RUNTIME
+) -> LocalEmbeddings:
+    """Return the process-wide instance of ``model_name``, loading it once."""
+    key = (model_name, runtime)
+    with _models_lock:
+        embeddings = _models.get(key)
+        if embeddings is None:
+            embeddings = LocalEmbeddings(model_name, runtime)
+            _models[key] = embeddings
+        return embeddings
@@ -1,23 +1,574 @@
-from langchain_community.document_loaders import DirectoryLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
+"""Build, persist and load the FAISS index used by the Learn page.
+
+The index is built once from ``docs/`` and written to ``INDEX_DIR`` as a raw
+FAISS index plus a JSON Lines file holding the chunk text and metadata.
+``load_index`` memory-maps that artifact on first use and keeps the resulting
+vector store in memory, so subsequent questions (and Streamlit reruns) reuse
+it without touching the embedding endpoint.
+
+A manifest of per-file and per-chunk content hashes is stored alongside the
+index. When files under ``docs/`` change, only the affected chunks are
+re-embedded and the vectors of chunks that disappeared are removed, so the
+cost of refreshing the index tracks how much of the docs actually changed.
+
+Refresh the artifact after editing the docs with::
+
+    python -m learnbot.rag_pipeline            # incremental update
+    python -m learnbot.rag_pipeline --rebuild  # re-embed everything
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain.vectorstores import FAISS
 from dotenv import load_dotenv
 
+from learnbot.embedding_cache import CachedEmbeddings, get_embedding_cache
+from learnbot.embedding_executor import get_embedding_executor
+from learnbot.faiss_index import (
+    INDEX_TYPE,
+    INDEX_TYPES,
+    create_index,
+    set_search_parameters,
+    supports_removal,
+)
+from learnbot.ingest import IngestTimings, iter_chunk_batches, iter_split_sources
+
 # Load environment variables from .env file if present
 load_dotenv()
 
-def load_index(openai_api_key=None):
-    loader = DirectoryLoader("docs", glob="**/*.md")
-    documents = loader.load()
+logger = logging.getLogger(__name__)
+
+DOCS_DIR = "docs"
+DOCS_GLOB = "**/*.md"
+
+INDEX_DIR = Path(os.getenv("LEARNBOT_INDEX_DIR", "models/learnbot_index"))
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.jsonl"
+META_FILE = "meta.json"
+MANIFEST_FILE = "manifest.json"
+ARTIFACT_FILES = (INDEX_FILE, CHUNKS_FILE, META_FILE)
+INDEX_FORMAT_VERSION = 1
+# Embedding provider used when none is passed; see register_embedding_backend
+EMBEDDING_BACKEND = os.getenv("LEARNBOT_EMBEDDING_BACKEND", "openai")
+
+_embedding_backends: Dict[str, Callable[[Optional[str]], object]] = {}
+
+_index_cache: Dict[Tuple[str, Optional[str], Optional[str], str], FAISS] = {}
+_index_lock = threading.Lock()
+
+
+def _embedding_model(embeddings) -> Optional[str]:
+    return getattr(embeddings, "model", None)
+
+
+def register_embedding_backend(
+    name: str, factory: Callable[[Optional[str]], object]
+) -> None:
+    """Make ``factory(openai_api_key)`` available as embedding backend ``name``.
+
+    The factory returns a LangChain embeddings object with a ``model``
+    attribute naming the model, which keys cached vectors and saved indexes.
+    """
+    _embedding_backends[name] = factory
+
+
+def embedding_backends() -> Tuple[str, ...]:
+    """Return the names of the registered embedding backends."""
+    return tuple(_embedding_backends)
+
+
+def _openai_backend(openai_api_key: Optional[str]):
+    # Batches and parallelises requests under the account's rate limits
+    return get_embedding_executor(openai_api_key)
+
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    chunks = splitter.split_documents(documents)
+def _local_backend(openai_api_key: Optional[str]):
+    from learnbot.local_embeddings import get_local_embeddings
 
+    return get_local_embeddings()
+
+
+register_embedding_backend("openai", _openai_backend)
+register_embedding_backend("local", _local_backend)
+
+
+def default_embeddings(
+    openai_api_key: Optional[str] = None, backend: Optional[str] = None
+) -> CachedEmbeddings:
+    """Return the embeddings of ``backend`` behind the shared embedding cache.
+
+    ``backend`` defaults to ``LEARNBOT_EMBEDDING_BACKEND``: ``"openai"`` or
+    ``"local"`` (a sentence-transformer on the CPU, no network needed).
+    """
+    backend = backend or EMBEDDING_BACKEND
+    factory = _embedding_backends.get(backend)
+    if factory is None:
+        raise ValueError(
+            f"embedding backend must be one of {embedding_backends()}, got {backend!r}"
+        )
     if openai_api_key is None:
         openai_api_key = os.getenv("OPENAI_API_KEY")
+    return CachedEmbeddings(factory(openai_api_key), get_embedding_cache())
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def doc_sources(docs_dir: Path | str | None = None) -> List[str]:
+    """Return the files matched by ``DOCS_GLOB``, in a stable order."""
+    root = Path(docs_dir or DOCS_DIR)
+    return [str(path) for path in sorted(root.glob(DOCS_GLOB)) if path.is_file()]
+
+
+def scan_docs(docs_dir: Path | str | None = None) -> Dict[str, str]:
+    """Return ``{source: sha256}`` for every file matched by ``DOCS_GLOB``.
+
+    ``source`` matches the ``metadata["source"]`` set by the document loader.
+    """
+    return {
+        source: _sha256(Path(source).read_bytes()) for source in doc_sources(docs_dir)
+    }
 
-    embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
-    db = FAISS.from_documents(chunks, embeddings)
+
+def chunk_ids(chunks: Iterable) -> List[str]:
+    """Return a stable content-addressed id for each chunk.
+
+    The id hashes the chunk's source, its text and how many identical chunks
+    precede it in the same file, so unchanged chunks keep their id (and their
+    vector) when other parts of the file are edited.
+    """
+    seen: Dict[Tuple[str, str], int] = {}
+    ids = []
+    for chunk in chunks:
+        source = str(chunk.metadata.get("source", ""))
+        key = (source, chunk.page_content)
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        payload = f"{source}\0{occurrence}\0{chunk.page_content}"
+        ids.append(_sha256(payload.encode("utf-8")))
+    return ids
+
+
+def build_index(
+    openai_api_key: Optional[str] = None,
+    embeddings=None,
+    index_type: str = INDEX_TYPE,
+    sources: Optional[Iterable[str]] = None,
+    timings: Optional[IngestTimings] = None,
+) -> FAISS:
+    """Load ``docs/``, split it into chunks and embed them into a new store.
+
+    Files are parsed and split in a process pool and their chunks embedded
+    batch by batch while later files are still being parsed. ``sources``
+    restricts the build to those files (default: all of ``doc_sources()``);
+    per-stage times are logged and added to ``timings`` if given.
+
+    ``index_type`` is one of ``faiss_index.INDEX_TYPES``; anything but
+    ``"flat"`` embeds all chunks first and trains the index on them.
+    """
+    if embeddings is None:
+        embeddings = default_embeddings(openai_api_key)
+    if sources is None:
+        sources = doc_sources()
+    timings = timings if timings is not None else IngestTimings()
+    start = time.perf_counter()
+
+    db = None
+    all_chunks: list = []
+    all_ids: List[str] = []
+    vectors: list = []
+    for batch in iter_chunk_batches(list(sources), timings=timings):
+        chunks = [chunk for _, file_chunks in batch for chunk in file_chunks]
+        ids = [doc_id for _, file_chunks in batch for doc_id in chunk_ids(file_chunks)]
+        if not chunks:
+            continue
+        embed_start = time.perf_counter()
+        if index_type != "flat":
+            vectors.extend(
+                embeddings.embed_documents([chunk.page_content for chunk in chunks])
+            )
+            all_chunks.extend(chunks)
+            all_ids.extend(ids)
+        elif db is None:
+            db = FAISS.from_documents(chunks, embeddings, ids=ids)
+        else:
+            db.add_documents(chunks, ids=ids)
+        timings.embed += time.perf_counter() - embed_start
+
+    if index_type != "flat" and all_chunks:
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+
+        index_start = time.perf_counter()
+        index = create_index(vectors, index_type)
+        db = FAISS(
+            embeddings,
+            index,
+            InMemoryDocstore(dict(zip(all_ids, all_chunks))),
+            dict(enumerate(all_ids)),
+        )
+        timings.index += time.perf_counter() - index_start
+    if db is None:
+        raise ValueError(f"No documents matching {DOCS_GLOB} under {DOCS_DIR}")
+
+    timings.total += time.perf_counter() - start
+    logger.info("Ingested learnbot docs: %s", timings.summary())
     return db
+
+
+def _manifest_from_store(db: FAISS, file_hashes: Dict[str, str]) -> dict:
+    files: Dict[str, dict] = {
+        source: {"sha256": digest, "chunks": []}
+        for source, digest in file_hashes.items()
+    }
+    for position in range(len(db.index_to_docstore_id)):
+        doc_id = db.index_to_docstore_id[position]
+        source = str(db.docstore.search(doc_id).metadata.get("source", ""))
+        if source in files:
+            files[source]["chunks"].append(doc_id)
+    return {"version": INDEX_FORMAT_VERSION, "files": files}
+
+
+def read_manifest(index_dir: Path | str = INDEX_DIR) -> Optional[dict]:
+    """Return the saved content-hash manifest, or ``None`` if it is unusable."""
+    try:
+        manifest = json.loads(
+            (Path(index_dir) / MANIFEST_FILE).read_text(encoding="utf-8")
+        )
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != INDEX_FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def _changed_sources(manifest: dict, file_hashes: Dict[str, str]) -> Tuple[list, list]:
+    known = manifest["files"]
+    changed = [
+        source
+        for source, digest in file_hashes.items()
+        if known.get(source, {}).get("sha256") != digest
+    ]
+    removed = [source for source in known if source not in file_hashes]
+    return changed, removed
+
+
+def save_index(
+    db: FAISS,
+    index_dir: Path | str = INDEX_DIR,
+    file_hashes: Optional[Dict[str, str]] = None,
+    index_type: str = INDEX_TYPE,
+) -> Path:
+    """Write ``db`` to ``index_dir`` as a FAISS index plus chunk metadata.
+
+    When ``file_hashes`` is given a manifest mapping each source file to its
+    content hash and chunk ids is written too, enabling ``update_index``.
+    Files are written next to their final names and renamed into place so a
+    concurrent reader never sees a half-written artifact.
+    """
+    import faiss
+
+    path = Path(index_dir)
+    path.mkdir(parents=True, exist_ok=True)
+
+    tmp_index = path / f"{INDEX_FILE}.tmp"
+    faiss.write_index(db.index, str(tmp_index))
+
+    tmp_chunks = path / f"{CHUNKS_FILE}.tmp"
+    with tmp_chunks.open("w", encoding="utf-8") as f:
+        for position in range(len(db.index_to_docstore_id)):
+            doc_id = db.index_to_docstore_id[position]
+            doc = db.docstore.search(doc_id)
+            record = {
+                "id": doc_id,
+                "page_content": doc.page_content,
+                "metadata": doc.metadata,
+            }
+            f.write(json.dumps(record) + "\n")
+
+    meta = {
+        "version": INDEX_FORMAT_VERSION,
+        "embedding_model": _embedding_model(db.embeddings),
+        "index_type": index_type,
+        "count": len(db.index_to_docstore_id),
+        "built_at": time.time(),
+    }
+    tmp_meta = path / f"{META_FILE}.tmp"
+    tmp_meta.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    if file_hashes is not None:
+        tmp_manifest = path / f"{MANIFEST_FILE}.tmp"
+        tmp_manifest.write_text(
+            json.dumps(_manifest_from_store(db, file_hashes)), encoding="utf-8"
+        )
+        os.replace(tmp_manifest, path / MANIFEST_FILE)
+
+    os.replace(tmp_index, path / INDEX_FILE)
+    os.replace(tmp_chunks, path / CHUNKS_FILE)
+    os.replace(tmp_meta, path / META_FILE)
+    return path
+
+
+def read_index_meta(index_dir: Path | str = INDEX_DIR) -> Optional[dict]:
+    """Return the artifact metadata, or ``None`` if no usable index exists."""
+    path = Path(index_dir)
+    if not all((path / name).exists() for name in ARTIFACT_FILES):
+        return None
+    try:
+        meta = json.loads((path / META_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != INDEX_FORMAT_VERSION:
+        return None
+    return meta
+
+
+def open_index(
+    embeddings, index_dir: Path | str = INDEX_DIR, mmap: bool = True
+) -> FAISS:
+    """Open a saved artifact, memory-mapping the FAISS index by default.
+
+    ``IO_FLAG_MMAP_IFC`` maps the stored vectors (and graph or inverted
+    lists) of every index type this module builds, so they are paged in from
+    the file on demand instead of being read into memory. A memory-mapped
+    index is read-only; pass ``mmap=False`` to load a copy that can be
+    modified in place.
+    """
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_core.documents import Document
+
+    path = Path(index_dir)
+    flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    index = faiss.read_index(str(path / INDEX_FILE), flags)
+    if (read_index_meta(path) or {}).get("index_type", "flat") != "flat":
+        set_search_parameters(index)
+
+    docs = {}
+    index_to_docstore_id = {}
+    with (path / CHUNKS_FILE).open(encoding="utf-8") as f:
+        for position, line in enumerate(f):
+            record = json.loads(line)
+            docs[record["id"]] = Document(
+                page_content=record["page_content"], metadata=record["metadata"]
+            )
+            index_to_docstore_id[position] = record["id"]
+
+    return FAISS(embeddings, index, InMemoryDocstore(docs), index_to_docstore_id)
+
+
+def _rebuild(embeddings, index_dir, file_hashes, index_type):
+    db = build_index(
+        embeddings=embeddings, index_type=index_type, sources=list(file_hashes)
+    )
+    save_index(db, index_dir, file_hashes, index_type)
+    added = len(db.index_to_docstore_id)
+    return db, {"added": added, "removed": 0, "files_changed": len(file_hashes)}
+
+
+def update_index(
+    embeddings, index_dir: Path | str = INDEX_DIR, index_type: str = INDEX_TYPE
+) -> Tuple[FAISS, Dict[str, int]]:
+    """Bring the saved index in line with ``docs/`` by embedding only changes.
+
+    Files whose content hash matches the manifest are skipped. For changed
+    files only chunks with a new content hash are embedded, and the vectors
+    of chunks that no longer exist (including those of deleted files) are
+    removed from the FAISS store in place. Falls back to a full build when
+    no manifest is available, when the saved index is of another type or was
+    built with another embedding model, or when chunks must be removed from
+    an index that cannot delete them in place (IVF, HNSW); vectors of
+    unchanged chunks then come from the embedding cache.
+
+    Returns the updated store and counts of added and removed chunks.
+    """
+    file_hashes = scan_docs()
+    manifest = read_manifest(index_dir)
+    meta = read_index_meta(index_dir)
+    if (
+        manifest is None
+        or meta is None
+        or meta.get("index_type", "flat") != index_type
+        or meta.get("embedding_model") != _embedding_model(embeddings)
+    ):
+        return _rebuild(embeddings, index_dir, file_hashes, index_type)
+
+    changed, removed = _changed_sources(manifest, file_hashes)
+    if not changed and not removed:
+        stats = {"added": 0, "removed": 0, "files_changed": 0}
+        return open_index(embeddings, index_dir), stats
+
+    db = open_index(embeddings, index_dir, mmap=False)
+    stale_ids: List[str] = []
+    new_chunks: list = []
+    new_ids: List[str] = []
+    for source in removed:
+        stale_ids.extend(manifest["files"][source]["chunks"])
+    for source, chunks in iter_split_sources(changed):
+        ids = chunk_ids(chunks)
+        previous = set(manifest["files"].get(source, {}).get("chunks", []))
+        current = set(ids)
+        stale_ids.extend(previous - current)
+        for chunk, doc_id in zip(chunks, ids):
+            if doc_id not in previous:
+                new_chunks.append(chunk)
+                new_ids.append(doc_id)
+
+    if stale_ids and index_type != "flat" and not supports_removal(db.index):
+        return _rebuild(embeddings, index_dir, file_hashes, index_type)
+    if stale_ids:
+        db.delete(stale_ids)
+    if new_chunks:
+        db.add_documents(new_chunks, ids=new_ids)
+    save_index(db, index_dir, file_hashes, index_type)
+
+    stats = {
+        "added": len(new_ids),
+        "removed": len(stale_ids),
+        "files_changed": len(changed) + len(removed),
+    }
+    logger.info("Updated learnbot index incrementally: %s", stats)
+    return db, stats
+
+
+def load_index(
+    openai_api_key: Optional[str] = None,
+    index_dir: Path | str = INDEX_DIR,
+    rebuild: bool = False,
+    embeddings=None,
+    index_type: str = INDEX_TYPE,
+) -> FAISS:
+    """Return the documentation vector store, building it only when needed.
+
+    The store is cached per ``(index_dir, api key, embedding model, index
+    type)`` for the lifetime of the process. On a cold start the saved
+    artifact is memory-mapped when it matches ``docs/``; changed docs are
+    re-indexed incrementally, and a missing artifact, a different embedding
+    model or index type, or ``rebuild`` trigger a full rebuild.
+
+    ``embeddings`` overrides the provider; by default OpenAI embeddings are
+    used behind the shared on-disk embedding cache.
+    """
+    if openai_api_key is None:
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+
+    if embeddings is None:
+        embeddings = default_embeddings(openai_api_key)
+    cache_key = (
+        str(Path(index_dir).resolve()),
+        openai_api_key,
+        _embedding_model(embeddings),
+        index_type,
+    )
+    if not rebuild:
+        db = _index_cache.get(cache_key)
+        if db is not None:
+            return db
+
+    with _index_lock:
+        if not rebuild and cache_key in _index_cache:
+            return _index_cache[cache_key]
+
+        meta = None if rebuild else read_index_meta(index_dir)
+        start = time.perf_counter()
+        if (
+            meta is None
+            or meta.get("embedding_model") != _embedding_model(embeddings)
+            or meta.get("index_type", "flat") != index_type
+        ):
+            file_hashes = scan_docs()
+            db = build_index(
+                embeddings=embeddings, index_type=index_type, sources=list(file_hashes)
+            )
+            save_index(db, index_dir, file_hashes, index_type)
+            logger.info(
+                "Built %s learnbot index in %.2f s",
+                index_type,
+                time.perf_counter() - start,
+            )
+        else:
+            db, stats = update_index(embeddings, index_dir, index_type)
+            logger.info(
+                "Loaded learnbot index (%d chunks, %d re-embedded) in %.1f ms",
+                len(db.index_to_docstore_id),
+                stats["added"],
+                (time.perf_counter() - start) * 1000,
+            )
+
+        _index_cache[cache_key] = db
+        return db
+
+
+def clear_index_cache() -> None:
+    """Drop all in-process vector stores so the next load re-reads disk."""
+    with _index_lock:
+        _index_cache.clear()
+
+
+def main(argv=None) -> None:
+    """Command line entry point for refreshing the saved index."""
+    parser = argparse.ArgumentParser(
+        prog="python -m learnbot.rag_pipeline",
+        description="Build or refresh the learnbot FAISS index.",
+    )
+    parser.add_argument(
+        "--index-dir", default=str(INDEX_DIR), help="Where the artifact is stored"
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Re-embed all of docs/ instead of only the files that changed",
+    )
+    parser.add_argument(
+        "--index-type",
+        choices=INDEX_TYPES,
+        default=INDEX_TYPE,
+        help="FAISS index to build (default: LEARNBOT_INDEX_TYPE or flat)",
+    )
+    parser.add_argument(
+        "--embedding-backend",
+        choices=embedding_backends(),
+        default=EMBEDDING_BACKEND,
+        help="Embedding provider (default: LEARNBOT_EMBEDDING_BACKEND or openai)",
+    )
+    parser.add_argument("--api-key", default=None, help="OpenAI API key")
+    args = parser.parse_args(argv)
+    embeddings = default_embeddings(args.api_key, args.embedding_backend)
+    # Show the per-stage ingest timings of a build
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    start = time.perf_counter()
+    if args.rebuild:
+        db = load_index(
+            openai_api_key=args.api_key,
+            index_dir=args.index_dir,
+            rebuild=True,
+            embeddings=embeddings,
+            index_type=args.index_type,
+        )
+        summary = "rebuilt"
+    else:
+        db, stats = update_index(embeddings, args.index_dir, args.index_type)
+        summary = (
+            f"{stats['files_changed']} files changed, "
+            f"{stats['added']} chunks embedded, {stats['removed']} removed"
+        )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(
+        f"Index at {args.index_dir} has {len(db.index_to_docstore_id)} chunks "
+        f"({summary}) in {elapsed_ms:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
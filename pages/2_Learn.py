@@ -3,6 +3,7 @@ import sys
 
 import streamlit as st
 
+from email_generator.streaming import render_stream
 from learnbot.chatbot import stream_answer_from_docs
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -52,7 +53,9 @@ with col:
 
     if query:
         st.info("🔍 Thinking...")
-        st.write_stream(stream_answer_from_docs(query, openai_api_key=openai_api_key))
+        render_stream(
+            stream_answer_from_docs(query, openai_api_key=openai_api_key), st.empty()
+        )
     else:
         st.info(
             "Ask the AI about how this project works, what tech it's using, or what's planned next."
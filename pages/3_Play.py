@@ -6,13 +6,25 @@ from pathlib import Path
 import streamlit as st
 
 from email_generator.generator import stream_generated_email
-from email_generator.outlook_integration import send_email
-from email_generator.sharepoint_integration import download_template, upload_template
+from email_generator.outbox import (
+    FAILED,
+    SENT,
+    get_outbox,
+    start_background_dispatcher,
+)
+from email_generator.response_cache import get_response_cache
+from email_generator.streaming import render_stream
+from email_generator.template_fill import get_template_filler
+from email_generator.template_retriever import get_template_retriever
+from email_generator.sharepoint_integration import fetch_template, upload_template
 
 # Ensure access to project root modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from sidebar import init_sidebar
 
+# How long "Send via Outlook" waits for the outcome before reporting it queued
+SEND_WAIT_SECONDS = 15
+
 # Page setup
 st.set_page_config(page_title="Play – Generate Email", layout="wide")
 
@@ -55,6 +67,10 @@ with col:
     purpose = st.selectbox(
         "Email type", ["Reply", "Follow-up", "Request", "Information", "Other"]
     )
+    # Canned templates are only filled on request, and never for replies
+    use_template = input_mode == "Describe the situation" and st.checkbox(
+        "Fill a saved template when the description names one"
+    )
 
 
     # Generate button with streaming output
@@ -63,14 +79,21 @@ with col:
             st.warning("Please enter some text.")
         else:
             st.info("✍️ Generating your email...")
-            tokens = []
-            placeholder = st.empty()
-            for token in stream_generated_email(
-                input_text, tone, purpose, openai_api_key=openai_api_key
-            ):
-                tokens.append(token)
-                placeholder.markdown("".join(tokens))
-            st.session_state.generated_email = "".join(tokens)
+            try:
+                retriever = get_template_retriever(openai_api_key)
+            except Exception:  # examples are optional: generate without them
+                retriever = None
+                st.caption("Template examples are unavailable right now.")
+            tokens = stream_generated_email(
+                input_text,
+                tone,
+                purpose,
+                openai_api_key=openai_api_key,
+                cache=get_response_cache(),
+                retriever=retriever,
+                filler=get_template_filler() if use_template else None,
+            )
+            st.session_state.generated_email = render_stream(tokens, st.empty())
 
     generated = st.session_state.get("generated_email")
     if generated:
@@ -82,9 +105,29 @@ with col:
             if not recipient or not subject:
                 st.warning("Please enter recipient and subject")
             else:
-                with st.spinner("Sending email..."):
-                    send_email(recipient=recipient, subject=subject, body=generated)
-                st.success("Email sent")
+                try:
+                    message_id = get_outbox().enqueue(recipient, subject, generated)
+                except ValueError as error:  # e.g. no sender configured
+                    st.error(f"Email could not be queued: {error}")
+                else:
+                    dispatcher = start_background_dispatcher()
+                    with st.spinner("Sending..."):
+                        message = get_outbox().wait(message_id, SEND_WAIT_SECONDS)
+                    if message["status"] == SENT:
+                        st.success("Email sent")
+                    elif message["status"] == FAILED:
+                        st.error(f"Email could not be sent: {message['last_error']}")
+                    else:
+                        note = (
+                            f"; last attempt failed: {message['last_error']}"
+                            if message["last_error"]
+                            else ""
+                        )
+                        st.info(
+                            f"Email queued for delivery "
+                            f"({dispatcher.metrics()['queue_depth']} waiting in the "
+                            f"outbox{note})"
+                        )
 
         with st.expander("SharePoint Template Management"):
             site_url = st.text_input("Site URL")
@@ -111,11 +154,7 @@ with col:
                 if not all([site_url, file_url, username, password]):
                     st.warning("Please fill in SharePoint details")
                 else:
-                    with tempfile.NamedTemporaryFile(
-                        delete=False, suffix=".html"
-                    ) as tmp:
-                        dest = Path(tmp.name)
                     with st.spinner("Downloading..."):
-                        download_template(site_url, file_url, dest, username, password)
-                        st.session_state.generated_email = dest.read_text()
+                        cached = fetch_template(site_url, file_url, username, password)
+                        st.session_state.generated_email = cached.read_text()
                     st.experimental_rerun()
@@ -5,7 +5,6 @@ from typing import Optional
 
 import av
 import numpy as np
-import openai
 import soundfile as sf
 import streamlit as st
 from streamlit_webrtc import (
@@ -17,6 +16,7 @@ from streamlit_webrtc import (
 )
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from email_generator.openai_client import get_openai_client
 from sidebar import init_sidebar
 
 init_sidebar(
@@ -58,7 +58,7 @@ if not openai_key:
     st.warning("Please provide an OpenAI API key to use the voice assistant.")
     st.stop()
 
-openai.api_key = openai_key
+client = get_openai_client(openai_key)
 
 # -------------------------------------------------------------
 # 1.  PAGE LAYOUT
@@ -133,7 +133,7 @@ if ctx.state.playing is False and ctx.audio_processor is not None:
     if wav_data:
         # --- 3a. Speech ➜ Text (Whisper) ----------------------
         with st.spinner("Transcribing…"):
-            transcript_resp = openai.audio.transcriptions.create(
+            transcript_resp = client.audio.transcriptions.create(
                 model="whisper-1",
                 file=("speech.wav", wav_data, "audio/wav"),
             )
@@ -144,7 +144,7 @@ if ctx.state.playing is False and ctx.audio_processor is not None:
 
         # --- 3b. Text ➜ Text (Chat Completion) ---------------
         with st.spinner("Thinking…"):
-            completion_resp = openai.chat.completions.create(
+            completion_resp = client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "You are a helpful project mentor."},
@@ -160,7 +160,7 @@ if ctx.state.playing is False and ctx.audio_processor is not None:
 
         # --- 3c. Text ➜ Speech (TTS) --------------------------
         with st.spinner("Voicing response…"):
-            tts_resp = openai.audio.speech.create(
+            tts_resp = client.audio.speech.create(
                 model="tts-1",
                 voice="alloy",
                 input=assistant_text,
@@ -4,14 +4,30 @@ __version__ = "0.1.0"
 __author__ = "EmailTemplatesGen Team"
 __description__ = "AI-powered email template generation with Outlook and SharePoint integration"
 
-from email_templates_gen.email_generator import generator
-from email_templates_gen.integrations import outlook, sharepoint
-from email_templates_gen.learnbot import chatbot, rag_pipeline
+import importlib
+
+# Submodules are imported on first access, so importing one integration does
+# not pull in the optional dependencies (e.g. langchain) of the others.
+_SUBMODULES = {
+    "generator": "email_templates_gen.email_generator.generator",
+    "outlook": "email_templates_gen.integrations.outlook",
+    "sharepoint": "email_templates_gen.integrations.sharepoint",
+    "chatbot": "email_templates_gen.learnbot.chatbot",
+    "rag_pipeline": "email_templates_gen.learnbot.rag_pipeline",
+}
 
 __all__ = [
     "generator",
-    "outlook", 
+    "outlook",
     "sharepoint",
     "chatbot",
     "rag_pipeline",
 ]
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        module = importlib.import_module(_SUBMODULES[name])
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,55 @@
+"""Command line entry point for EmailTemplatesGen.
+
+Without arguments this runs the Streamlit application entry point as before;
+subcommands expose the batch tooling::
+
+    email-templates-gen batch INPUT OUTPUT [options]
+    email-templates-gen sync LOCAL_DIR [options]
+"""
+
+import argparse
+import importlib
+import sys
+from pathlib import Path
+
+# The generation modules still live at the repository root during the
+# migration to the src/ layout
+repo_root = Path(__file__).parent.parent.parent
+if (repo_root / "email_generator").exists():
+    sys.path.insert(0, str(repo_root))
+
+COMMANDS = {
+    "batch": (
+        "email_generator.batch",
+        "Generate replies for every row of a CSV or JSONL file",
+    ),
+    "sync": (
+        "email_generator.sharepoint_sync",
+        "Mirror a SharePoint template folder with a local directory",
+    ),
+}
+
+
+def main(argv=None):
+    """Dispatch to a subcommand, or start the application when none is given."""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        from email_templates_gen.app import main as app_main
+
+        return app_main()
+
+    parser = argparse.ArgumentParser(
+        prog="email-templates-gen",
+        description="EmailTemplatesGen command line tools.",
+        epilog="\n".join(f"{name}: {help_}" for name, (_, help_) in COMMANDS.items()),
+    )
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    return module.main(args.args, prog=f"email-templates-gen {args.command}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,22 @@ class OpenAISettings(BaseSettings):
     model: str = Field(default="gpt-4", description="Default OpenAI model")
     max_tokens: int = Field(default=2000, description="Maximum tokens per request")
     temperature: float = Field(default=0.7, description="Temperature for generation")
+    timeout: float = Field(default=60.0, description="Request timeout in seconds")
+    connect_timeout: float = Field(default=5.0, description="Connect timeout in seconds")
+    max_retries: int = Field(default=2, description="Retries for failed requests")
+    max_connections: int = Field(default=20, description="HTTP connection pool size")
+    max_keepalive_connections: int = Field(
+        default=10, description="Idle connections kept open for reuse"
+    )
+    keepalive_expiry: float = Field(
+        default=30.0, description="Seconds an idle connection is kept alive"
+    )
+    max_concurrent_generations: int = Field(
+        default=100, description="Concurrent async generations per process"
+    )
+    requests_per_minute: int = Field(
+        default=500, description="Request budget per API key for async generation"
+    )
     
     class Config:
         env_prefix = "OPENAI_"
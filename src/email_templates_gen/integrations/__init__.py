@@ -1,5 +1,5 @@
 """Integration modules for external services."""
 
-from email_templates_gen.integrations import outlook, sharepoint
+from email_templates_gen.integrations import graph_auth, outlook, sharepoint
 
-__all__ = ["outlook", "sharepoint"]
+__all__ = ["graph_auth", "outlook", "sharepoint"]
@@ -0,0 +1,169 @@
+"""Cached Microsoft Graph tokens for app-only (client credentials) access.
+
+Building a ``msal.ConfidentialClientApplication`` per call throws away MSAL's
+token cache, so every Graph request paid for a round trip to the authority.
+``get_token_provider`` keeps one ``GraphTokenProvider`` (and so one MSAL
+application) per tenant and client. The provider hands out its token until
+``refresh_margin`` seconds before expiry and refreshes it on a background
+timer at that point, so senders normally never wait for the authority.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import msal
+
+SCOPES = ["https://graph.microsoft.com/.default"]
+AUTHORITY_TEMPLATE = "https://login.microsoftonline.com/{tenant_id}"
+# MSAL itself treats cached tokens within five minutes of expiry as expired,
+# so refreshing at that point always yields a new token.
+REFRESH_MARGIN_SECONDS = 300
+MIN_REMAINING_SECONDS = 60
+
+_providers: Dict[Tuple[str, str], "GraphTokenProvider"] = {}
+_providers_lock = threading.Lock()
+
+
+def _digest(secret: str) -> str:
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+
+class GraphTokenProvider:
+    """Thread-safe source of Graph access tokens for one app registration.
+
+    Args:
+        client_id: Application (client) ID.
+        tenant_id: Directory (tenant) ID.
+        client_secret: Client secret.
+        scopes: Scopes requested with the client credentials grant.
+        refresh_margin: Seconds before expiry at which the token is renewed.
+        background_refresh: Renew tokens on a daemon timer instead of on the
+            first call after the margin is reached.
+        clock: Wall clock, injectable for tests.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        tenant_id: str,
+        client_secret: str,
+        scopes: Sequence[str] = SCOPES,
+        refresh_margin: float = REFRESH_MARGIN_SECONDS,
+        background_refresh: bool = True,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.client_id = client_id
+        self.tenant_id = tenant_id
+        self.secret_digest = _digest(client_secret)
+        self.scopes = list(scopes)
+        self.refresh_margin = refresh_margin
+        self.background_refresh = background_refresh
+        self.clock = clock
+        self._app = msal.ConfidentialClientApplication(
+            client_id,
+            authority=AUTHORITY_TEMPLATE.format(tenant_id=tenant_id),
+            client_credential=client_secret,
+        )
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+
+    def get_token(self) -> str:
+        """Return a current access token, renewing it if it is due.
+
+        While another thread is renewing it, the current token is returned
+        as long as it has ``MIN_REMAINING_SECONDS`` left. If renewing fails,
+        the current token is still returned until it expires.
+        """
+        token, now = self._token, self.clock()
+        if token is not None and now < self._refresh_at:
+            return token
+        if token is not None and now < self._expires_at - MIN_REMAINING_SECONDS:
+            if not self._lock.acquire(blocking=False):
+                return token
+        else:
+            self._lock.acquire()
+        try:
+            # Another thread may have refreshed while this one waited
+            if self._token is None or self.clock() >= self._refresh_at:
+                try:
+                    self._refresh()
+                except Exception:
+                    if self._token is None or self.clock() >= self._expires_at:
+                        raise
+            return self._token  # type: ignore[return-value]
+        finally:
+            self._lock.release()
+
+    def _refresh(self) -> None:
+        result = self._app.acquire_token_for_client(scopes=self.scopes)
+        if "access_token" not in result:
+            error = result.get("error_description", "Unknown error")
+            raise RuntimeError(f"Failed to obtain access token: {error}")
+        lifetime = float(result.get("expires_in", 3600))
+        now = self.clock()
+        self._token = result["access_token"]
+        self._expires_at = now + lifetime
+        self._refresh_at = now + max(0.0, lifetime - self.refresh_margin)
+        if self.background_refresh:
+            self._schedule(self._refresh_at - self.clock())
+
+    def _schedule(self, delay: float) -> None:
+        if self._closed:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._refresh_in_background)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self.clock() < self._refresh_at:
+                return  # already refreshed by a caller
+            try:
+                self._refresh()
+            except Exception:  # callers retry synchronously in get_token
+                self._schedule(min(60.0, self.refresh_margin / 5))
+
+    def close(self) -> None:
+        """Stop background refreshing."""
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+def get_token_provider(
+    client_id: str, tenant_id: str, client_secret: str
+) -> GraphTokenProvider:
+    """Return the shared provider for ``(tenant_id, client_id)``.
+
+    A provider built with a different secret (for example after rotation)
+    is replaced.
+    """
+    key = (tenant_id, client_id)
+    with _providers_lock:
+        provider = _providers.get(key)
+        if provider is None or provider.secret_digest != _digest(client_secret):
+            if provider is not None:
+                provider.close()
+            provider = GraphTokenProvider(client_id, tenant_id, client_secret)
+            _providers[key] = provider
+        return provider
+
+
+def clear_token_providers() -> None:
+    """Stop and forget every shared provider."""
+    with _providers_lock:
+        while _providers:
+            _, provider = _providers.popitem()
+            provider.close()
@@ -4,17 +4,16 @@ from __future__ import annotations
 import os
 from typing import Optional
 
-import msal
 import requests
 
+from email_templates_gen.integrations.graph_auth import get_token_provider
+
 GRAPH_ENDPOINT = "https://graph.microsoft.com/v1.0"
-SCOPES = ["https://graph.microsoft.com/.default"]
 
 CLIENT_ID = os.getenv("OUTLOOK_CLIENT_ID")
 TENANT_ID = os.getenv("OUTLOOK_TENANT_ID")
 CLIENT_SECRET = os.getenv("OUTLOOK_CLIENT_SECRET")
 SENDER_ADDRESS = os.getenv("OUTLOOK_SENDER")
-AUTHORITY_TEMPLATE = "https://login.microsoftonline.com/{tenant_id}"
 
 
 def get_access_token(
@@ -22,7 +21,11 @@ def get_access_token(
     client_secret: Optional[str] = None,
     tenant_id: Optional[str] = None,
 ) -> str:
-    """Return an access token for Microsoft Graph."""
+    """Return an access token for Microsoft Graph.
+
+    Tokens come from the shared provider for the tenant and client, so they
+    are reused until shortly before expiry instead of fetched per call.
+    """
     client_id = client_id or CLIENT_ID
     tenant_id = tenant_id or TENANT_ID
     client_secret = client_secret or CLIENT_SECRET
@@ -30,19 +33,7 @@ def get_access_token(
     if not all([client_id, tenant_id, client_secret]):
         raise ValueError("Client ID, tenant ID and client secret are required")
 
-    app = msal.ConfidentialClientApplication(
-        client_id,
-        authority=AUTHORITY_TEMPLATE.format(tenant_id=tenant_id),
-        client_credential=client_secret,
-    )
-
-    result = app.acquire_token_silent(SCOPES, account=None)
-    if not result:
-        result = app.acquire_token_for_client(scopes=SCOPES)
-    if "access_token" not in result:
-        error = result.get("error_description", "Unknown error")
-        raise RuntimeError(f"Failed to obtain access token: {error}")
-    return result["access_token"]
+    return get_token_provider(client_id, tenant_id, client_secret).get_token()
 
 
 def send_email(
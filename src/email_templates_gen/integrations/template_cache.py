@@ -0,0 +1,187 @@
+"""Local read-through cache for templates downloaded from SharePoint.
+
+File contents are stored once per sha256 under ``objects/`` and an SQLite
+index maps each remote file (site URL plus server-relative URL) to its
+content hash and to the ETag and last-modified time it had when it was
+downloaded. Callers revalidate the ETag with a metadata request and only
+download the file again when it changed (see
+``sharepoint.fetch_template``). The cache is bounded in bytes
+and evicts the least recently used entries.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+TEMPLATE_CACHE_DIR = Path(os.getenv("TEMPLATE_CACHE_DIR", "models/template_cache"))
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_caches: Dict[str, "TemplateCache"] = {}
+_caches_lock = threading.Lock()
+
+
+@dataclass
+class CachedTemplate:
+    """A cached remote file and the validators it was downloaded with."""
+
+    path: Path
+    etag: Optional[str]
+    last_modified: Optional[str]
+    size: int
+
+
+class TemplateCache:
+    """Content-addressed template store with an LRU byte budget."""
+
+    def __init__(
+        self, root: Path | str = TEMPLATE_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES
+    ) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.root / "index.sqlite3"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS templates ("
+            "site_url TEXT NOT NULL, file_url TEXT NOT NULL, sha256 TEXT NOT NULL, "
+            "size INTEGER NOT NULL, etag TEXT, last_modified TEXT, "
+            "last_used REAL NOT NULL, PRIMARY KEY (site_url, file_url))"
+        )
+        self._conn.commit()
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.root / "objects" / sha256[:2] / sha256
+
+    def get(self, site_url: str, file_url: str) -> Optional[CachedTemplate]:
+        """Return the cached copy of a remote file, if any, and mark it used."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, size, etag, last_modified FROM templates "
+                "WHERE site_url = ? AND file_url = ?",
+                (site_url, file_url),
+            ).fetchone()
+            if row is None:
+                return None
+            path = self._object_path(row[0])
+            if not path.exists():  # object removed behind the index's back
+                self._conn.execute(
+                    "DELETE FROM templates WHERE site_url = ? AND file_url = ?",
+                    (site_url, file_url),
+                )
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE templates SET last_used = ? "
+                "WHERE site_url = ? AND file_url = ?",
+                (time.time(), site_url, file_url),
+            )
+            self._conn.commit()
+        return CachedTemplate(path, row[2], row[3], row[1])
+
+    def staging_file(self):
+        """Return a temporary file in the cache directory to download into."""
+        return tempfile.NamedTemporaryFile(
+            dir=self.root, prefix=".download-", delete=False
+        )
+
+    def put(
+        self,
+        site_url: str,
+        file_url: str,
+        staged_path: Path | str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> CachedTemplate:
+        """Move a downloaded file into the cache and record its validators."""
+        staged = Path(staged_path)
+        digest = hashlib.sha256()
+        with staged.open("rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+        size = staged.stat().st_size
+        target = self._object_path(sha256)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(staged, target)
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT sha256 FROM templates WHERE site_url = ? AND file_url = ?",
+                (site_url, file_url),
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO templates (site_url, file_url, sha256, size, "
+                "etag, last_modified, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (site_url, file_url, sha256, size, etag, last_modified, time.time()),
+            )
+            if previous is not None and previous[0] != sha256:
+                # The file changed remotely; drop its old contents unless
+                # another file still shares them
+                self._unlink_unreferenced(previous[0])
+            self._evict()
+            self._conn.commit()
+        return CachedTemplate(target, etag, last_modified, size)
+
+    def _unlink_unreferenced(self, sha256: str) -> None:
+        referenced = self._conn.execute(
+            "SELECT 1 FROM templates WHERE sha256 = ? LIMIT 1", (sha256,)
+        ).fetchone()
+        if referenced is None:
+            self._object_path(sha256).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        rows = self._conn.execute(
+            "SELECT site_url, file_url, sha256, size FROM templates "
+            "ORDER BY last_used DESC"
+        ).fetchall()
+        kept, total = set(), 0
+        for site_url, file_url, sha256, size in rows:
+            # Identical contents are stored once, so count each object once
+            if sha256 not in kept:
+                if total + size > self.max_bytes and kept:
+                    self._conn.execute(
+                        "DELETE FROM templates WHERE site_url = ? AND file_url = ?",
+                        (site_url, file_url),
+                    )
+                    continue
+                kept.add(sha256)
+                total += size
+        for sha256 in {row[2] for row in rows} - kept:
+            self._object_path(sha256).unlink(missing_ok=True)
+
+    def total_bytes(self) -> int:
+        """Bytes of distinct cached contents."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM "
+                "(SELECT DISTINCT sha256, size FROM templates)"
+            ).fetchone()
+        return int(row[0])
+
+    def clear(self) -> None:
+        """Remove every cached template."""
+        with self._lock:
+            self._conn.execute("DELETE FROM templates")
+            self._conn.commit()
+            shutil.rmtree(self.root / "objects", ignore_errors=True)
+            (self.root / "objects").mkdir(parents=True, exist_ok=True)
+
+
+def get_template_cache(root: Path | str = TEMPLATE_CACHE_DIR) -> TemplateCache:
+    """Return the process-wide template cache rooted at ``root``."""
+    key = str(Path(root).resolve())
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = TemplateCache(root)
+        return _caches[key]
@@ -0,0 +1,95 @@
+import asyncio
+import csv
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from email_generator import batch
+
+
+def write_csv(path, texts):
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["text", "clean_text"])
+        writer.writeheader()
+        for text in texts:
+            writer.writerow({"text": text, "clean_text": "[]"})
+
+
+def make_generate(fail_on=()):
+    calls = []
+
+    async def generate(input_text, tone, purpose, openai_api_key, scheduler=None):
+        calls.append(input_text)
+        if input_text in fail_on:
+            raise RuntimeError("boom")
+        for token in ["Re: ", input_text]:
+            await asyncio.sleep(0)
+            yield token
+
+    return generate, calls
+
+
+def read_output(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_run_batch_writes_results_and_resumes(tmp_path):
+    source = tmp_path / "emails.csv"
+    output = tmp_path / "out" / "replies.jsonl"
+    write_csv(source, ["a", "b", "c", "d"])
+
+    generate, calls = make_generate(fail_on={"c"})
+    report = asyncio.run(
+        batch.run_batch(source, output, "key", concurrency=2, generate=generate)
+    )
+    assert (report.succeeded, report.failed, report.skipped) == (3, 1, 0)
+    assert len(report.latencies_ms) == 3
+    results = {r["id"]: r for r in read_output(output)}
+    assert results["0"]["email"] == "Re: a"
+    assert results["2"]["status"] == "error"
+
+    # Second run only retries the row that failed
+    generate, calls = make_generate()
+    report = asyncio.run(
+        batch.run_batch(source, output, "key", concurrency=2, generate=generate)
+    )
+    assert calls == ["c"]
+    assert (report.succeeded, report.failed, report.skipped) == (1, 0, 3)
+    assert batch.completed_ids(output) == {"0", "1", "2", "3"}
+
+
+def test_iter_rows_reads_jsonl_with_ids(tmp_path):
+    source = tmp_path / "emails.jsonl"
+    source.write_text(
+        json.dumps({"id": "x1", "input_text": "hello", "tone": "Friendly"})
+        + "\n"
+        + json.dumps({"text": "second"})
+        + "\n"
+    )
+
+    rows = list(batch.iter_rows(source))
+    assert [(r["id"], r["input_text"]) for r in rows] == [
+        ("x1", "hello"),
+        ("1", "second"),
+    ]
+    assert rows[0]["tone"] == "Friendly"
+
+
+def test_blank_rows_are_recorded_as_errors(tmp_path):
+    source = tmp_path / "emails.csv"
+    output = tmp_path / "replies.jsonl"
+    write_csv(source, ["a", "", "c"])
+
+    generate, calls = make_generate()
+    report = asyncio.run(
+        batch.run_batch(source, output, "key", concurrency=2, generate=generate)
+    )
+
+    assert sorted(calls) == ["a", "c"]
+    assert (report.succeeded, report.failed) == (2, 1)
+    results = {r["id"]: r for r in read_output(output)}
+    assert results["1"]["status"] == "error"
+    assert "no 'text' or 'input_text' value" in results["1"]["error"]
+    assert results["2"]["email"] == "Re: c"
@@ -0,0 +1,60 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from email_generator import prompts
+from learnbot.context_packer import pack_context
+
+
+class WordEncoding:
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+def doc(text):
+    return SimpleNamespace(page_content=text, metadata={})
+
+
+def test_packs_best_chunks_that_fit_and_drops_duplicates(monkeypatch):
+    monkeypatch.setattr(prompts, "get_encoding", lambda model: WordEncoding())
+    ranked = [
+        doc("Set OUTLOOK_CLIENT_ID in the env file before sending mail."),
+        doc("Set OUTLOOK_CLIENT_ID in the env file before sending mail!"),
+        doc(" ".join(["long"] * 30)),
+        doc("Run streamlit run app.py to start."),
+        doc("   "),
+        doc("Templates live on SharePoint."),
+    ]
+
+    packed = pack_context(ranked, budget=20, model="gpt-4")
+
+    assert [d.page_content for d in packed.documents] == [
+        ranked[0].page_content,
+        ranked[3].page_content,
+        ranked[5].page_content,
+    ]
+    assert packed.duplicates == 1
+    assert packed.tokens == 9 + 6 + 4
+    assert packed.text.split("\n\n")[1] == "Run streamlit run app.py to start."
+
+
+def test_chunk_over_budget_does_not_shadow_its_near_duplicate(monkeypatch):
+    monkeypatch.setattr(prompts, "get_encoding", lambda model: WordEncoding())
+    words = "Set OUTLOOK_CLIENT_ID in the env file before sending any mail".split()
+    ranked = [doc(" ".join(words + ["today"])), doc(" ".join(words))]
+
+    packed = pack_context(ranked, budget=len(words), model="gpt-4")
+
+    assert packed.documents == [ranked[1]]
+    assert packed.duplicates == 0
+
+
+def test_empty_budget_packs_nothing(monkeypatch):
+    monkeypatch.setattr(prompts, "get_encoding", lambda model: WordEncoding())
+    packed = pack_context([doc("some text")], budget=0, model="gpt-4")
+    assert packed.text == "" and packed.documents == []
@@ -1,3 +1,4 @@
+import asyncio
 import importlib
 import sys
 import os
@@ -8,7 +9,7 @@ from types import ModuleType, SimpleNamespace
 def setup_fake_openai():
     fake_module = ModuleType('openai')
     class FakeClient:
-        def __init__(self, api_key=None):
+        def __init__(self, api_key=None, **kwargs):
             self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
         def create(self, model=None, messages=None, stream=False):
             chunks = [
@@ -16,14 +17,38 @@ def setup_fake_openai():
                 SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=" World"))]),
             ]
             return iter(chunks)
+    class FakeAsyncClient:
+        def __init__(self, api_key=None, **kwargs):
+            self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        async def create(self, model=None, messages=None, stream=False):
+            async def chunks():
+                for content in ["Hello", " World"]:
+                    yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+            return chunks()
     fake_module.OpenAI = FakeClient
+    fake_module.AsyncOpenAI = FakeAsyncClient
     return fake_module
 
 
-def test_stream_generated_email_yields_tokens(monkeypatch):
+def load_generator(monkeypatch):
     sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
     monkeypatch.setitem(sys.modules, 'openai', setup_fake_openai())
+    importlib.reload(importlib.import_module('email_generator.openai_client'))
+    importlib.reload(importlib.import_module('email_generator.scheduler'))
     module = importlib.import_module('email_generator.generator')
-    importlib.reload(module)
+    return importlib.reload(module)
+
+
+def test_stream_generated_email_yields_tokens(monkeypatch):
+    module = load_generator(monkeypatch)
     tokens = list(module.stream_generated_email('input', 'Friendly', 'purpose', 'key'))
     assert tokens == ["Hello", " World"]
+
+
+def test_astream_generated_email_yields_same_tokens(monkeypatch):
+    module = load_generator(monkeypatch)
+
+    async def collect():
+        return [t async for t in module.astream_generated_email('input', 'Friendly', 'purpose', 'key')]
+
+    assert asyncio.run(collect()) == ["Hello", " World"]
@@ -0,0 +1,58 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from learnbot.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings:
+    model = "fake-embedding"
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return [float(len(text)), 1.0]
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = EmbeddingCache(path)
+    cache.put_many("m", ["hello world"], [[0.5, 0.25]])
+    cache.close()
+
+    reopened = EmbeddingCache(path)
+    # Keys are normalized, so whitespace differences still hit the cache
+    assert reopened.get_many("m", ["hello   world ", "other"]) == [[0.5, 0.25], None]
+    assert reopened.get_many("other-model", ["hello world"]) == [None]
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3", max_entries=2)
+    cache.put_many("m", ["a"], [[1.0]])
+    cache.put_many("m", ["b"], [[2.0]])
+    cache.get_many("m", ["a"])  # "b" is now the least recently used
+    cache.put_many("m", ["c"], [[3.0]])
+
+    assert len(cache) == 2
+    assert cache.get_many("m", ["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+
+def test_cached_embeddings_only_embeds_misses(tmp_path):
+    inner = CountingEmbeddings()
+    embeddings = CachedEmbeddings(inner, EmbeddingCache(tmp_path / "cache.sqlite3"))
+
+    first = embeddings.embed_documents(["one", "two", "one"])
+    second = embeddings.embed_documents(["two", "three"])
+
+    assert inner.calls == [["one", "two"], ["three"]]
+    assert first == [[3.0, 1.0], [3.0, 1.0], [3.0, 1.0]]
+    assert second == [[3.0, 1.0], [5.0, 1.0]]
+    assert embeddings.embed_query("three") == [5.0, 1.0]
+    assert len(inner.calls) == 2
@@ -0,0 +1,119 @@
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from learnbot import embedding_executor
+from learnbot.embedding_executor import EmbeddingExecutor, RateLimiter
+
+
+class RateLimitError(Exception):
+    status_code = 429
+    response = SimpleNamespace(headers={"retry-after-ms": "1"})
+
+
+class FakeClient:
+    """Embeds each text as ``[number]``; rejects batches above ``limit`` inputs."""
+
+    def __init__(self, limit=None, delay=0.0):
+        self.limit = limit
+        self.delay = delay
+        self.batches = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self.embeddings = self
+
+    def with_options(self, **options):
+        return self
+
+    def create(self, model, input):
+        with self._lock:
+            self.batches.append(list(input))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if self.limit is not None and len(input) > self.limit:
+                raise RateLimitError()
+            data = [
+                SimpleNamespace(index=i, embedding=[float(text.split()[1])])
+                for i, text in enumerate(input)
+            ]
+            return SimpleNamespace(data=data[::-1])
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    monkeypatch.setattr(
+        embedding_executor, "count_tokens", lambda text, model: len(text.split())
+    )
+
+
+def make_executor(client, **kwargs):
+    kwargs.setdefault("limiter", RateLimiter(1e9, 1e12))
+    return EmbeddingExecutor(client, model="fake", **kwargs)
+
+
+def texts(count):
+    return [f"text {i}" for i in range(count)]
+
+
+def test_batches_are_token_bounded_concurrent_and_ordered():
+    client = FakeClient(delay=0.02)
+    executor = make_executor(client, concurrency=4, max_batch_tokens=10)
+
+    vectors = executor.embed_documents(texts(40))
+
+    assert vectors == [[float(i)] for i in range(40)]
+    assert all(len(batch) == 5 for batch in client.batches)  # 2 tokens per text
+    assert len(client.batches) == 8
+    assert client.peak > 1
+
+
+def test_rate_limits_shrink_batches_and_retry(monkeypatch):
+    monkeypatch.setattr(embedding_executor, "MIN_BATCH_TOKENS", 2)
+    client = FakeClient(limit=3)
+    executor = make_executor(client, concurrency=2, max_batch_tokens=20)
+
+    vectors = executor.embed_documents(texts(30))
+
+    assert vectors == [[float(i)] for i in range(30)]
+    assert executor.rate_limited > 0
+    assert executor.batch_tokens < 20
+    assert executor.requests == sum(len(b) <= 3 for b in client.batches)
+
+
+def test_persistent_rate_limits_raise(monkeypatch):
+    monkeypatch.setattr(embedding_executor, "MAX_RATE_LIMIT_RETRIES", 2)
+    executor = make_executor(FakeClient(limit=0), concurrency=2)
+
+    with pytest.raises(RateLimitError):
+        executor.embed_documents(texts(4))
+
+
+def test_rate_limiter_waits_for_token_budget():
+    now = [0.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(600, 1200, clock=lambda: now[0], sleep=sleep)
+    limiter.acquire(1000)
+    limiter.acquire(400)  # 200 tokens short at 20 tokens per second
+
+    assert slept == [pytest.approx(10.0)]
+
+    limiter.pause(5)
+    limiter.acquire(1)
+    assert now[0] == pytest.approx(15.0)
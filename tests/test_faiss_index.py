@@ -0,0 +1,58 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from learnbot.faiss_index import INDEX_TYPES, index_spec, ivf_lists, pq_subquantizers
+
+faiss = pytest.importorskip("faiss")
+np = pytest.importorskip("numpy")
+
+
+def test_index_spec_scales_with_corpus_size():
+    assert index_spec("ivf-pq", 1536, 20_000) == "IVF512,PQ64x8"
+    assert index_spec("hnsw-fp16", 1536, 5_000) == "HNSW32_SQfp16"
+    assert index_spec("ivf-flat", 1536, 500) == "Flat"
+    assert index_spec("ivf-pq", 1536, 5_000) == "IVF128,Flat"  # too few for PQ
+    assert index_spec("flat-fp16", 1536, 10) == "SQfp16"
+    assert ivf_lists(100) == 2 and pq_subquantizers(96) == 48
+    with pytest.raises(ValueError):
+        index_spec("lsh", 8, 10)
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_every_type_finds_a_stored_vector(monkeypatch, index_type):
+    from learnbot import faiss_index
+    from learnbot.faiss_index import create_index, supports_removal
+
+    monkeypatch.setattr(faiss_index, "PQ_BITS", 4)  # 16 centroids train quickly
+
+    vectors = np.random.default_rng(0).normal(size=(1200, 16)).astype("float32")
+    index = create_index(vectors, index_type)
+
+    assert index.ntotal == 1200
+    _, ids = index.search(vectors[:20], 1)
+    assert (ids[:, 0] == np.arange(20)).mean() >= 0.8
+    assert supports_removal(index) == index_type.startswith("flat")
+
+
+@pytest.mark.parametrize("index_type", ["flat", "flat-fp16", "ivf-flat", "ivf-pq"])
+def test_only_removable_indexes_renumber_after_delete(monkeypatch, index_type):
+    from learnbot import faiss_index
+    from learnbot.faiss_index import create_index, supports_removal
+
+    monkeypatch.setattr(faiss_index, "PQ_BITS", 4)
+    vectors = np.random.default_rng(1).normal(size=(2000, 16)).astype("float32")
+    index = create_index(vectors, index_type)
+    faiss_index.set_search_parameters(index, nprobe=64)
+
+    index.remove_ids(np.arange(10, dtype="int64"))
+    _, ids = index.search(vectors[-1:], 1)
+
+    # The LangChain store maps position i to the i-th remaining chunk, which
+    # is only right when FAISS compacted the ids; otherwise update_index must
+    # rebuild instead of deleting
+    assert (ids[0, 0] == 1989) == supports_removal(index)
+    assert ids[0, 0] in (1989, 1999)
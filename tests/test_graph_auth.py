@@ -0,0 +1,91 @@
+import importlib
+import sys
+import threading
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+class FakeApp:
+    instances = []
+
+    def __init__(self, client_id, authority=None, client_credential=None):
+        self.calls = 0
+        FakeApp.instances.append(self)
+
+    def acquire_token_for_client(self, scopes=None):
+        self.calls += 1
+        return {"access_token": f"token-{self.calls}", "expires_in": 3600}
+
+
+def load_graph_auth(monkeypatch):
+    fake_msal = ModuleType("msal")
+    fake_msal.ConfidentialClientApplication = FakeApp
+    FakeApp.instances = []
+    monkeypatch.setitem(sys.modules, "msal", fake_msal)
+    module = importlib.reload(
+        importlib.import_module("email_templates_gen.integrations.graph_auth")
+    )
+    importlib.reload(importlib.import_module("email_generator.graph_auth"))
+    return module
+
+
+def test_token_is_cached_until_refresh_margin(monkeypatch):
+    graph_auth = load_graph_auth(monkeypatch)
+    now = [1000.0]
+    provider = graph_auth.GraphTokenProvider(
+        "client", "tenant", "secret", background_refresh=False, clock=lambda: now[0]
+    )
+
+    tokens = []
+    threads = [
+        threading.Thread(target=lambda: tokens.append(provider.get_token()))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tokens == ["token-1"] * 8
+    assert provider._app.calls == 1
+
+    now[0] += 3600 - graph_auth.REFRESH_MARGIN_SECONDS - 1
+    assert provider.get_token() == "token-1"
+    now[0] += 2
+    assert provider.get_token() == "token-2"
+
+
+def test_outlook_reuses_one_app_per_tenant_and_client(monkeypatch):
+    graph_auth = load_graph_auth(monkeypatch)
+    outlook = importlib.reload(
+        importlib.import_module("email_generator.outlook_integration")
+    )
+    try:
+        for _ in range(3):
+            assert outlook.get_access_token("client", "secret", "tenant") == "token-1"
+        outlook.get_access_token("other-client", "secret", "tenant")
+        outlook.get_access_token("client", "rotated", "tenant")
+        assert [app.calls for app in FakeApp.instances] == [1, 1, 1]
+    finally:
+        graph_auth.clear_token_providers()
+
+
+def test_failed_refresh_keeps_serving_the_unexpired_token(monkeypatch):
+    graph_auth = load_graph_auth(monkeypatch)
+    now = [1000.0]
+    provider = graph_auth.GraphTokenProvider(
+        "client", "tenant", "secret", background_refresh=False, clock=lambda: now[0]
+    )
+    assert provider.get_token() == "token-1"
+
+    provider._app.acquire_token_for_client = lambda scopes=None: {
+        "error_description": "authority unavailable"
+    }
+    now[0] += 3600 - graph_auth.REFRESH_MARGIN_SECONDS + 1
+    assert provider.get_token() == "token-1"
+    now[0] += graph_auth.REFRESH_MARGIN_SECONDS
+    with pytest.raises(RuntimeError, match="authority unavailable"):
+        provider.get_token()
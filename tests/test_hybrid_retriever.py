@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from learnbot.hybrid_retriever import (
+    HybridRetriever,
+    get_hybrid_retriever,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+
+CHUNKS = [
+    "Set OUTLOOK_CLIENT_ID and OUTLOOK_TENANT_ID in your .env file.",
+    "upload_template saves a draft to the SharePoint folder.",
+    "The Play page streams a generated email.",
+    "Outlook messages are queued in the outbox.",
+]
+
+
+class FakeStore:
+    def __init__(self, texts, vector_order=None, delay=0.0, error=None):
+        self.docs = {
+            str(i): SimpleNamespace(page_content=t, metadata={"source": f"{i}.md"})
+            for i, t in enumerate(texts)
+        }
+        self.docstore = SimpleNamespace(search=self.docs.__getitem__)
+        self.index_to_docstore_id = {i: str(i) for i in range(len(texts))}
+        self.vector_order = vector_order or list(range(len(texts)))
+        self.delay = delay
+        self.error = error
+
+    def similarity_search(self, query, k=4):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return [self.docs[str(i)] for i in self.vector_order[:k]]
+
+
+def contents(docs):
+    return [d.page_content for d in docs]
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("Where is OUTLOOK_CLIENT_ID set?") == [
+        "where", "outlook_client_id", "outlook", "client", "id", "set"
+    ]
+
+
+def test_lexical_ranking_finds_exact_identifiers():
+    retriever = HybridRetriever(FakeStore(CHUNKS))
+    assert contents(retriever.search("What does upload_template do?", 1, mode="lexical")) == [
+        CHUNKS[1]
+    ]
+    assert contents(retriever.search("OUTLOOK_CLIENT_ID", 1, mode="lexical")) == [CHUNKS[0]]
+
+
+def test_fusion_combines_both_rankings():
+    a, b, c = (SimpleNamespace(page_content=x, metadata={}) for x in "abc")
+    assert contents(reciprocal_rank_fusion([[a, b, c], [b]])) == ["b", "a", "c"]
+
+    store = FakeStore(CHUNKS, vector_order=[3, 2, 1, 0])
+    fused = HybridRetriever(store).search("outlook outbox client id", 2)
+    assert contents(fused) == [CHUNKS[3], CHUNKS[0]]
+
+
+def test_slow_or_failing_vector_search_falls_back_to_lexical():
+    slow = HybridRetriever(FakeStore(CHUNKS, vector_order=[2], delay=1.0), vector_timeout=0.05)
+    start = time.perf_counter()
+    assert contents(slow.search("upload_template", 1)) == [CHUNKS[1]]
+    assert time.perf_counter() - start < 0.5
+
+    failing = HybridRetriever(FakeStore(CHUNKS, error=ConnectionError("offline")))
+    assert contents(failing.search("outbox", 1, mode="vector")) == [CHUNKS[3]]
+
+
+def test_retriever_is_cached_per_store_until_it_changes():
+    store = FakeStore(CHUNKS)
+    first = get_hybrid_retriever(store)
+    assert get_hybrid_retriever(store) is first
+
+    store.docs["4"] = SimpleNamespace(page_content="new chunk", metadata={})
+    store.index_to_docstore_id[4] = "4"
+    assert get_hybrid_retriever(store) is not first
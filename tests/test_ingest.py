@@ -0,0 +1,53 @@
+import os
+from types import SimpleNamespace
+
+from learnbot import ingest
+from learnbot.ingest import IngestTimings, iter_chunk_batches, iter_split_sources
+
+
+def fake_load(source):
+    # Module-level so pool workers can unpickle it
+    count = int(source.rsplit("-", 1)[1])
+    return [
+        SimpleNamespace(page_content=f"{source} {i}", metadata={"pid": os.getpid()})
+        for i in range(count)
+    ]
+
+
+def test_split_sources_keeps_file_order_across_workers(monkeypatch):
+    monkeypatch.setattr(ingest, "MIN_PARALLEL_FILES", 2)
+    sources = [f"docs/f{i}-{i % 4 + 1}" for i in range(12)]
+
+    results = list(iter_split_sources(sources, workers=3, load=fake_load))
+
+    assert [source for source, _ in results] == sources
+    assert [len(chunks) for _, chunks in results] == [i % 4 + 1 for i in range(12)]
+    pids = {c.metadata["pid"] for _, chunks in results for c in chunks}
+    assert os.getpid() not in pids
+
+
+def test_small_corpora_are_split_in_process():
+    results = list(iter_split_sources(["a-2", "b-1"], workers=8, load=fake_load))
+
+    assert [len(chunks) for _, chunks in results] == [2, 1]
+    assert results[0][1][0].metadata["pid"] == os.getpid()
+
+
+def test_batches_hold_whole_files_and_record_timings():
+    timings = IngestTimings()
+    sources = ["a-3", "b-3", "c-1", "d-4", "e-0"]
+
+    batches = list(
+        iter_chunk_batches(
+            sources, batch_size=4, workers=1, timings=timings, load=fake_load
+        )
+    )
+
+    assert [[source for source, _ in batch] for batch in batches] == [
+        ["a-3", "b-3"],
+        ["c-1", "d-4"],
+        ["e-0"],
+    ]
+    assert (timings.files, timings.chunks) == (5, 11)
+    assert timings.load >= 0
+    assert "5 files, 11 chunks" in timings.summary()
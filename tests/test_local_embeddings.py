@@ -0,0 +1,61 @@
+import os
+import sys
+from types import ModuleType
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from learnbot import local_embeddings
+
+
+class FakeSentenceTransformer:
+    loads = []
+
+    def __init__(self, name, device=None, **options):
+        FakeSentenceTransformer.loads.append((name, device, options))
+        self.calls = []
+
+    def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy, **_):
+        self.calls.append((list(texts), batch_size, normalize_embeddings))
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture(autouse=True)
+def fake_sentence_transformers(monkeypatch):
+    module = ModuleType("sentence_transformers")
+    module.SentenceTransformer = FakeSentenceTransformer
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    monkeypatch.setattr(local_embeddings, "_models", {})
+    FakeSentenceTransformer.loads = []
+
+
+def test_model_is_loaded_once_per_process():
+    first = local_embeddings.get_local_embeddings("tiny", "torch")
+    again = local_embeddings.get_local_embeddings("tiny", "torch")
+    onnx = local_embeddings.get_local_embeddings("tiny", "onnx")
+
+    assert first is again and onnx is not first
+    assert FakeSentenceTransformer.loads == [
+        ("tiny", "cpu", {}),
+        ("tiny", "cpu", {"backend": "onnx"}),
+    ]
+    assert first.model == "local:tiny"
+
+
+def test_documents_are_encoded_in_batches_and_normalised():
+    embeddings = local_embeddings.LocalEmbeddings("tiny", batch_size=16)
+
+    assert embeddings.embed_documents(["ab", "abc"]) == [[2.0, 1.0], [3.0, 1.0]]
+    assert embeddings.embed_query("abcd") == [4.0, 1.0]
+    assert embeddings.embed_documents([]) == []
+    assert embeddings.encoder.calls == [(["ab", "abc"], 16, True), (["abcd"], 16, True)]
+
+
+def test_missing_package_names_the_extra(monkeypatch):
+    monkeypatch.setitem(sys.modules, "sentence_transformers", None)
+
+    with pytest.raises(ImportError, match=r"email-templates-gen\[local\]"):
+        local_embeddings.LocalEmbeddings("tiny")
@@ -0,0 +1,57 @@
+import importlib
+import os
+import sys
+from types import ModuleType
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def setup_fake_openai():
+    fake_module = ModuleType('openai')
+    class FakeClient:
+        def __init__(self, api_key=None, base_url=None, max_retries=2, http_client=None):
+            self.api_key = api_key
+            self.max_retries = max_retries
+            self.http_client = http_client
+            self.closed = False
+        def close(self):
+            self.closed = True
+    fake_module.OpenAI = FakeClient
+    fake_module.AsyncOpenAI = FakeClient
+    return fake_module
+
+
+def load_registry(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'openai', setup_fake_openai())
+    module = importlib.import_module('email_generator.openai_client')
+    module = importlib.reload(module)
+    monkeypatch.setattr(module, 'client_options', lambda api_key=None: dict(module.DEFAULT_CLIENT_OPTIONS))
+    return module
+
+
+def test_get_openai_client_reuses_client_per_key(monkeypatch):
+    registry = load_registry(monkeypatch)
+
+    first = registry.get_openai_client('key-a')
+    assert registry.get_openai_client('key-a') is first
+    assert registry.get_openai_client('key-b') is not first
+    assert first.max_retries == registry.DEFAULT_CLIENT_OPTIONS['max_retries']
+    assert first.http_client is not None
+
+
+def test_get_openai_client_evicts_least_recently_used(monkeypatch):
+    registry = load_registry(monkeypatch)
+    monkeypatch.setattr(registry, 'MAX_CLIENTS', 2)
+
+    a = registry.get_openai_client('a')
+    b = registry.get_openai_client('b')
+    registry.get_openai_client('a')
+    registry.get_openai_client('c')
+
+    # Evicted clients may still be in use elsewhere, so they stay open
+    assert not b.closed and not a.closed
+    assert registry.get_openai_client('a') is a
+    assert registry.get_openai_client('b') is not b
+
+    registry.close_openai_clients()
+    assert a.closed
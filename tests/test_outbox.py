@@ -0,0 +1,137 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from email_generator.outbox import FAILED, QUEUED, SENT, Outbox, OutboxDispatcher
+
+
+def http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(f"{status} error", response=response)
+
+
+class FakeSender:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+        self.calls = []
+
+    def __call__(self, recipient, subject, body, sender=None, tenant_id=None):
+        with self.lock:
+            self.calls.append(recipient)
+            self.active[sender] = self.active.get(sender, 0) + 1
+            self.peak[sender] = max(self.peak.get(sender, 0), self.active[sender])
+            attempt = self.calls.count(recipient)
+        try:
+            time.sleep(0.01)
+            if recipient == "throttled@example.com" and attempt == 1:
+                raise http_error(429, {"Retry-After": "0.05"})
+            if recipient == "flaky@example.com" and attempt < 3:
+                raise requests.ConnectionError("connection reset")
+            if recipient == "invalid@example.com":
+                raise http_error(400)
+        finally:
+            with self.lock:
+                self.active[sender] -= 1
+
+
+def test_dispatcher_retries_throttles_and_caps_concurrency(tmp_path):
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    for i in range(12):
+        outbox.enqueue(
+            f"user{i}@example.com", "Hi", "body", sender="a@example.com", tenant_id="t"
+        )
+    for recipient in (
+        "throttled@example.com",
+        "flaky@example.com",
+        "invalid@example.com",
+    ):
+        outbox.enqueue(recipient, "Hi", "body", sender="b@example.com", tenant_id="t")
+
+    send = FakeSender()
+    dispatcher = OutboxDispatcher(
+        outbox, send=send, per_mailbox=2, base_delay=0.01, poll_interval=0.005
+    )
+    asyncio.run(asyncio.wait_for(dispatcher.drain(), 10))
+
+    assert outbox.counts() == {QUEUED: 0, "sending": 0, SENT: 14, FAILED: 1}
+    assert max(send.peak.values()) == 2
+    assert send.calls.count("throttled@example.com") == 2
+    assert send.calls.count("flaky@example.com") == 3
+    assert send.calls.count("invalid@example.com") == 1
+    metrics = dispatcher.metrics()
+    assert metrics["queue_depth"] == 0
+    assert metrics["sent_per_minute"] == 14
+    assert metrics["throttled"] == 1 and metrics["retried"] == 3
+
+
+def test_interrupted_sends_are_requeued_once_their_lease_expires(tmp_path):
+    path = tmp_path / "outbox.sqlite3"
+    outbox = Outbox(path, lease_seconds=60)
+    message_id = outbox.enqueue("x@example.com", "Hi", "body", sender="a@example.com")
+    assert outbox.claim(message_id)
+
+    # Another process opening the outbox leaves a live claim alone
+    reopened = Outbox(path)
+    assert reopened.get(message_id)["status"] == "sending"
+    assert reopened.ready(10) == []
+
+    assert [row["id"] for row in reopened.ready(10, now=time.time() + 61)] == [
+        message_id
+    ]
+    assert reopened.get(message_id)["status"] == QUEUED
+
+
+def test_each_message_is_claimed_by_one_dispatcher(tmp_path):
+    path = tmp_path / "outbox.sqlite3"
+    first, second = Outbox(path), Outbox(path)
+    message_id = first.enqueue("x@example.com", "Hi", "body", sender="a@example.com")
+
+    # Both processes see the message as due before either claims it
+    assert [row["id"] for row in first.ready(10)] == [message_id]
+    assert [row["id"] for row in second.ready(10)] == [message_id]
+    assert first.claim(message_id)
+    assert not second.claim(message_id)
+    assert second.get(message_id)["attempts"] == 1
+
+
+def test_wait_returns_the_final_status(tmp_path):
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    message_id = outbox.enqueue("x@example.com", "Hi", "body", sender="a@example.com")
+    assert outbox.wait(message_id, timeout=0)["status"] == QUEUED
+
+    outbox.claim(message_id)
+    outbox.mark_failed(message_id, "400 error")
+    row = outbox.wait(message_id, timeout=5)
+    assert row["status"] == FAILED and row["last_error"] == "400 error"
+
+
+def test_background_dispatcher_starts_without_arguments(monkeypatch, tmp_path):
+    from email_generator import outbox as outbox_module
+
+    default = Outbox(tmp_path / "outbox.sqlite3")
+    key = str(outbox_module.OUTBOX_PATH.resolve())
+    monkeypatch.setitem(outbox_module._outboxes, key, default)
+    monkeypatch.setattr(outbox_module, "_dispatcher", None)
+    monkeypatch.setattr(outbox_module, "_dispatcher_thread", None)
+
+    result = {}
+    caller = threading.Thread(
+        target=lambda: result.update(d=outbox_module.start_background_dispatcher()),
+        daemon=True,
+    )
+    caller.start()
+    caller.join(5)
+
+    assert not caller.is_alive(), "start_background_dispatcher() deadlocked"
+    assert result["d"].outbox is default
+    assert outbox_module.start_background_dispatcher() is result["d"]
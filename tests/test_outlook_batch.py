@@ -0,0 +1,106 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import email_generator.outlook_integration as outlook
+
+
+class FakeGraph(BaseHTTPRequestHandler):
+    """Minimal Graph ``$batch`` endpoint.
+
+    ``throttled@example.com`` gets a 429 on its first attempt,
+    ``invalid@example.com`` is always rejected with a 400 and a batch
+    holding ``malformed@example.com`` is rejected as a whole with a 400.
+    """
+
+    protocol_version = "HTTP/1.1"
+    batches = []
+
+    def do_POST(self):  # noqa: N802 - http.server naming
+        assert self.path == "/v1.0/$batch"
+        assert self.headers["Authorization"] == "Bearer token"
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        requests = payload["requests"]
+        FakeGraph.batches.append([r["id"] for r in requests])
+        attempts = [r for batch in FakeGraph.batches for r in batch]
+        if "malformed@example.com" in json.dumps(requests):
+            self.send_response(400)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        responses = []
+        for r in requests:
+            address = r["body"]["message"]["toRecipients"][0]["emailAddress"]["address"]
+            if address == "invalid@example.com":
+                status, headers = 400, {}
+            elif address == "throttled@example.com" and attempts.count(r["id"]) == 1:
+                status, headers = 429, {"Retry-After": "7"}
+            else:
+                status, headers = 202, {}
+            responses.append({"id": r["id"], "status": status, "headers": headers})
+        body = json.dumps({"responses": responses}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    FakeGraph.batches = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGraph)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(
+        outlook, "GRAPH_ENDPOINT", f"http://127.0.0.1:{server.server_address[1]}/v1.0"
+    )
+    monkeypatch.setattr(outlook, "get_access_token", lambda **kwargs: "token")
+    yield FakeGraph
+    server.shutdown()
+
+
+def test_send_emails_batch_groups_and_retries_only_failures(graph):
+    messages = [
+        {"recipient": f"user{i}@example.com", "subject": "Hi", "body": "<p>Hi</p>"}
+        for i in range(25)
+    ]
+    messages[3]["recipient"] = "throttled@example.com"
+    messages[21]["recipient"] = "invalid@example.com"
+    delays = []
+
+    results = outlook.send_emails_batch(
+        messages, sender="me@example.com", sleep=delays.append
+    )
+
+    assert [len(batch) for batch in graph.batches] == [20, 5, 1]
+    assert graph.batches[2] == ["3"]
+    assert delays == [7.0]
+    assert [r.index for r in results if not r.ok] == [21]
+    assert results[21].status == 400 and results[21].attempts == 1
+    assert results[3].ok and results[3].attempts == 2
+
+
+def test_send_emails_batch_reports_a_failed_batch_per_message(graph):
+    messages = [
+        {"recipient": f"user{i}@example.com", "subject": "Hi", "body": "<p>Hi</p>"}
+        for i in range(25)
+    ]
+    messages[22]["recipient"] = "malformed@example.com"
+
+    results = outlook.send_emails_batch(
+        messages, sender="me@example.com", sleep=lambda delay: None
+    )
+
+    assert [len(batch) for batch in graph.batches] == [20, 5]
+    assert all(r.ok for r in results[:20])
+    assert [r.status for r in results[20:]] == [400] * 5
+    assert all(r.error and r.attempts == 1 for r in results[20:])
@@ -0,0 +1,77 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from email_generator import prompts
+from email_generator.prompts import (
+    ChatPrompt,
+    PromptTemplate,
+    context_tokens,
+    count_tokens,
+    get_prompt,
+)
+
+
+class WordEncoding:
+    """One token per whitespace-separated word, so sizes are easy to read."""
+
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    monkeypatch.setattr(prompts, "get_encoding", lambda model: WordEncoding())
+    prompts._static_tokens.cache_clear()
+    yield
+    prompts._static_tokens.cache_clear()
+
+
+def test_template_is_parsed_once_into_interned_literals():
+    template = PromptTemplate("Hi {name}, about {topic}.")
+
+    assert template.fields == ("name", "topic")
+    assert template.literals == ("Hi ", ", about ", ".")
+    assert template.render({"name": "Ann", "topic": "tea"}) == "Hi Ann, about tea."
+    assert template.static_tokens("gpt-4") == len("Hi , about .".split())
+    with pytest.raises(ValueError):
+        PromptTemplate("{value:>10}")
+
+
+def test_prompt_fits_budget_by_truncating_fields_in_order(monkeypatch):
+    monkeypatch.setitem(prompts.MODEL_CONTEXT_TOKENS, "tiny", 40)
+    prompt = ChatPrompt("qa", "Be brief.", "{context} Q: {question}", ("context", "question"))
+
+    small = prompt.messages("tiny", response_tokens=10, context="one two", question="why")
+    assert small.truncated == ()
+    assert small.messages[1]["content"] == "one two Q: why"
+    assert small.tokens == 2 + 1 + 2 + 1 + 2 * 4 + 3
+
+    big = prompt.messages(
+        "tiny", response_tokens=10, context="word " * 50, question="why not"
+    )
+    assert big.truncated == ("context",)
+    assert big.tokens <= 30
+    assert big.messages[1]["content"].endswith("[...] Q: why not")
+
+    with pytest.raises(ValueError):
+        prompt.messages("tiny", response_tokens=38, context="a", question="b")
+
+
+def test_registered_prompts_and_model_windows():
+    rendered = get_prompt("email").messages(
+        "gpt-4", tone="friendly", purpose="Reply", input_text="word " * 20000, guidance=""
+    )
+    assert rendered.truncated == ("guidance", "input_text")
+    assert rendered.tokens <= context_tokens("gpt-4") - prompts.RESPONSE_TOKENS
+    assert "friendly tone" in rendered.messages[1]["content"]
+
+    assert set(get_prompt("learnbot").user.fields) == {"context", "question"}
+    assert context_tokens("gpt-4o-2024-08-06") == 128000
+    assert count_tokens("", "gpt-4") == 0
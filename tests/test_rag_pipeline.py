@@ -3,17 +3,75 @@ import sys
 from pathlib import Path
 from types import ModuleType, SimpleNamespace
 
+import pytest
 
-def setup_fake_langchain():
+
+class FakeLoader:
+    calls = 0
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def load(self):
+        FakeLoader.calls += 1
+        return [
+            SimpleNamespace(
+                page_content=self.path.read_text(), metadata={"source": str(self.path)}
+            )
+        ]
+
+
+class FakeIndex(str):
+    flags = 0
+
+
+def read_fake_index(path, flags=0):
+    index = FakeIndex(Path(path).read_text())
+    index.flags = flags
+    return index
+
+
+class FakeDocstore:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def search(self, doc_id):
+        return self._docs[doc_id]
+
+
+class FakeFAISS:
+    def __init__(self, embeddings, index, docstore, index_to_docstore_id):
+        self.embeddings = embeddings
+        self.index = index
+        self.docstore = docstore
+        self.index_to_docstore_id = index_to_docstore_id
+
+    @property
+    def chunks(self):
+        return [self.docstore.search(i) for i in self.index_to_docstore_id.values()]
+
+    @classmethod
+    def from_documents(cls, chunks, embeddings, ids=None):
+        db = cls(embeddings, "flat-index", FakeDocstore({}), {})
+        db.add_documents(chunks, ids=ids)
+        return db
+
+    def add_documents(self, chunks, ids=None):
+        for chunk, doc_id in zip(chunks, ids):
+            self.index_to_docstore_id[len(self.index_to_docstore_id)] = doc_id
+            self.docstore._docs[doc_id] = chunk
+        self.embeddings.embed_documents([c.page_content for c in chunks])
+
+    def delete(self, ids):
+        kept = [i for i in self.index_to_docstore_id.values() if i not in ids]
+        self.index_to_docstore_id = dict(enumerate(kept))
+
+
+def setup_fake_langchain(monkeypatch):
     # Fake langchain_community.document_loaders
     doc_mod = ModuleType('langchain_community.document_loaders')
-    class FakeLoader:
-        def __init__(self, path, glob=None):
-            pass
-        def load(self):
-            return [SimpleNamespace(page_content="doc1")]
-    doc_mod.DirectoryLoader = FakeLoader
-    sys.modules['langchain_community.document_loaders'] = doc_mod
+    doc_mod.UnstructuredFileLoader = FakeLoader
+    monkeypatch.setitem(sys.modules, 'langchain_community.document_loaders', doc_mod)
 
     # Fake langchain.text_splitter
     split_mod = ModuleType('langchain.text_splitter')
@@ -23,41 +81,169 @@ def setup_fake_langchain():
         def split_documents(self, docs):
             return docs
     split_mod.RecursiveCharacterTextSplitter = FakeSplitter
-    sys.modules['langchain.text_splitter'] = split_mod
+    monkeypatch.setitem(sys.modules, 'langchain.text_splitter', split_mod)
 
     # Fake langchain.vectorstores
     vec_mod = ModuleType('langchain.vectorstores')
-    class FakeFAISS:
-        @classmethod
-        def from_documents(cls, chunks, embeddings):
-            return {'chunks': chunks, 'embeddings': embeddings}
     vec_mod.FAISS = FakeFAISS
-    sys.modules['langchain.vectorstores'] = vec_mod
+    monkeypatch.setitem(sys.modules, 'langchain.vectorstores', vec_mod)
+
+    # Fake docstore and document classes used when reopening a saved index
+    store_mod = ModuleType('langchain_community.docstore.in_memory')
+    store_mod.InMemoryDocstore = FakeDocstore
+    monkeypatch.setitem(sys.modules, 'langchain_community.docstore.in_memory', store_mod)
+    docs_mod = ModuleType('langchain_core.documents')
+    docs_mod.Document = lambda page_content, metadata: SimpleNamespace(
+        page_content=page_content, metadata=metadata
+    )
+    monkeypatch.setitem(sys.modules, 'langchain_core.documents', docs_mod)
+
+    # Fake faiss: the "index" is just a string written to disk
+    faiss_mod = ModuleType('faiss')
+    faiss_mod.IO_FLAG_MMAP = 1
+    faiss_mod.IO_FLAG_READ_ONLY = 2
+    faiss_mod.IO_FLAG_MMAP_IFC = 512
+    faiss_mod.write_index = lambda index, path: Path(path).write_text(index)
+    faiss_mod.read_index = read_fake_index
+    monkeypatch.setitem(sys.modules, 'faiss', faiss_mod)
 
     # Fake langchain_openai
     emb_mod = ModuleType('langchain_openai')
     class FakeEmbeddings:
         def __init__(self, openai_api_key=None):
             self.key = openai_api_key
+            self.embedded = []
+        def embed_documents(self, texts):
+            self.embedded.extend(texts)
+            return [[float(len(t))] for t in texts]
     emb_mod.OpenAIEmbeddings = FakeEmbeddings
-    sys.modules['langchain_openai'] = emb_mod
+    monkeypatch.setitem(sys.modules, 'langchain_openai', emb_mod)
 
     # Fake dotenv
     dotenv_mod = ModuleType('dotenv')
     def load_dotenv():
         pass
     dotenv_mod.load_dotenv = load_dotenv
-    sys.modules['dotenv'] = dotenv_mod
+    monkeypatch.setitem(sys.modules, 'dotenv', dotenv_mod)
 
 
-def test_load_index_returns_vectorstore(monkeypatch):
+def load_rag_module(monkeypatch, docs_dir):
     sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
-    setup_fake_langchain()
+    from learnbot.embedding_cache import EmbeddingCache
+
+    setup_fake_langchain(monkeypatch)
     rag_module = importlib.import_module('learnbot.rag_pipeline')
-    importlib.reload(rag_module)
+    rag_module = importlib.reload(rag_module)
+    monkeypatch.setattr(rag_module, 'DOCS_DIR', str(docs_dir))
+    cache = EmbeddingCache(docs_dir.parent / "embeddings.sqlite3")
+    monkeypatch.setattr(rag_module, 'get_embedding_cache', lambda: cache)
+    monkeypatch.setattr(
+        rag_module, 'get_embedding_executor', sys.modules['langchain_openai'].OpenAIEmbeddings
+    )
+    return rag_module
+
+
+def make_docs(tmp_path, **files):
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir(exist_ok=True)
+    for name, text in files.items():
+        (docs_dir / f"{name}.md").write_text(text)
+    return docs_dir
+
+
+def test_load_index_returns_vectorstore(monkeypatch, tmp_path):
+    rag_module = load_rag_module(monkeypatch, make_docs(tmp_path, a="doc1"))
+
+    db = rag_module.load_index(openai_api_key='abc', index_dir=tmp_path / "index")
+    assert db.chunks[0].page_content == 'doc1'
+    assert db.embeddings.embeddings.key == 'abc'
+
+
+def test_load_index_reuses_saved_artifact(monkeypatch, tmp_path):
+    rag_module = load_rag_module(monkeypatch, make_docs(tmp_path, a="doc1"))
+    tmp_path = tmp_path / "index"
+    FakeLoader.calls = 0
+
+    built = rag_module.load_index(openai_api_key='abc', index_dir=tmp_path)
+    assert rag_module.load_index(openai_api_key='abc', index_dir=tmp_path) is built
+    assert FakeLoader.calls == 1
+    assert (tmp_path / rag_module.INDEX_FILE).exists()
+
+    # A fresh process only has the artifact on disk: docs are not re-read
+    rag_module.clear_index_cache()
+    reopened = rag_module.load_index(openai_api_key='abc', index_dir=tmp_path)
+    assert FakeLoader.calls == 1
+    assert reopened.index == 'flat-index'
+    assert reopened.index.flags == 514  # memory-mapped, read-only
+    assert reopened.chunks[0].page_content == 'doc1'
+    assert reopened.chunks[0].metadata["source"].endswith("a.md")
+
+
+def test_file_names_with_glob_characters_are_indexed(monkeypatch, tmp_path):
+    docs_dir = make_docs(tmp_path, **{"faq[1]": "brackets", "what?": "question"})
+    rag_module = load_rag_module(monkeypatch, docs_dir)
+
+    db = rag_module.load_index(openai_api_key='abc', index_dir=tmp_path / "index")
+    assert sorted(c.page_content for c in db.chunks) == ["brackets", "question"]
+
+
+def test_update_index_embeds_only_changed_chunks(monkeypatch, tmp_path):
+    docs_dir = make_docs(tmp_path, a="alpha", b="beta", c="gamma")
+    rag_module = load_rag_module(monkeypatch, docs_dir)
+    index_dir = tmp_path / "index"
+    embeddings = sys.modules['langchain_openai'].OpenAIEmbeddings('abc')
+
+    db, stats = rag_module.update_index(embeddings, index_dir)
+    assert stats["added"] == 3
+    assert sorted(embeddings.embedded) == ["alpha", "beta", "gamma"]
+
+    (docs_dir / "b.md").write_text("beta v2")
+    (docs_dir / "c.md").unlink()
+    embeddings.embedded.clear()
+    db, stats = rag_module.update_index(embeddings, index_dir)
+
+    assert embeddings.embedded == ["beta v2"]
+    assert stats == {"added": 1, "removed": 2, "files_changed": 2}
+    assert sorted(c.page_content for c in db.chunks) == ["alpha", "beta v2"]
+
+    manifest = rag_module.read_manifest(index_dir)
+    assert sorted(Path(source).name for source in manifest["files"]) == ["a.md", "b.md"]
+
+    embeddings.embedded.clear()
+    _, stats = rag_module.update_index(embeddings, index_dir)
+    assert stats["files_changed"] == 0
+    assert embeddings.embedded == []
+
+
+def test_update_index_rebuilds_for_another_embedding_model(monkeypatch, tmp_path):
+    rag_module = load_rag_module(monkeypatch, make_docs(tmp_path, a="alpha", b="beta"))
+    index_dir = tmp_path / "index"
+    remote = sys.modules['langchain_openai'].OpenAIEmbeddings('abc')
+    rag_module.update_index(remote, index_dir)
+
+    local = sys.modules['langchain_openai'].OpenAIEmbeddings()
+    local.model = "local:tiny"
+    db, stats = rag_module.update_index(local, index_dir)
+
+    assert stats["added"] == 2
+    assert sorted(local.embedded) == ["alpha", "beta"]
+    assert rag_module.read_index_meta(index_dir)["embedding_model"] == "local:tiny"
+
+
+def test_default_embeddings_uses_the_configured_backend(monkeypatch, tmp_path):
+    rag_module = load_rag_module(monkeypatch, make_docs(tmp_path, a="doc1"))
+    local = sys.modules['langchain_openai'].OpenAIEmbeddings()
+    local.model = "local:tiny"
+    rag_module.register_embedding_backend("test-local", lambda key: local)
 
-    db = rag_module.load_index(openai_api_key='abc')
-    assert db['chunks'][0].page_content == 'doc1'
-    assert db['embeddings'].key == 'abc'
+    embeddings = rag_module.default_embeddings("abc", backend="test-local")
+    assert embeddings.embeddings is local
+    assert embeddings.model == "local:tiny"
 
+    monkeypatch.setattr(rag_module, "EMBEDDING_BACKEND", "test-local")
+    db = rag_module.load_index(openai_api_key="abc", index_dir=tmp_path / "index")
+    assert db.embeddings.embeddings is local
+    assert rag_module.read_index_meta(tmp_path / "index")["embedding_model"] == "local:tiny"
 
+    with pytest.raises(ValueError):
+        rag_module.default_embeddings("abc", backend="missing")
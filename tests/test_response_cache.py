@@ -0,0 +1,133 @@
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from email_generator.response_cache import ResponseCache, replay_tokens
+
+
+class FakeEmbeddings:
+    """Embeds a text as its counts of a few marker words."""
+
+    words = ("meeting", "invoice", "monday", "friday")
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(text.count(word)) + 0.01 for word in self.words]
+
+
+def test_exact_hit_ttl_and_eviction(tmp_path):
+    cache = ResponseCache(tmp_path / "responses.sqlite3", ttl_seconds=60, max_entries=2)
+    assert cache.get("Hi  there", "Friendly", "Reply", "gpt-4") is None
+
+    cache.put("Hi there", "Friendly", "Reply", "gpt-4", "Hello!")
+    assert cache.get(" Hi  there ", "Friendly", "Reply", "gpt-4") == "Hello!"
+    assert cache.get("Hi there", "Assertive", "Reply", "gpt-4") is None
+    assert cache.get("Hi there", "Friendly", "Reply", "gpt-3.5-turbo") is None
+
+    cache.put("second", "Friendly", "Reply", "gpt-4", "2")
+    cache.put("third", "Friendly", "Reply", "gpt-4", "3")
+    assert len(cache) == 2
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.get("third", "Friendly", "Reply", "gpt-4") is None
+
+
+def test_near_duplicate_tier(tmp_path):
+    embeddings = FakeEmbeddings()
+    cache = ResponseCache(tmp_path / "responses.sqlite3", embeddings=embeddings)
+    cache.put("Can we move the meeting to Monday?", "Friendly", "Reply", "gpt-4", "Sure")
+
+    assert cache.get("can we move the MEETING to monday", "Friendly", "Reply", "gpt-4") == "Sure"
+    assert cache.get("Please pay the invoice by Friday", "Friendly", "Reply", "gpt-4") is None
+    assert cache.get("Can we move the meeting to Monday?", "Neutral", "Reply", "gpt-4") is None
+
+
+def test_near_duplicates_skip_vectors_of_another_dimension(tmp_path):
+    path = tmp_path / "responses.sqlite3"
+    cache = ResponseCache(path, embeddings=FakeEmbeddings())
+    cache.put("Can we move the meeting to Monday?", "Friendly", "Reply", "gpt-4", "Sure")
+    cache.close()
+
+    wider = FakeEmbeddings()
+    wider.words += ("tuesday",)
+    cache = ResponseCache(path, embeddings=wider)
+    assert cache.get("can we move the meeting to monday", "Friendly", "Reply", "gpt-4") is None
+    cache.put("Is the invoice due Tuesday?", "Friendly", "Reply", "gpt-4", "Yes")
+    assert cache.get("is the invoice due on tuesday", "Friendly", "Reply", "gpt-4") == "Yes"
+
+
+def test_entries_are_keyed_by_examples(tmp_path):
+    cache = ResponseCache(tmp_path / "responses.sqlite3", embeddings=FakeEmbeddings())
+    cache.put("Move the meeting to Monday", "Friendly", "Request", "gpt-4", "A", ["t1"])
+    assert cache.get("Move the meeting to Monday", "Friendly", "Request", "gpt-4", ["t1"]) == "A"
+    assert cache.get("Move the meeting to Monday", "Friendly", "Request", "gpt-4", ["t2"]) is None
+    assert cache.get("move the meeting to monday!", "Friendly", "Request", "gpt-4") is None
+
+
+def test_generator_replays_cached_email(monkeypatch, tmp_path):
+    from test_email_generator import load_generator
+
+    module = load_generator(monkeypatch)
+    cache = ResponseCache(tmp_path / "responses.sqlite3")
+    first = list(module.stream_generated_email("input", "Friendly", "Reply", "key", cache=cache))
+    assert first == ["Hello", " World"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cache hit must not call the API")
+
+    monkeypatch.setattr(module, "get_openai_client", fail)
+    replayed = list(module.stream_generated_email("input", "Friendly", "Reply", "key", cache=cache))
+    assert "".join(replayed) == "Hello World"
+    assert list(replay_tokens("Dear  team,\nThanks")) == ["Dear  ", "team,\n", "Thanks"]
+
+
+def test_generator_cache_misses_when_examples_change(monkeypatch, tmp_path):
+    import asyncio
+
+    from email_generator.template_store import TemplateRecord
+    from test_email_generator import load_generator
+
+    module = load_generator(monkeypatch)
+    cache = ResponseCache(tmp_path / "responses.sqlite3")
+    retriever = SimpleNamespace(examples=lambda text: [TemplateRecord("A", "Hi", "first", "a.txt")])
+    calls = []
+    real_client = module.get_openai_client
+    real_async_client = module.get_async_openai_client
+
+    def counting_client(key):
+        calls.append(key)
+        return real_client(key)
+
+    def counting_async_client(key):
+        calls.append(key)
+        return real_async_client(key)
+
+    monkeypatch.setattr(module, "get_openai_client", counting_client)
+    monkeypatch.setattr(module, "get_async_openai_client", counting_async_client)
+    for _ in range(2):
+        list(module.stream_generated_email(
+            "input", "Friendly", "Request", "key", cache=cache, retriever=retriever
+        ))
+    assert len(calls) == 1
+
+    retriever.examples = lambda text: [TemplateRecord("A", "Hi", "edited", "a.txt")]
+
+    async def collect():
+        return [
+            token
+            async for token in module.astream_generated_email(
+                "input", "Friendly", "Request", "key", cache=cache, retriever=retriever
+            )
+        ]
+
+    assert "".join(asyncio.run(collect())) == "Hello World"
+    assert "".join(asyncio.run(collect())) == "Hello World"
+    assert len(calls) == 2
+    assert len(cache) == 2
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from email_generator.scheduler import GenerationScheduler, TokenBucket
+
+
+def test_scheduler_caps_concurrency():
+    scheduler = GenerationScheduler(max_concurrency=3, requests_per_minute=60_000)
+    peak = 0
+
+    async def generation():
+        nonlocal peak
+        async with scheduler.slot('key'):
+            peak = max(peak, scheduler.active)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(generation() for _ in range(20)))
+
+    asyncio.run(run())
+    assert peak == 3
+    assert scheduler.active == 0
+
+
+def test_token_bucket_spaces_requests_beyond_burst():
+    async def run():
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # The first request uses the burst, the other four wait 20 ms each
+    assert asyncio.run(run()) >= 0.075
+
+
+def test_rate_budget_is_tracked_per_key():
+    scheduler = GenerationScheduler(max_concurrency=10, requests_per_minute=60, burst=1)
+
+    async def run():
+        start = time.monotonic()
+        for key in ['a', 'b', 'c']:
+            async with scheduler.slot(key):
+                pass
+        return time.monotonic() - start
+
+    # Each key still has its single burst token, so nothing waits
+    assert asyncio.run(run()) < 0.5
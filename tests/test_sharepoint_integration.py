@@ -7,6 +7,14 @@ import pytest
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import email_generator.sharepoint_integration as sp
+from email_generator.template_cache import TemplateCache
+
+
+@pytest.fixture(autouse=True)
+def empty_context_pool():
+    sp.get_context_pool().clear()
+    yield
+    sp.get_context_pool().clear()
 
 
 @pytest.fixture
@@ -35,21 +43,156 @@ def test_upload_template(monkeypatch, tmp_txt):
     fake_ctx.execute_query.assert_called_once()
 
 
-def test_download_template(monkeypatch, tmp_path):
+class FakeRemoteFile:
+    """SharePoint file exposing an ETag and a streamed download."""
+
+    def __init__(self, content, etag):
+        self.content, self.properties = content, {"ETag": etag}
+        self.downloads = 0
+
+    def select(self, names):
+        return self
+
+    def get(self):
+        return self
+
+    def download_session(self, file_object):
+        self.downloads += 1
+        file_object.write(self.content)
+        return MagicMock()
+
+
+def test_download_template_revalidates_cached_copy(monkeypatch, tmp_path):
+    remote = FakeRemoteFile(b"hello", '"{1},1"')
     fake_ctx = MagicMock()
     fake_ctx.with_credentials.return_value = fake_ctx
-    fake_file = MagicMock()
-    fake_file.download.return_value = fake_file
-    fake_ctx.web.get_file_by_server_relative_url.return_value = fake_file
+    fake_ctx.web.get_file_by_server_relative_url.return_value = remote
+    cache = TemplateCache(tmp_path / "cache")
 
     monkeypatch.setattr(sp, "ClientContext", MagicMock(return_value=fake_ctx))
     monkeypatch.setattr(sp, "UserCredential", MagicMock())
+    monkeypatch.setattr(sp, "get_template_cache", lambda: cache)
+
+    def download(name):
+        dest = tmp_path / name
+        result = sp.download_template(
+            "https://example.sharepoint.com", "/docs/demo.txt", dest, "u", "p"
+        )
+        assert result == dest
+        return dest.read_bytes()
+
+    assert download("first.txt") == b"hello"
+    assert download("second.txt") == b"hello"
+    assert remote.downloads == 1  # unchanged ETag: served from the cache
+
+    remote.content, remote.properties["ETag"] = b"changed", '"{1},2"'
+    assert download("third.txt") == b"changed"
+    assert remote.downloads == 2
+
+
+class FakeUploadSession:
+    """Records chunks sent through start/continue/finish_upload."""
+
+    def __init__(self, fail_at_offset=None):
+        self.received = bytearray()
+        self.calls = []
+        self.fail_at_offset = fail_at_offset
+
+    def _append(self, name, offset, content):
+        if offset == self.fail_at_offset:
+            self.fail_at_offset = None
+            raise ConnectionError("connection dropped")
+        assert offset == len(self.received)
+        self.calls.append((name, offset, len(content)))
+        self.received += content
+        return MagicMock(value=len(self.received))
+
+    def start_upload(self, upload_id, content):
+        return self._append("start", 0, content)
+
+    def continue_upload(self, upload_id, offset, content):
+        return self._append("continue", offset, content)
+
+    def finish_upload(self, upload_id, offset, content):
+        return self._append("finish", offset, content)
 
-    dest = tmp_path / "out.txt"
-    result = sp.download_template(
-        "https://example.sharepoint.com", "/docs/demo.txt", dest, "u", "p"
+
+def make_chunked_ctx(session):
+    ctx = MagicMock()
+    ctx.with_credentials.return_value = ctx
+    folder = MagicMock()
+    folder.upload_file.return_value = MagicMock(serverRelativeUrl="/docs/big.html")
+    ctx.web.get_folder_by_server_relative_url.return_value = folder
+    ctx.web.get_file_by_server_relative_url.return_value = session
+    return ctx
+
+
+def test_upload_template_streams_chunks_and_resumes(monkeypatch, tmp_path):
+    path = tmp_path / "big.html"
+    path.write_bytes(b"0123456789")
+    session = FakeUploadSession(fail_at_offset=8)
+    monkeypatch.setattr(
+        sp, "ClientContext", MagicMock(return_value=make_chunked_ctx(session))
     )
+    monkeypatch.setattr(sp, "UserCredential", MagicMock())
+    progress = []
+
+    def upload():
+        return sp.upload_template(
+            "https://example.sharepoint.com",
+            "/docs",
+            path,
+            "u",
+            "p",
+            chunk_size=4,
+            progress=lambda done, total: progress.append(done),
+        )
+
+    with pytest.raises(ConnectionError):
+        upload()
+    assert sp.upload_state_path(path).exists()
+
+    assert upload() == "/docs/big.html"
+    assert bytes(session.received) == b"0123456789"
+    assert session.calls == [("start", 0, 4), ("continue", 4, 4), ("finish", 8, 2)]
+    assert progress == [4, 8, 10]
+    assert not sp.upload_state_path(path).exists()
+
+
+def test_context_pool_reuses_contexts_and_reauthenticates(monkeypatch):
+    contexts = []
+
+    def make_context(site_url):
+        ctx = MagicMock(name=f"ctx{len(contexts)}")
+        ctx.with_credentials.return_value = ctx
+        contexts.append(ctx)
+        return ctx
+
+    now = [0.0]
+    pool = sp.ClientContextPool(idle_timeout=60, max_age=3600, clock=lambda: now[0])
+    monkeypatch.setattr(sp, "ClientContext", make_context)
+    monkeypatch.setattr(sp, "UserCredential", MagicMock())
+    site = "https://example.sharepoint.com"
+
+    assert pool.run(site, "u", "p", lambda ctx: ctx) is pool.run(
+        site, "u", "p", lambda ctx: ctx
+    )
+    with pool.lease(site, "u", "p") as first, pool.lease(site, "u", "p") as second:
+        assert first is not second  # concurrent callers never share a context
+    assert len(contexts) == 2
+
+    expired = RuntimeError("session expired")
+    expired.response = MagicMock(status_code=401)
+    calls = []
+
+    def operation(ctx):
+        calls.append(ctx)
+        if len(calls) == 1:
+            raise expired
+        return "ok"
+
+    assert pool.run(site, "u", "p", operation) == "ok"
+    assert calls[0] in contexts[:2] and calls[1] is contexts[2]
 
-    assert result == dest
-    fake_file.download.assert_called_with(dest.as_posix())
-    fake_file.execute_query.assert_called_once()
+    now[0] = 120
+    assert pool.evict_idle() == 1
@@ -0,0 +1,192 @@
+import os
+import sys
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import email_generator.sharepoint_integration as sp
+from email_generator.sharepoint_sync import read_manifest, sync_folder
+
+FOLDER = "/sites/team/Templates"
+
+
+class FakeSharePoint:
+    """In-memory document library shared by every ``FakeContext``."""
+
+    def __init__(self, **files):
+        self.files = {}
+        self.lock = threading.Lock()
+        self.downloads = []
+        for name, content in files.items():
+            self.put(name, content)
+
+    def put(self, name, content):
+        version = self.files.get(name, (None, 0))[1] + 1
+        self.files[name] = (content, version)
+
+    def properties(self, name):
+        content, version = self.files[name]
+        return {
+            "Name": name,
+            "ServerRelativeUrl": f"{FOLDER}/{name}",
+            "ETag": f'"{{{name}}},{version}"',
+            "Length": len(content),
+        }
+
+
+class FakeFile:
+    def __init__(self, library, name):
+        self.library, self.name = library, name
+        self.properties = {}
+
+    def select(self, names):
+        return self
+
+    def get(self):
+        self.properties = self.library.properties(self.name)
+        return self
+
+    def download_session(self, file_object):
+        with self.library.lock:
+            self.library.downloads.append(self.name)
+        file_object.write(self.library.files[self.name][0])
+        return SimpleNamespace(execute_query=lambda: None)
+
+
+class FakeFolder:
+    def __init__(self, library):
+        self.library = library
+        self.files = SimpleNamespace(get=self.list_files)
+
+    def list_files(self):
+        listing = [
+            SimpleNamespace(properties=self.library.properties(name))
+            for name in self.library.files
+        ]
+        return SimpleNamespace(select=lambda names: listing)
+
+    def upload_file(self, name, content):
+        with self.library.lock:
+            self.library.put(name, content)
+        return SimpleNamespace(serverRelativeUrl=f"{FOLDER}/{name}")
+
+
+class FakeContext:
+    """Stand-in for ``ClientContext`` backed by a ``FakeSharePoint``."""
+
+    def __init__(self, library):
+        self.web = SimpleNamespace(
+            get_folder_by_server_relative_url=lambda url: FakeFolder(library),
+            get_file_by_server_relative_url=lambda url: FakeFile(
+                library, url.rsplit("/", 1)[-1]
+            ),
+        )
+
+    def with_credentials(self, credentials):
+        return self
+
+    def execute_query(self):
+        pass
+
+
+def test_sync_folder_transfers_only_changes(monkeypatch, tmp_path):
+    library = FakeSharePoint(
+        **{f"t{i}.html": f"<p>{i}</p>".encode() for i in range(10)}
+    )
+    monkeypatch.setattr(sp, "ClientContext", lambda site_url: FakeContext(library))
+    monkeypatch.setattr(sp, "UserCredential", MagicMock())
+    pool = sp.ClientContextPool()
+    site = "https://example.sharepoint.com/sites/team"
+
+    def sync(direction):
+        return sync_folder(
+            site, FOLDER, tmp_path, "u", "p", direction=direction, workers=4, pool=pool
+        )
+
+    first = sync("download")
+    assert sorted(first.downloaded) == sorted(library.files)
+    assert (tmp_path / "t3.html").read_bytes() == b"<p>3</p>"
+    assert sorted(read_manifest(tmp_path)) == sorted(library.files)
+
+    library.put("t3.html", b"<p>new</p>")
+    (tmp_path / "t5.html").write_bytes(b"<p>edited locally</p>")
+    (tmp_path / "new.html").write_bytes(b"<p>new file</p>")
+    second = sync("both")
+    assert second.downloaded == ["t3.html"]
+    assert sorted(second.uploaded) == ["new.html", "t5.html"]
+    assert second.unchanged == 8 and not second.failed
+    assert (tmp_path / "t3.html").read_bytes() == b"<p>new</p>"
+    assert library.files["t5.html"][0] == b"<p>edited locally</p>"
+
+    third = sync("both")
+    assert third.downloaded == third.uploaded == [] and third.unchanged == 11
+    assert len(library.downloads) == 11
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".t")]
+
+
+def test_first_download_reports_differing_local_files_as_conflicts(
+    monkeypatch, tmp_path
+):
+    library = FakeSharePoint(
+        **{
+            "same.html": b"<p>same</p>",
+            "edited.html": b"<p>remote</p>",
+            "resized.html": b"<p>remote</p>",
+            "big.html.upload.json": b"{}",
+        }
+    )
+    monkeypatch.setattr(sp, "ClientContext", lambda site_url: FakeContext(library))
+    monkeypatch.setattr(sp, "UserCredential", MagicMock())
+    (tmp_path / "same.html").write_bytes(b"<p>same</p>")
+    (tmp_path / "edited.html").write_bytes(b"<p>locaL</p>")
+    (tmp_path / "resized.html").write_bytes(b"<p>local copy</p>")
+    (tmp_path / "big.html.upload.json").write_text('{"offset": 0}')
+
+    report = sync_folder(
+        "https://example.sharepoint.com/sites/team",
+        FOLDER,
+        tmp_path,
+        "u",
+        "p",
+        direction="download",
+        pool=sp.ClientContextPool(),
+    )
+
+    assert sorted(report.conflicts) == ["edited.html", "resized.html"]
+    assert report.downloaded == report.uploaded == [] and report.unchanged == 1
+    assert (tmp_path / "edited.html").read_bytes() == b"<p>locaL</p>"
+    assert (tmp_path / "resized.html").read_bytes() == b"<p>local copy</p>"
+    assert sorted(read_manifest(tmp_path)) == ["same.html"]
+    assert library.files["big.html.upload.json"][0] == b"{}"
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith((".same", ".edit"))]
+
+
+def test_download_restores_local_and_applies_remote_deletions(monkeypatch, tmp_path):
+    library = FakeSharePoint(
+        **{"keep.html": b"<p>1</p>", "gone.html": b"<p>2</p>", "edit.html": b"<p>3</p>"}
+    )
+    monkeypatch.setattr(sp, "ClientContext", lambda site_url: FakeContext(library))
+    monkeypatch.setattr(sp, "UserCredential", MagicMock())
+    pool = sp.ClientContextPool()
+
+    def sync():
+        site = "https://example.sharepoint.com/sites/team"
+        return sync_folder(site, FOLDER, tmp_path, "u", "p", pool=pool)
+
+    sync()
+    (tmp_path / "keep.html").unlink()
+    del library.files["gone.html"]
+    del library.files["edit.html"]
+    (tmp_path / "edit.html").write_bytes(b"<p>edited locally</p>")
+
+    report = sync()
+
+    assert report.downloaded == ["keep.html"]
+    assert (tmp_path / "keep.html").read_bytes() == b"<p>1</p>"
+    assert report.deleted == ["gone.html"]
+    assert not (tmp_path / "gone.html").exists()
+    assert report.conflicts == ["edit.html"]
+    assert (tmp_path / "edit.html").exists()
+    assert sorted(read_manifest(tmp_path)) == ["edit.html", "keep.html"]
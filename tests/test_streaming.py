@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from email_generator.streaming import StreamRenderer, render_stream
+
+
+class Placeholder:
+    def __init__(self):
+        self.rendered = []
+
+    def markdown(self, text):
+        self.rendered.append(text)
+
+
+def test_renderer_coalesces_tokens_by_time_and_size():
+    now = [0.0]
+    placeholder = Placeholder()
+    renderer = StreamRenderer(placeholder, interval=0.05, max_chars=10, clock=lambda: now[0])
+
+    renderer.write("Hi")  # first token renders straight away
+    renderer.write(" a")
+    renderer.write(" b")
+    assert placeholder.rendered == ["Hi"]
+
+    now[0] = 0.06
+    renderer.write(" c")
+    assert placeholder.rendered[-1] == "Hi a b c"
+
+    renderer.write("0123456789")  # over max_chars before the interval elapses
+    assert placeholder.rendered[-1] == "Hi a b c0123456789"
+    assert renderer.renders == 3
+
+
+def test_render_stream_returns_full_text_and_renders_it_last():
+    placeholder = Placeholder()
+    tokens = [f"word{i} " for i in range(5000)]
+    text = render_stream(iter(tokens), placeholder)
+    assert text == "".join(tokens)
+    assert placeholder.rendered[-1] == text
+    assert len(placeholder.rendered) < 100
@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from email_generator.template_cache import TemplateCache
+
+
+def stage(cache, content):
+    with cache.staging_file() as f:
+        f.write(content)
+    return f.name
+
+
+def test_contents_are_deduplicated_and_lru_evicted(tmp_path):
+    cache = TemplateCache(tmp_path / "cache", max_bytes=10)
+    site = "https://example.sharepoint.com"
+
+    cache.put(site, "/a.html", stage(cache, b"aaaa"), etag="1")
+    cache.put(site, "/copy-of-a.html", stage(cache, b"aaaa"), etag="1")
+    assert cache.total_bytes() == 4
+
+    cache.put(site, "/b.html", stage(cache, b"bbbb"), etag="2")
+    assert cache.get(site, "/a.html").path.read_bytes() == b"aaaa"  # now most recent
+    cache.put(site, "/c.html", stage(cache, b"cccc"), etag="3")
+
+    assert cache.get(site, "/b.html") is None
+    assert cache.get(site, "/a.html").etag == "1"
+    assert cache.get(site, "/c.html").size == 4
+    assert cache.total_bytes() == 8
+    objects = [p for p in (tmp_path / "cache" / "objects").rglob("*") if p.is_file()]
+    assert len(objects) == 2
+
+
+def test_changed_file_replaces_its_old_object(tmp_path):
+    cache = TemplateCache(tmp_path / "cache", max_bytes=100)
+    site = "https://example.sharepoint.com"
+
+    old = cache.put(site, "/a.html", stage(cache, b"version 1"), etag="1")
+    shared = cache.put(site, "/shared.html", stage(cache, b"shared"), etag="1")
+    cache.put(site, "/copy.html", stage(cache, b"shared"), etag="1")
+
+    new = cache.put(site, "/a.html", stage(cache, b"version 2!"), etag="2")
+    assert not old.path.exists()
+    assert new.path.read_bytes() == b"version 2!"
+
+    # Contents still referenced by another file are kept
+    cache.put(site, "/copy.html", stage(cache, b"changed"), etag="2")
+    assert shared.path.exists()
+
+    objects = [p for p in (tmp_path / "cache" / "objects").rglob("*") if p.is_file()]
+    assert sum(p.stat().st_size for p in objects) == cache.total_bytes() == 23
@@ -0,0 +1,111 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from email_generator.template_fill import (
+    TemplateFiller,
+    compile_template,
+    extract_slots,
+)
+from email_generator.template_store import TemplateStore, parse_template
+
+ROYALTY_REQUEST = (
+    "Delivering Royalty Statements for 2024, payments will be made by "
+    "31 March 2025, finance contact finance@example.org"
+)
+
+
+def test_placeholders_compile_to_slots_and_free_form():
+    plan = compile_template(
+        parse_template(
+            "Email Subject:\nSage/[SOCIETY] renewal for JOURNAL(S)\nEmail Body:\n"
+            "Dear EDITOR/SOCIETY, see DATES and [short list of terms]."
+        )
+    )
+
+    assert plan.slots == ("society", "journal", "recipient", "date")
+    assert plan.free_form == ("[short list of terms]",)
+    assert not plan.fillable
+    assert plan.render({"society": "x", "journal": "y", "recipient": "z", "date": "d"}) is None
+
+
+def test_rules_extract_slot_values():
+    assert extract_slots(ROYALTY_REQUEST) == {
+        "email": "finance@example.org",
+        "date": "31 March 2025",
+        "year": "2024",
+    }
+    values = extract_slots(
+        "Send the impact factor report to Dr Jane Smith for the Journal of "
+        "Management Studies, from Ann Lee"
+    )
+    assert values["journal"] == "Journal of Management Studies"
+    assert values["recipient"] == "Dr Jane Smith"
+    assert values["sender"] == "Ann Lee"
+
+
+def test_filler_renders_known_templates_and_declines_otherwise():
+    filler = TemplateFiller(TemplateStore.load())
+
+    email = filler.fill(ROYALTY_REQUEST)
+    assert email.startswith("Subject: 2024 Royalty Statement\n\n")
+    assert "payments will be made by 31 March 2025." in email
+    assert "(finance@example.org)" in email
+
+    assert filler.fill("Delivering Royalty Statements for 2024") is None
+    assert filler.fill("Can we move our meeting to Tuesday?") is None
+    assert filler.fill("Contract renewal notice to Jane Doe due 1 June 2026") is None
+
+    request = (
+        "Delivering the Annual Impact Factor report for journal Sociology Today "
+        "to Prof. Mark Jones"
+    )
+    assert filler.fill(request) is None
+    assert "Dear Prof. Mark Jones," in filler.fill(request, {"sender": "Ann Lee"})
+
+
+def test_generator_serves_filled_templates_without_the_api(monkeypatch):
+    from test_email_generator import load_generator
+
+    module = load_generator(monkeypatch)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("a filled template must not call the API")
+
+    monkeypatch.setattr(module, "get_openai_client", fail)
+    filler = TemplateFiller(TemplateStore.load())
+    tokens = list(
+        module.stream_generated_email(
+            ROYALTY_REQUEST, "Friendly", "Information", "key", filler=filler
+        )
+    )
+    assert "".join(tokens) == filler.fill(ROYALTY_REQUEST)
+
+
+def test_filler_ignores_requests_that_do_not_name_a_template():
+    filler = TemplateFiller(TemplateStore.load())
+
+    # A complaint about royalty statements is not a request for the template
+    complaint = (
+        "I received the royalty statements for 2023 but the payment due "
+        "12 May 2024 is missing. Reply to finance@x.org"
+    )
+    assert filler.fill(complaint) is None
+
+    # Templates without slots would come back verbatim, whatever was asked
+    recruiting = (
+        "Write an email recruiting new members for the editorial board of our journal"
+    )
+    assert filler.fill(recruiting) is None
+    assert filler.fill("Editorial Board Recruitment email for our journal") is None
+
+
+def test_replies_are_never_filled_from_templates(monkeypatch):
+    from test_email_generator import load_generator
+
+    module = load_generator(monkeypatch)
+    filler = TemplateFiller(TemplateStore.load())
+    assert module.fill_template(filler, ROYALTY_REQUEST, "Reply") is None
+    assert module.fill_template(None, ROYALTY_REQUEST, "Information") is None
+    assert module.fill_template(filler, ROYALTY_REQUEST, "Information") is not None
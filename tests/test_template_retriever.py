@@ -0,0 +1,140 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+from email_generator.template_retriever import TemplateRetriever, read_template_index_meta
+from email_generator.template_store import TemplateRecord, TemplateStore
+
+
+class FakeEmbeddings:
+    """Embeds a text as its counts of a few marker words."""
+
+    model = "fake-embedding"
+    words = ("royalty", "conference", "editor", "contract")
+
+    def __init__(self):
+        self.documents = 0
+
+    def embed_documents(self, texts):
+        self.documents += len(texts)
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        text = text.lower()
+        return [float(text.count(word)) for word in self.words]
+
+
+def make_store(*extra):
+    return TemplateStore(
+        [
+            TemplateRecord("Royalty", "Royalty Statement", "Your royalty statement.", ""),
+            TemplateRecord("Meetup", "Conference", "Meet at the conference?", ""),
+            TemplateRecord("Editor", "Editor search", "Apply to be editor.", ""),
+            *extra,
+        ]
+    )
+
+
+def test_index_is_saved_memory_mapped_and_reused(tmp_path):
+    embeddings = FakeEmbeddings()
+    retriever = TemplateRetriever(make_store(), embeddings, tmp_path)
+
+    assert isinstance(retriever.vectors, np.memmap)
+    assert retriever.vectors.dtype == np.float32
+    assert [r.name for r in retriever.examples("Send the royalty report", k=2)] == ["Royalty"]
+    assert retriever.search("conference and editor", k=1)[0][0].name in {"Meetup", "Editor"}
+
+    TemplateRetriever(make_store(), embeddings, tmp_path)
+    assert embeddings.documents == 3
+
+    extra = TemplateRecord("Contract", "Contract renewal", "Contract attached.", "")
+    grown = TemplateRetriever(make_store(extra), embeddings, tmp_path)
+    assert embeddings.documents == 7
+    assert len(read_template_index_meta(tmp_path)["ids"]) == 4
+    assert grown.examples("contract")[0].name == "Contract"
+
+
+def test_generator_includes_retrieved_examples(monkeypatch, tmp_path):
+    from test_email_generator import load_generator
+
+    module = load_generator(monkeypatch)
+    retriever = TemplateRetriever(make_store(), FakeEmbeddings(), tmp_path)
+    sent = []
+    real_build = module.build_messages
+
+    def build(*args):
+        sent.append(real_build(*args))
+        return sent[-1]
+
+    monkeypatch.setattr(module, "build_messages", build)
+    tokens = list(
+        module.stream_generated_email(
+            "Royalty statement for 2024", "Friendly", "Information", "key", retriever=retriever
+        )
+    )
+    assert tokens == ["Hello", " World"]
+    assert "Example 1 (Royalty):\nSubject: Royalty Statement" in sent[-1][1]["content"]
+
+    async def collect():
+        return [
+            t
+            async for t in module.astream_generated_email(
+                "Conference next week", "Friendly", "Request", "key", retriever=retriever
+            )
+        ]
+
+    assert asyncio.run(collect()) == ["Hello", " World"]
+    assert "Example 1 (Meetup)" in sent[-1][1]["content"]
+    assert "Example" not in real_build("hi", "Friendly", "Reply")[1]["content"]
+
+
+def test_generator_falls_back_to_no_examples_when_retrieval_fails(monkeypatch):
+    from test_email_generator import load_generator
+
+    module = load_generator(monkeypatch)
+
+    class BrokenRetriever:
+        def examples(self, query):
+            raise ConnectionError("embeddings endpoint unavailable")
+
+    tokens = module.stream_generated_email(
+        "Royalty statement", "Friendly", "Information", "key", retriever=BrokenRetriever()
+    )
+    assert list(tokens) == ["Hello", " World"]
+
+
+def test_retrievers_for_other_keys_build_concurrently(monkeypatch, tmp_path):
+    import threading
+
+    from email_generator import template_retriever
+
+    monkeypatch.setattr(template_retriever, "_retrievers", {})
+    monkeypatch.setattr(template_retriever, "_build_locks", {})
+    started, release = threading.Event(), threading.Event()
+
+    class SlowEmbeddings(FakeEmbeddings):
+        model = "slow"
+
+        def embed_documents(self, texts):
+            started.set()
+            release.wait(5)
+            return super().embed_documents(texts)
+
+    slow = threading.Thread(
+        target=template_retriever.get_template_retriever,
+        args=("a", tmp_path / "slow", SlowEmbeddings(), make_store()),
+    )
+    slow.start()
+    assert started.wait(5)
+    try:
+        fast = template_retriever.get_template_retriever(
+            "b", tmp_path / "fast", FakeEmbeddings(), make_store()
+        )
+        assert fast.examples("royalty")[0].name == "Royalty"
+    finally:
+        release.set()
+        slow.join()
@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from email_generator.template_store import (
+    TemplateStore,
+    load_templates,
+    parse_template,
+)
+
+
+def write_templates(tmp_path):
+    (tmp_path / "Royalty_Statement.txt").write_text(
+        "Email Subject:\nYEAR Royalty Statement\nEmail Body:\nAttached is the royalty statement.",
+        encoding="utf-8",
+    )
+    (tmp_path / "Conference_Meetup.txt").write_text(
+        "\ufeffEmail Subject:\nMeet at CONFERENCE\nEmail Body:\nAre you attending the conference?",
+        encoding="utf-8",
+    )
+    csv_path = tmp_path / "emails.csv"
+    csv_path.write_text(
+        'text,clean_text\n'
+        '"Email Subject:\nMeet at CONFERENCE\nEmail Body:\nAre you  attending the conference?",x\n'
+        '"Dear EDITOR, your contract renewal is attached.",y\n',
+        encoding="utf-8",
+    )
+    return csv_path
+
+
+def test_templates_are_parsed_and_deduplicated(tmp_path):
+    records = load_templates(tmp_path, write_templates(tmp_path))
+
+    assert [r.name for r in records[:2]] == ["Conference Meetup", "Royalty Statement"]
+    assert records[0].subject == "Meet at CONFERENCE"
+    assert records[0].body == "Are you attending the conference?"
+    assert len(records) == 3
+    assert records[2].subject == "" and records[2].body.startswith("Dear EDITOR")
+    assert parse_template("plain text").text == "plain text"
+
+
+def test_bm25_ranks_the_closest_template(tmp_path):
+    store = TemplateStore.load(tmp_path, write_templates(tmp_path))
+
+    assert store.closest("send the royalty statement").name == "Royalty Statement"
+    assert store.closest("meet at the conference").name == "Conference Meetup"
+    assert "contract renewal" in store.closest("Contract renewal").body
+    assert store.closest("the and of") is None
+    assert store.get("royalty statement") is store.search("royalty")[0][0]
+
+
+def test_repository_corpus_loads():
+    store = TemplateStore.load()
+
+    assert len(store) == 10
+    assert store.closest("invite applications for editor-in-chief").name == (
+        "Editor Search Invitation"
+    )